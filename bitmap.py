@@ -0,0 +1,243 @@
+"""Sets of row positions, as compressed bitmaps.
+
+A `Bitmap` is a set of positions among a fixed number of rows, split
+into containers of 2**16 consecutive rows (as in Roaring bitmaps). A
+container with few positions keeps them as a sorted array of 16-bit
+offsets; one with many keeps one bit per row, packed 8 to a byte; and
+an empty container isn't kept at all. Either way, no container takes
+more than 8 KiB, and sparse sets take 2 bytes per position.
+
+Bitmaps combine with `&`, `|`, `~` and `-`, container by container,
+without expanding them into a boolean mask or an array of positions
+over every row.
+
+The `NEODatabase` keeps bitmaps of the approaches of hazardous NEOs, of
+NEOs with a known diameter and of named NEOs, and of each year's
+approaches, to narrow queries that filter on them (see
+`NEODatabase.bitmap`).
+"""
+import numpy as np
+
+# The number of rows per container, and the largest number of positions
+# that a container keeps as an array of offsets:
+CONTAINER_SIZE = 1 << 16
+ARRAY_LIMIT = 4096
+
+# The number of bits set in each byte:
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis],
+                          axis=1).sum(axis=1)
+
+
+class Bitmap:
+    """A compressed set of row positions, among a fixed number of rows."""
+
+    def __init__(self, size, containers=None):
+        """Create a new `Bitmap`.
+
+        :param size: The number of rows, whose positions are `0` to
+        `size - 1`.
+        :param containers: An optional mapping from container numbers to
+        non-empty containers, as made by `from_positions`.
+        """
+        self.size = size
+        self._containers = dict(containers or {})
+        # The number of positions, counted on first use:
+        self._length = None
+
+    @classmethod
+    def from_positions(cls, positions, size):
+        """Make a `Bitmap` of the given positions.
+
+        :param positions: An iterable of positions below `size`.
+        :param size: The number of rows.
+        :return: A new `Bitmap`.
+        """
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        if len(positions) and not 0 <= positions[0] <= positions[-1] < size:
+            raise ValueError(f"Positions must be between 0 and {size - 1}.")
+        keys, starts = np.unique(positions >> 16, return_index=True)
+        return cls(size, {
+            int(key): _shrink(offsets.astype(np.uint16))
+            for key, offsets in zip(keys, np.split(positions & 0xFFFF,
+                                                   starts[1:]))})
+
+    @classmethod
+    def from_mask(cls, mask):
+        """Make a `Bitmap` of the positions where a boolean mask is True."""
+        return cls.from_positions(np.flatnonzero(mask), len(mask))
+
+    def __len__(self):
+        """Return the number of positions in this set."""
+        if self._length is None:
+            self._length = sum(_count(container)
+                               for container in self._containers.values())
+        return self._length
+
+    @property
+    def nbytes(self):
+        """Return the number of bytes taken by the containers."""
+        return sum(container.nbytes
+                   for container in self._containers.values())
+
+    def positions(self):
+        """Return a sorted array of the positions in this set."""
+        if not self._containers:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([
+            (key << 16) + _offsets(self._containers[key]).astype(np.int64)
+            for key in sorted(self._containers)])
+
+    def contains(self, positions):
+        """Test whether each of an array of positions is in this set.
+
+        :param positions: A sorted array of positions.
+        :return: A boolean mask of the positions in this set.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        found = np.zeros(len(positions), dtype=bool)
+        keys, starts = np.unique(positions >> 16, return_index=True)
+        stops = np.append(starts[1:], len(positions))
+        for key, start, stop in zip(keys.tolist(), starts, stops):
+            container = self._containers.get(key)
+            if container is not None:
+                found[start:stop] = _test(container,
+                                          positions[start:stop] & 0xFFFF)
+        return found
+
+    def __and__(self, other):
+        """Return the positions in both this set and `other`."""
+        self._check(other)
+        containers = {}
+        for key in self._containers.keys() & other._containers.keys():
+            mine, theirs = self._containers[key], other._containers[key]
+            if _is_array(mine) and _is_array(theirs):
+                both = np.intersect1d(mine, theirs, assume_unique=True)
+            elif _is_array(mine):
+                both = mine[_test(theirs, mine)]
+            elif _is_array(theirs):
+                both = theirs[_test(mine, theirs)]
+            else:
+                both = _shrink(mine & theirs)
+            if len(both):
+                containers[key] = both
+        return Bitmap(self.size, containers)
+
+    def __or__(self, other):
+        """Return the positions in this set, `other` or both."""
+        self._check(other)
+        containers = dict(self._containers)
+        for key, theirs in other._containers.items():
+            mine = containers.get(key)
+            if mine is None:
+                containers[key] = theirs
+            elif _is_array(mine) and _is_array(theirs):
+                containers[key] = _shrink(np.union1d(mine, theirs))
+            else:
+                containers[key] = _dense(mine) | _dense(theirs)
+        return Bitmap(self.size, containers)
+
+    def __invert__(self):
+        """Return the positions not in this set."""
+        containers = {}
+        for key in range(-(-self.size // CONTAINER_SIZE)):
+            rows = min(CONTAINER_SIZE, self.size - key * CONTAINER_SIZE)
+            container = self._containers.get(key)
+            inverted = _full(rows)
+            if container is not None:
+                inverted &= ~_dense(container)
+            inverted = _shrink(inverted)
+            if len(inverted):
+                containers[key] = inverted
+        return Bitmap(self.size, containers)
+
+    def __sub__(self, other):
+        """Return the positions in this set but not in `other`."""
+        self._check(other)
+        containers = {}
+        for key, mine in self._containers.items():
+            theirs = other._containers.get(key)
+            if theirs is None:
+                left = mine
+            elif _is_array(mine):
+                left = mine[~_test(theirs, mine)]
+            else:
+                left = _shrink(mine & ~_dense(theirs))
+            if len(left):
+                containers[key] = left
+        return Bitmap(self.size, containers)
+
+    def __eq__(self, other):
+        """Return whether `other` is a `Bitmap` of the same positions."""
+        if not isinstance(other, Bitmap):
+            return NotImplemented
+        return (self.size == other.size
+                and np.array_equal(self.positions(), other.positions()))
+
+    def __repr__(self):
+        """Return `repr(self)`."""
+        return (f"Bitmap(size={self.size!r}, positions={len(self)}, "
+                f"nbytes={self.nbytes})")
+
+    def _check(self, other):
+        """Raise a `ValueError` if `other` has a different number of rows."""
+        if self.size != other.size:
+            raise ValueError(f"Can't combine bitmaps of {self.size} and "
+                             f"{other.size} rows.")
+
+
+def _is_array(container):
+    """Return whether a container is an array of offsets."""
+    return container.dtype == np.uint16
+
+
+def _count(container):
+    """Return the number of positions in a container."""
+    if _is_array(container):
+        return len(container)
+    return int(_POPCOUNT[container].sum())
+
+
+def _offsets(container):
+    """Return the sorted offsets of the positions in a container."""
+    if _is_array(container):
+        return container
+    return np.flatnonzero(np.unpackbits(container, bitorder='little')
+                          ).astype(np.uint16)
+
+
+def _dense(container):
+    """Return a container as packed bits."""
+    if not _is_array(container):
+        return container
+    bits = np.zeros(CONTAINER_SIZE, dtype=bool)
+    bits[container] = True
+    return np.packbits(bits, bitorder='little')
+
+
+def _full(rows):
+    """Return packed bits of the first `rows` offsets."""
+    bits = np.zeros(CONTAINER_SIZE, dtype=bool)
+    bits[:rows] = True
+    return np.packbits(bits, bitorder='little')
+
+
+def _shrink(container):
+    """Return a container in its smaller form."""
+    if _is_array(container):
+        return container if len(container) <= ARRAY_LIMIT else _dense(
+            container)
+    if _count(container) <= ARRAY_LIMIT:
+        return _offsets(container)
+    return container
+
+
+def _test(container, offsets):
+    """Return a mask of the offsets whose positions are in a container."""
+    if _is_array(container):
+        return np.isin(offsets, container, assume_unique=False)
+    offsets = offsets.astype(np.int64)
+    return ((container[offsets >> 3] >> (offsets & 7)) & 1).astype(bool)
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
@@ -6,12 +6,240 @@ their close approaches.
 A `NEODatabase` holds an interconnected data set of NEOs and close
 approaches.  It provides methods to fetch an NEO by primary
 designation or by name, as well as a method to query the set of
-close approaches that match a collection of user-specified criteria.
+close approaches that match a collection of user-specified criteria,
+either all at once or a page at a time, or to just count them.
 
 Under normal circumstances, the main module creates one NEODatabase
 from the data on NEOs and close approaches extracted by
-`extract.load_neos` and `extract.load_approaches`.
+`extract.load_neos` and `extract.load_approaches`. A database can also
+be saved to a memory-mapped column store (see the `store` module), and
+reopened from it without loading the data files again.
 """
+import base64
+import datetime
+import hashlib
+import operator
+import time
+
+import numpy as np
+import pandas as pd
+
+from bitmap import Bitmap
+from filters import (DateFilter, DiameterFilter, DistanceFilter,
+                     HazardousFilter, VelocityFilter,
+                     UnsupportedCriterionError)
+from grid import GridIndex
+from index import NameIndex
+from kdtree import KDTree
+from models import NearEarthObject, CloseApproach
+from store import ColumnStore, write_store
+from summary import NEOSummary, COLUMNS as SUMMARY_COLUMNS
+
+
+# Comparators of date filters that bound a contiguous range of times:
+_RANGE_OPS = (operator.eq, operator.ge, operator.le)
+
+# Queries evaluate their remaining filters on just the rows left, rather
+# than on whole chunks of rows, once fewer than 1 in this many are left:
+_GATHER_FRACTION = 4
+
+# The columns of the grid index, by the filters that bound them:
+_GRID_COLUMNS = {DateFilter: 'time', DistanceFilter: 'distance',
+                 VelocityFilter: 'velocity'}
+
+# The units of time by which approaches can be partitioned:
+_PARTITIONS = {'year': 'datetime64[Y]', 'month': 'datetime64[M]'}
+
+
+class InvalidCursorError(ValueError):
+    """A page cursor is malformed or belongs to a different data set."""
+
+
+class ColumnFields:
+    """Look up the column values of close approaches, for export.
+
+    A `ColumnFields` is a callable that maps a `CloseApproach` of an
+    `NEODatabase` to a dictionary of the values of the named columns,
+    which the writers in the `write` module add to each output record.
+    """
+
+    def __init__(self, names, columns):
+        """Create a new `ColumnFields`.
+
+        :param names: The names of the columns to look up.
+        :param columns: The columns of an `NEODatabase`.
+        """
+        self.names = tuple(names)
+        self._columns = [columns[name] for name in self.names]
+
+    def __call__(self, approach):
+        """Return the column values of one close approach."""
+        return {name: column[approach._row].item()
+                for name, column in zip(self.names, self._columns)}
+
+    def at(self, positions):
+        """Return the columns of the approaches at some positions.
+
+        :param positions: An array of positions, as returned by
+        `NEODatabase.query_positions`.
+        :return: A `ColumnFields` which looks up the `i`th of those
+        approaches at row `i`, rather than at its own row.
+        """
+        return ColumnFields(self.names,
+                            {name: column[positions] for name, column
+                             in zip(self.names, self._columns)})
+
+
+class _Columns:
+    """Columns of approach attributes and of their NEOs' attributes.
+
+    Approach columns have one entry per approach. NEO columns have one
+    entry per NEO, plus a trailing missing entry, and are gathered for
+    approaches through the approaches' NEO rows (-1 if unlinked).
+    """
+
+    def __init__(self, approach_columns, neo_columns, neo_rows):
+        self.approach_columns = approach_columns
+        self.neo_columns = neo_columns
+        self.neo_rows = neo_rows
+
+    def __getitem__(self, name):
+        return self.take(name, slice(None))
+
+    def take(self, name, rows):
+        """Return a column's entries for the approaches at `rows`."""
+        if name in self.approach_columns:
+            return self.approach_columns[name][rows]
+        if name in self.neo_columns:
+            return self.neo_columns[name][self.neo_rows[rows]]
+        raise UnsupportedCriterionError(f"No {name!r} column is loaded.")
+
+
+class _LazySequence:
+    """A read-only sequence of items made from rows on first access."""
+
+    def __init__(self, rows, make):
+        self._rows = rows
+        self._make = make
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._make(int(row)) for row in self._rows[index]]
+        return self._make(int(self._rows[index]))
+
+
+class _ColumnSubset(dict):
+    """The rows of a `_Columns`, gathered on first access."""
+
+    def __init__(self, columns, rows):
+        super().__init__()
+        self._columns = columns
+        self._rows = rows
+
+    def __missing__(self, name):
+        column = self[name] = self._columns.take(name, self._rows)
+        return column
+
+
+class _FilterPlan:
+    """The column filters of one query, ordered by their measured costs.
+
+    On the first `NEODatabase.sample_size` rows, every filter is
+    evaluated on every row, and the time it takes and the number of rows
+    that pass are measured. After that, each filter is only evaluated on
+    the rows that passed the filters before it, so the filters are put
+    in increasing order of their cost per rejected row - cheap and
+    selective filters first - which is the order that minimizes the
+    expected cost of the chain of filters.
+
+    While the database's `filter_stats` are recording, every row is
+    measured, so that the recorded selectivities aren't skewed by the
+    filters before them.
+    """
+
+    def __init__(self, database, filters):
+        self._database = database
+        stats = database.filter_stats
+        self.filters = stats.order(filters) if stats else list(filters)
+        # Filters without column support, evaluated on each approach:
+        self.unsupported = []
+        self._stats = stats if stats and stats.recording else None
+        self._sampled = 0
+        self._seconds = [0.0] * len(self.filters)
+        self._passed = [0] * len(self.filters)
+
+    def rows(self, start, stop):
+        """Return the rows between `start` and `stop` that pass the filters.
+
+        :return: An array of the matching rows, in order.
+        """
+        if self._sampled >= self._database.sample_size and not self._stats:
+            return self._filter(start, stop)
+
+        columns = _ColumnSubset(self._database._columns, slice(start, stop))
+        mask = np.ones(stop - start, dtype=bool)
+        measured = []
+        for index, _filter in enumerate(self.filters):
+            began = time.perf_counter()
+            try:
+                passed = _filter.mask(columns)
+            except UnsupportedCriterionError:
+                self.unsupported.append(_filter)
+                continue
+            self._seconds[index] += time.perf_counter() - began
+            self._passed[index] += int(np.count_nonzero(passed))
+            measured.append(index)
+            if self._stats:
+                self._stats.record(_filter, stop - start,
+                                   int(np.count_nonzero(passed)))
+            mask &= passed
+
+        self._sampled += stop - start
+        self._seconds = [self._seconds[i] for i in measured]
+        self._passed = [self._passed[i] for i in measured]
+        self.filters = [self.filters[i] for i in measured]
+        if self._sampled >= self._database.sample_size:
+            self._reorder()
+        return np.flatnonzero(mask) + start
+
+    def _filter(self, start, stop):
+        """Evaluate the filters in order, each on the rows left by the last.
+
+        While most rows are left, the filters are evaluated on slices of
+        whole columns, which are cheaper to read than gathered rows.
+        """
+        size = stop - start
+        columns = _ColumnSubset(self._database._columns, slice(start, stop))
+        mask = np.ones(size, dtype=bool)
+        rows = None
+        for _filter in self.filters:
+            if rows is None:
+                mask &= _filter.mask(columns)
+                left = np.count_nonzero(mask)
+                if left * _GATHER_FRACTION < size:
+                    rows = np.flatnonzero(mask) + start
+            else:
+                rows = rows[_filter.mask(_ColumnSubset(self._database._columns,
+                                                       rows))]
+                left = len(rows)
+            if not left:
+                break
+        return rows if rows is not None else np.flatnonzero(mask) + start
+
+    def _reorder(self):
+        """Order the filters by their cost per rejected row."""
+        def rank(index):
+            rejected = self._sampled - self._passed[index]
+            if not rejected:
+                return float('inf')
+            return self._seconds[index] / rejected
+        order = sorted(range(len(self.filters)), key=rank)
+        self.filters = [self.filters[i] for i in order]
+        self._seconds = [self._seconds[i] for i in order]
+        self._passed = [self._passed[i] for i in order]
 
 
 class NEODatabase:
@@ -24,7 +252,31 @@ class NEODatabase:
     criteria.
     """
 
-    def __init__(self, neos, approaches):
+    # The number of rows that queries mask at a time:
+    chunk_size = 4096
+
+    # The number of rows on which queries measure every filter, before
+    # ordering them for the rest of the scan:
+    sample_size = 4096
+
+    # The grid index over approach times, distances and velocities, built
+    # on first use (see `_range_index`):
+    _grid = None
+
+    # The bitmaps of approach positions by NEO flags and by year, built on
+    # first use (see `_bitmaps`):
+    _bitmap_index = None
+
+    # The k-d trees over approach distances, velocities and diameters,
+    # built on first use (see `_similarity_index`):
+    _similarity = None
+
+    # An optional `selectivity.FilterStats`, by which queries order their
+    # filters most-selective-first (and which records them, if enabled):
+    filter_stats = None
+
+    def __init__(self, neos, approaches, neo_columns=None,
+                 approach_columns=None):
         """Create a new `NEODatabase`.
 
         As a precondition, this constructor assumes that the
@@ -38,8 +290,14 @@ class NEODatabase:
         the corresponding NEO. This constructor modifies the supplied
         NEOs and close approaches to link them together - after it's
         done, the `.approaches` attribute of each NEO has a collection
-        of that NEO's close approaches, and the `.neo` attribute of
-        each close approach references the appropriate NEO.
+        of that NEO's close approaches (sorted by time), and the `.neo`
+        attribute of each close approach references the appropriate NEO.
+
+        Additional NEO attributes, such as orbital elements, aren't
+        stored on the NEOs: they are given as `neo_columns` and kept as
+        arrays, so that filters can compare them as whole columns.
+        Additional close approach fields, such as the 3-sigma distance
+        bounds, are likewise given as `approach_columns`.
 
         :param neo_by_name: A dictionary comprehension of NEOs with
         the key value being the name of the NEO.
@@ -49,23 +307,282 @@ class NEODatabase:
         corresponding neos populated and subsequently populated approaches.
         :param neos: A collection of `NearEarthObject`s with
         corresponding approaches populated.
+        :param neo_columns: An optional mapping from column names to
+        arrays of NEO attributes, including a 'pdes' column of primary
+        designations, as returned by `extract.load_neo_columns`.
+        :param approach_columns: An optional mapping from column names
+        to arrays of close approach fields, parallel to `approaches`,
+        as returned by `extract.load_approach_columns`.
         """
         # Dictionary comprehension to find neo by '.name':
         self.neo_by_name = {i.name: i for i in neos}
         # Dictionary comprehension to find neo by '.designation':
         self.neo_by_designation = {i.designation: i for i in neos}
 
-        # List comprehension of approaches with linked neos and subsequently
-        # linked approaches to 'linked_neo'.
-        self._approaches = [i.link_neo(self.neo_by_designation)
-                            for i in approaches]
+        # NEOs by dense integer id (their position in this list):
+        self._neos = list(self.neo_by_designation.values())
+
+        # Approaches linked to their NEOs with a vectorized join, which
+        # also interns the approaches' designations, and the integer id
+        # of each approach's NEO (-1 if unlinked):
+        self._approaches = list(approaches)
+        neo_rows = _link(self._neos, self._approaches)
+        # Each approach's row in the columns below:
+        for row, approach in enumerate(self._approaches):
+            approach._row = row
+
+        # Sort each NEO's linked approaches by time, for binary searches
+        # with 'approaches_between' and 'next_approach':
+        for neo in self.neo_by_designation.values():
+            neo.sort_approaches()
+
+        # Case-insensitive index over names and designations, for
+        # exact, prefix and fuzzy lookups with 'search_names':
+        self._name_index = NameIndex(neos)
+
+        # Columnar per-NEO statistics about close approaches, for
+        # 'summarize' and 'select_neos':
+        self._summary = NEOSummary(self._neos, self._approaches,
+                                   neo_rows=neo_rows)
+
+        # Approach times, and the positions of the approaches sorted by
+        # time, to bisect date ranges and to page through results:
+        self._times = np.array([i.time for i in self._approaches],
+                               dtype='datetime64[m]')
+        self._by_time = np.argsort(self._times, kind='stable')
+        self._sorted_times = self._times[self._by_time]
+
+        # Columns of the attributes that filters compare: one entry per
+        # approach for approach attributes, and one entry per NEO (plus a
+        # trailing missing entry for unlinked approaches) for NEO
+        # attributes, for filtering without touching any objects.
+        neo_row = {designation: row for row, designation
+                   in enumerate(self.neo_by_designation)}
+        neo_attributes = {
+            'diameter': np.array([i.diameter for i in self._neos] + [np.nan],
+                                 dtype=np.float64),
+            'hazardous': np.array([i.hazardous for i in self._neos] + [False],
+                                  dtype=bool),
+        }
+        for name, values in (neo_columns or {}).items():
+            if name == 'pdes':
+                continue
+            # Align the column with the NEO rows, by designation:
+            aligned = np.full(len(neo_row) + 1, np.nan, dtype=np.float64)
+            for designation, value in zip(neo_columns['pdes'], values):
+                if designation in neo_row:
+                    aligned[neo_row[designation]] = value
+            neo_attributes[name] = aligned
+        approach_attributes = {
+            'time': self._times,
+            'date': self._times.astype('datetime64[D]'),
+            'distance': np.array([i.distance for i in self._approaches],
+                                 dtype=np.float64),
+            'velocity': np.array([i.velocity for i in self._approaches],
+                                 dtype=np.float64),
+        }
+        for name, values in (approach_columns or {}).items():
+            values = np.asarray(values, dtype=np.float64)
+            if len(values) != len(self._approaches):
+                raise ValueError(f"The {name!r} column has {len(values)} "
+                                 f"entries, but there are "
+                                 f"{len(self._approaches)} approaches.")
+            approach_attributes[name] = values
+        self._columns = _Columns(
+            approach_attributes,
+            neo_attributes,
+            neo_rows,
+        )
+
+        # A fingerprint of the data set, which page cursors embed so that
+        # they can't be resumed against different data:
+        digest = hashlib.sha1()
+        digest.update(self._times.astype(np.int64).tobytes())
+        digest.update('\n'.join(i._designation
+                                for i in self._approaches).encode())
+        digest.update(self._columns['distance'].tobytes())
+        self.fingerprint = digest.hexdigest()
+
+        # A grid index over approach times, distances and velocities, for
+        # queries that combine range filters on them:
+        self._range_index()
+
+    @classmethod
+    def open(cls, path, now=None):
+        """Open a database saved with `save`, without loading any data files.
+
+        Queries run directly over the columns in the store's
+        memory-mapped files, so opening a store takes time proportional
+        to the number of NEOs rather than of close approaches, and every
+        process that opens the same store shares one copy of its pages.
+        The NEOs are made when the store is opened, but each
+        `CloseApproach` is only made when it's first reached - by a
+        query, or through its NEO's `.approaches`.
+
+        :param path: The directory of a column store written by `save`.
+        :param now: The `datetime` after which approaches count as
+        "next" in NEO summaries (defaults to the current time).
+        :return: A new `NEODatabase`.
+        :raises StoreFormatError: If `path` isn't a column store.
+        """
+        store = ColumnStore(path)
+        columns = store.columns
+        database = cls.__new__(cls)
+
+        neos = [NearEarthObject(designation, name, 'Y' if hazardous else 'N',
+                                diameter)
+                for designation, name, diameter, hazardous
+                in zip(store.strings['neo.designation'],
+                       store.strings['neo.name'],
+                       columns['neo.diameter'].tolist(),
+                       columns['neo.hazardous'].tolist())]
+        database.neo_by_name = {i.name: i for i in neos}
+        database.neo_by_designation = {i.designation: i for i in neos}
+        database._neos = neos
+
+        # Close approaches, made on first access, by row:
+        database._made = {}
+        database._unlinked = columns['unlinked']
+        database._unlinked_designations = store.strings['unlinked.designation']
+        database._approaches = _LazySequence(range(len(columns['neo_rows'])),
+                                             database._approach)
+        # Each NEO's approaches, in time order, are a run of 'by_neo':
+        by_neo, offsets = columns['by_neo'], columns['neo_offsets']
+        for row, neo in enumerate(neos):
+            rows = by_neo[offsets[row]:offsets[row + 1]]
+            neo.approaches = _LazySequence(rows, database._approach)
+            neo._approach_times = _LazySequence(rows, database._approach_time)
+
+        database._name_index = NameIndex(neos)
+        database._summary = NEOSummary.from_columns(
+            neos,
+            {name: columns[f'summary.{name}'] for name in SUMMARY_COLUMNS},
+            columns['approach.time'][by_neo], offsets, now=now)
+        database._times = columns['approach.time']
+        database._by_time = columns['by_time']
+        database._sorted_times = columns['sorted_times']
+        database._columns = _Columns(
+            {name.split('.', 1)[1]: values for name, values in columns.items()
+             if name.startswith('approach.')},
+            {name.split('.', 1)[1]: values for name, values in columns.items()
+             if name.startswith('neo.')},
+            columns['neo_rows'],
+        )
+        database.fingerprint = store.metadata['fingerprint']
+        return database
+
+    def save(self, path):
+        """Save this database to a memory-mapped column store.
 
-        # List comprehension of neos with linked approaches from above linked
-        # 'self_approaches'.  This parameter is not used as lookup for querying
-        # or any other function or method moving forward in program, but it
-        # could be with minor coding changes, if determined necessary in the
-        # future.
-        self._neos = [i.neo for i in self._approaches]
+        Besides the columns of approach and NEO attributes, the store
+        keeps the time index, the NEO summary and each NEO's approaches
+        in time order, so that `NEODatabase.open` doesn't compute them
+        again.
+
+        :param path: The directory of the column store, which is
+        created if it doesn't exist.
+        """
+        neo_rows = self._columns.neo_rows
+        # Approaches grouped by NEO (unlinked ones first), in time order:
+        by_neo = self._by_time[np.argsort(neo_rows[self._by_time],
+                                          kind='stable')]
+        unlinked = np.flatnonzero(neo_rows < 0)
+
+        columns = {
+            'neo_rows': neo_rows,
+            'by_time': self._by_time,
+            'sorted_times': self._sorted_times,
+            'by_neo': by_neo,
+            'neo_offsets': np.searchsorted(neo_rows[by_neo],
+                                           np.arange(len(self._neos) + 1)),
+            'unlinked': unlinked,
+        }
+        for name, values in self._columns.approach_columns.items():
+            columns[f'approach.{name}'] = values
+        for name, values in self._columns.neo_columns.items():
+            columns[f'neo.{name}'] = values
+        for name in SUMMARY_COLUMNS:
+            columns[f'summary.{name}'] = getattr(self._summary, name)
+
+        strings = {
+            'neo.designation': [i.designation for i in self._neos],
+            'neo.name': [i.name or '' for i in self._neos],
+            'unlinked.designation': [self._approaches[i]._designation
+                                     for i in unlinked],
+        }
+        write_store(path, columns, strings,
+                    metadata={'fingerprint': self.fingerprint})
+
+    def extended(self, approaches, approach_columns=None):
+        """Return a new database with additional close approaches.
+
+        This database, and its NEOs and close approaches, are left
+        untouched: the new database is built from copies of them, so
+        queries that are still running over this database are
+        unaffected (see the `snapshot` module).
+
+        :param approaches: A collection of new, unlinked `CloseApproach`es.
+        :param approach_columns: An optional mapping from the names of
+        this database's additional approach columns to arrays of the
+        new approaches' fields. Missing fields are NaN.
+        :return: A new `NEODatabase`, which shares this database's
+        `filter_stats`.
+        """
+        neos = [NearEarthObject(neo.designation, neo.name or '',
+                                'Y' if neo.hazardous else 'N', neo.diameter)
+                for neo in self._neos]
+        approaches = list(approaches)
+        copies = [CloseApproach(approach._designation, approach.time,
+                                approach.distance, approach.velocity)
+                  for approach in self._approaches]
+
+        neo_columns = {name: values[:-1] for name, values
+                       in self._columns.neo_columns.items()
+                       if name not in ('diameter', 'hazardous')}
+        neo_columns['pdes'] = [neo.designation for neo in neos]
+        extra_columns = {}
+        for name, values in self._columns.approach_columns.items():
+            if name in ('time', 'date', 'distance', 'velocity'):
+                continue
+            new = (approach_columns or {}).get(name)
+            if new is None:
+                new = np.full(len(approaches), np.nan)
+            extra_columns[name] = np.concatenate([values, new])
+        database = NEODatabase(neos, copies + approaches, neo_columns,
+                               extra_columns)
+        # Keep ordering (and recording) filters by what's been learned.
+        database.filter_stats = self.filter_stats
+        return database
+
+    def _approach(self, row):
+        """Return the approach at a row of an opened store, made once."""
+        approach = self._made.get(row)
+        if approach is None:
+            neo_row = int(self._columns.neo_rows[row])
+            if neo_row >= 0:
+                designation = self._neos[neo_row].designation
+            else:
+                designation = self._unlinked_designations[
+                    int(np.searchsorted(self._unlinked, row))]
+            approach = CloseApproach(
+                designation,
+                self._approach_time(row),
+                self._columns.approach_columns['distance'][row],
+                self._columns.approach_columns['velocity'][row])
+            approach._row = row
+            if neo_row >= 0:
+                approach.neo = self._neos[neo_row]
+            # Threads that make the same approach at once keep the first:
+            approach = self._made.setdefault(row, approach)
+        return approach
+
+    def _approach_time(self, row):
+        """Return the time of the approach at a row, as a `datetime`."""
+        return self._times[row].item()
+
+    def __len__(self):
+        """Return the number of close approaches."""
+        return len(self._approaches)
 
     def get_neo_by_designation(self, designation):
         """Find and return an NEO by its primary designation.
@@ -109,6 +626,89 @@ class NEODatabase:
         else:
             return None
 
+    def search_names(self, text, match='exact', max_distance=1, limit=None):
+        """Find NEOs by name or primary designation.
+
+        Unlike `get_neo_by_name`, the matching ignores capitalization,
+        and it considers both names and primary designations.
+
+        :param text: The name or designation, as a string, to search for.
+        :param match: 'exact' for whole-key matches, 'prefix' for keys
+        that start with `text`, or 'fuzzy' for keys within
+        `max_distance` edits of `text`.
+        :param max_distance: The largest edit distance accepted by a
+        'fuzzy' match.
+        :param limit: The maximum number of NEOs to return, or None.
+        :return: A list of matching `NearEarthObject`s.
+        """
+        if match == 'exact':
+            return self._name_index.exact(text)[:limit]
+        if match == 'prefix':
+            return self._name_index.prefix(text, limit)
+        if match == 'fuzzy':
+            return self._name_index.fuzzy(text, max_distance, limit)
+        raise ValueError(f"Invalid match: {match!r}. Please specify one "
+                         f"of 'exact', 'prefix' or 'fuzzy'.")
+
+    def summarize(self, neo):
+        """Return precomputed statistics about an NEO's close approaches.
+
+        :param neo: A `NearEarthObject` in this database.
+        :return: A dictionary with the number of close approaches
+        ('count'), the closest approach distance and its time
+        ('min_distance', 'min_distance_time'), the fastest relative
+        velocity ('max_velocity'), and the times of the first, last and
+        next future approaches ('first_time', 'last_time', 'next_time').
+        Missing values are None.
+        """
+        return self._summary.describe(neo)
+
+    def select_neos(self, **criteria):
+        """Find NEOs by the statistics of their close approaches.
+
+        For example, `select_neos(distance_max=0.01)` finds the NEOs
+        whose closest approach is within 0.01 au. The criteria are
+        answered from the precomputed summary table, without visiting
+        any close approaches.
+
+        :param criteria: Any of `distance_min`, `distance_max`,
+        `velocity_min`, `velocity_max`, `count_min` and `count_max`.
+        :return: A list of matching `NearEarthObject`s.
+        """
+        return self._summary.select(**criteria)
+
+    def approach_fields(self, names):
+        """Look up columns of close approaches, for export.
+
+        :param names: The names of approach or NEO columns, such as
+        'dist_min' or 'moid'.
+        :return: A `ColumnFields` to pass as `extras` to the writers of
+        the `write` module.
+        :raises UnsupportedCriterionError: If a column isn't loaded.
+        """
+        return ColumnFields(names, self._columns)
+
+    def check_filters(self, filters):
+        """Check that every filter can be evaluated on this database.
+
+        Filters on additional columns can only be evaluated if their
+        column is loaded, which a query would otherwise only find out
+        once it reaches a row that passes the other filters.
+
+        :param filters: A collection of filters capturing
+        user-specified criteria.
+        :raises UnsupportedCriterionError: If a filter's column isn't
+        loaded.
+        """
+        columns = _ColumnSubset(self._columns, np.empty(0, dtype=np.int64))
+        for _filter in filters:
+            try:
+                _filter.column(columns)
+            except UnsupportedCriterionError:
+                # Without column support, it must work on approaches.
+                if len(self._approaches):
+                    _filter(self._approaches[0])
+
     def query(self, filters=()):
         """Return filtered or unfiltered approaches.
 
@@ -129,16 +729,564 @@ class NEODatabase:
         user-specified criteria.
         :return: A stream of matching `CloseApproach` objects.
         """
-        # All known close approaches:
-        approaches = self._approaches
-        # All known, filtered approaches (if filters exist):
-        if filters:
-            for _filter in filters:
-                approaches = filter(_filter, approaches)
-        # Generates filtered or unfiltered approaches depending on
-        # if filters exist or not:
-        for approach in approaches:
-            yield approach
+        # Without filters, generate all known close approaches:
+        if not filters:
+            yield from self._approaches
+            return
+
+        # Filters that bound a small part of the grid index are evaluated
+        # on just the rows of the cells within their bounds:
+        rows = self._indexed_rows(filters)
+        if rows is not None:
+            yield from self.approaches_at(self.query_positions(filters,
+                                                               within=rows))
+            return
+
+        # Otherwise, evaluate the filters on columns a chunk of rows at a
+        # time (so that a limited stream stops early), in an order adapted
+        # to their measured cost and selectivity, and only evaluate
+        # filters without columns on each approach.
+        plan = _FilterPlan(self, filters)
+        for start in range(0, len(self._approaches), self.chunk_size):
+            stop = min(start + self.chunk_size, len(self._approaches))
+            for i in plan.rows(start, stop):
+                approach = self._approaches[i]
+                if all(_filter(approach) for _filter in plan.unsupported):
+                    yield approach
+
+    def count(self, filters=()):
+        """Count the approaches that match a collection of filters.
+
+        No `CloseApproach` objects are visited for filters that can be
+        evaluated on columns. Date filters are answered by binary
+        searches of the approach times, so a pure time-range count is
+        just the difference of two offsets; any other filters are
+        evaluated as column masks over the rows within that range.
+
+        :param filters: A collection of filters capturing
+        user-specified criteria.
+        :return: The number of matching approaches.
+        """
+        start, stop = self._time_range(filters)
+        remaining = [_filter for _filter in filters
+                     if not (isinstance(_filter, DateFilter)
+                             and _filter.op in _RANGE_OPS)]
+        if not remaining:
+            return stop - start
+
+        rows = self._indexed_rows(filters, within=stop - start)
+        if rows is None:
+            rows = self._by_time[start:stop]
+        else:
+            remaining = filters
+        mask, unsupported = self._mask(remaining,
+                                       _ColumnSubset(self._columns, rows),
+                                       len(rows))
+        if not unsupported:
+            return int(np.count_nonzero(mask))
+        # Filters without columns are evaluated on the surviving rows.
+        return sum(1 for i in rows[mask]
+                   if all(_filter(self._approaches[i])
+                          for _filter in unsupported))
+
+    def query_positions(self, filters=(), within=None):
+        """Return the positions of the approaches that match the filters.
+
+        The positions are a compact array, in internal order, that can
+        be turned back into approaches with `approaches_at` - or passed
+        back as `within` to narrow a previous result set, at a cost
+        proportional to the size of that set rather than of the whole
+        database.
+
+        :param filters: A collection of filters capturing
+        user-specified criteria.
+        :param within: An optional array of positions, as returned by
+        this method, to which the matches are restricted.
+        :return: A sorted `numpy` array of matching positions.
+        """
+        if within is not None:
+            rows = np.asarray(within, dtype=np.int64)
+        else:
+            start, stop = self._time_range(filters)
+            rows = self._indexed_rows(filters, within=stop - start)
+            if rows is None:
+                rows = np.sort(self._by_time[start:stop])
+        mask, unsupported = self._mask(filters,
+                                       _ColumnSubset(self._columns, rows),
+                                       len(rows))
+        rows = rows[mask]
+        if unsupported:
+            keep = [all(_filter(self._approaches[i]) for _filter in unsupported)
+                    for i in rows]
+            rows = rows[np.array(keep, dtype=bool)]
+        return rows
+
+    def partition_positions(self, positions, by='year'):
+        """Split positions of approaches into partitions by time.
+
+        :param positions: An array of positions, as returned by
+        `query_positions`.
+        :param by: 'year' or 'month'.
+        :return: A list of `(key, positions)` pairs, in time order, with
+        keys such as '2020' or '2020-01', and each partition's positions
+        in the order of `positions`.
+        """
+        if by not in _PARTITIONS:
+            raise ValueError(f"Invalid partition: {by!r}. Please specify "
+                             f"one of {', '.join(map(repr, _PARTITIONS))}.")
+        positions = np.asarray(positions, dtype=np.int64)
+        keys = self._times[positions].astype(_PARTITIONS[by])
+        order = np.argsort(keys, kind='stable')
+        values, starts = np.unique(keys[order], return_index=True)
+        return [(str(key), positions[rows]) for key, rows
+                in zip(values, np.split(order, starts[1:]))]
+
+    def approaches_at(self, positions):
+        """Generate the approaches at the given positions.
+
+        :param positions: An iterable of positions, as returned by
+        `query_positions`.
+        :return: A stream of `CloseApproach` objects.
+        """
+        for i in positions:
+            yield self._approaches[i]
+
+    def similar(self, approach, k=10):
+        """Find the close approaches most like a given one.
+
+        Approaches are compared by their distance, their velocity and
+        their NEO's diameter (on a log scale, as diameters span orders of
+        magnitude), each divided by its standard deviation so that they
+        count alike. An approach whose NEO's diameter is known is
+        compared with the other approaches whose NEO's diameter is known;
+        one whose NEO's diameter is unknown is compared with every other
+        approach by distance and velocity alone.
+
+        The comparisons are made in a k-d tree, built on the first call.
+
+        :param approach: A `CloseApproach` of this database.
+        :param k: The number of approaches to find.
+        :return: A list of up to `k` other `CloseApproach`es, most
+        similar first.
+        :raises ValueError: If `approach` isn't one of this database's.
+        """
+        row = getattr(approach, '_row', None)
+        if (row is None or not 0 <= row < len(self)
+                or self._approaches[row] is not approach):
+            raise ValueError(f"{approach} isn't in this database.")
+        diameter = self._columns.take('diameter', row)
+        tree, rows = self._similarity_index(
+            bool(np.isfinite(diameter) and diameter > 0))
+        position = int(np.searchsorted(rows, row))
+        positions, _ = tree.nearest(tree.points[position], k,
+                                    exclude=(position,))
+        return list(self.approaches_at(rows[positions].tolist()))
+
+    def bitmap(self, name):
+        """Return a compressed bitmap of the positions of some approaches.
+
+        The bitmaps are built on first use, and combine with `&`, `|`,
+        `~` and `-` into other sets of positions, without touching any
+        approaches - for instance, the approaches of hazardous but unnamed
+        NEOs in 2020 are
+
+            (db.bitmap('hazardous') - db.bitmap('named')) & db.bitmap('2020')
+
+        whose `.positions()` can be passed to `approaches_at`, or as
+        `within` to `query_positions`.
+
+        :param name: 'hazardous', 'diameter-known' or 'named', for the
+        approaches of NEOs that are potentially hazardous, whose diameter
+        is known, or that have an IAU name; or a year, such as '2020',
+        for the approaches in that year.
+        :return: A `bitmap.Bitmap` of approach positions.
+        :raises KeyError: If there's no such bitmap.
+        """
+        bitmaps = self._bitmaps()
+        if name not in bitmaps:
+            raise KeyError(f"No {name!r} bitmap; expected 'hazardous', "
+                           f"'diameter-known', 'named' or a year.")
+        return bitmaps[name]
+
+    def query_batch(self, filter_sets, chunk_size=65536):
+        """Query close approaches for many collections of filters at once.
+
+        Rather than scanning the approaches once per collection of
+        filters, this makes a single pass over the approaches: every
+        collection is evaluated as column masks over a chunk of rows,
+        and each matching row is routed to every collection that it
+        satisfies.
+
+        :param filter_sets: A sequence of collections of filters.
+        :param chunk_size: The number of rows to mask at a time.
+        :return: A stream of `(index, approach)` pairs, where `index`
+        is the position in `filter_sets` of a collection of filters that
+        `approach` matches. Approaches are generated in internal order,
+        as with `query`.
+        """
+        for start in range(0, len(self._approaches), chunk_size):
+            stop = min(start + chunk_size, len(self._approaches))
+            # Columns are sliced once per chunk, and shared by all queries.
+            columns = _ColumnSubset(self._columns, slice(start, stop))
+            masks = np.empty((len(filter_sets), stop - start), dtype=bool)
+            unsupported = []
+            for index, filters in enumerate(filter_sets):
+                masks[index], remaining = self._mask(filters, columns,
+                                                     stop - start)
+                unsupported.append(remaining)
+            # Route each matching row, in order, to its queries.
+            for row, index in zip(*np.nonzero(masks.T)):
+                approach = self._approaches[start + row]
+                if all(_filter(approach) for _filter in unsupported[index]):
+                    yield int(index), approach
+
+    def _mask(self, filters, columns, size):
+        """Evaluate filters as column masks, where they support it.
+
+        With `filter_stats`, the most selective filters are evaluated
+        first, and the rest are skipped once no rows are left; while it's
+        recording, every evaluated filter's passes are counted.
+
+        :param filters: A collection of filters.
+        :param columns: A mapping from column names to arrays of the
+        rows to evaluate.
+        :param size: The number of rows to evaluate.
+        :return: A tuple of the boolean mask of rows that satisfy every
+        filter with column support, and a list of the filters without
+        column support.
+        """
+        stats = self.filter_stats
+        if stats is not None:
+            filters = stats.order(filters)
+        mask = np.ones(size, dtype=bool)
+        unsupported = []
+        for _filter in filters:
+            try:
+                passed = _filter.mask(columns)
+            except UnsupportedCriterionError:
+                unsupported.append(_filter)
+                continue
+            mask &= passed
+            if stats is None:
+                continue
+            if stats.recording:
+                stats.record(_filter, size, int(np.count_nonzero(passed)))
+            if not mask.any():
+                break
+        return mask, unsupported
+
+    def query_page(self, filters=(), page_size=100, cursor=None):
+        """Return one page of the approaches that match the filters.
+
+        Pages are in time order. Each page comes with an opaque cursor
+        which resumes the query right after that page, so fetching a
+        page costs time proportional to the rows it examines rather than
+        to the number of rows on all of the previous pages. Date filters
+        narrow the examined rows with binary searches.
+
+        :param filters: A collection of filters capturing
+        user-specified criteria.
+        :param page_size: The maximum number of approaches on a page.
+        :param cursor: The cursor returned with the previous page, or
+        None for the first page.
+        :return: A tuple of a list of matching `CloseApproach` objects
+        and the cursor of the next page (None after the last page).
+        :raises InvalidCursorError: If the cursor is malformed, or was
+        returned by a database with different data or for different
+        filters.
+        """
+        start, stop = self._time_range(filters)
+        if cursor is not None:
+            start = max(start, self._decode_cursor(cursor, filters))
+        page = []
+        position = start
+        while position < stop and len(page) < page_size:
+            # Mask a block of rows, in time order, at a time:
+            block = self._by_time[position:min(stop, position + page_size)]
+            mask, unsupported = self._mask(
+                filters, _ColumnSubset(self._columns, block), len(block))
+            for offset in np.flatnonzero(mask):
+                approach = self._approaches[block[offset]]
+                if all(_filter(approach) for _filter in unsupported):
+                    page.append(approach)
+                    if len(page) == page_size:
+                        position += int(offset) + 1
+                        break
+            else:
+                position += len(block)
+        if position < stop:
+            return page, self._encode_cursor(position, filters)
+        return page, None
+
+    def _time_range(self, filters):
+        """Bisect the positions, in time order, allowed by date filters.
+
+        :param filters: A collection of filters capturing
+        user-specified criteria.
+        :return: A `(start, stop)` range of positions in time order,
+        outside of which no approach matches the date filters.
+        """
+        start_date = end_date = None
+        for _filter in filters:
+            if not isinstance(_filter, DateFilter):
+                continue
+            if _filter.op in (operator.eq, operator.ge):
+                if start_date is None or _filter.value > start_date:
+                    start_date = _filter.value
+            if _filter.op in (operator.eq, operator.le):
+                if end_date is None or _filter.value < end_date:
+                    end_date = _filter.value
+        start, stop = 0, len(self._sorted_times)
+        if start_date is not None:
+            start = int(np.searchsorted(self._sorted_times,
+                                        np.datetime64(start_date, 'm')))
+        if end_date is not None:
+            end_date += datetime.timedelta(days=1)
+            stop = int(np.searchsorted(self._sorted_times,
+                                       np.datetime64(end_date, 'm')))
+        return start, max(start, stop)
+
+    def _range_index(self):
+        """Return the grid index over approach times, distances and velocities.
+
+        Times are indexed as integer minutes.
+        """
+        if self._grid is None:
+            self._grid = GridIndex({
+                'time': self._times.astype(np.int64),
+                'distance': self._columns['distance'],
+                'velocity': self._columns['velocity'],
+            })
+        return self._grid
+
+    def _similarity_index(self, known):
+        """Return a k-d tree over approach distances, velocities and diameters.
+
+        :param known: Whether to index the approaches whose NEO's
+        diameter is known, by distance, velocity and log diameter, or
+        every approach by distance and velocity.
+        :return: A pair of the `KDTree`, whose coordinates are divided by
+        their standard deviations, and the sorted rows of its points.
+        """
+        if self._similarity is None:
+            self._similarity = {}
+        if known not in self._similarity:
+            features = [self._columns['distance'], self._columns['velocity']]
+            rows = np.arange(len(self))
+            if known:
+                diameters = self._columns['diameter']
+                rows = np.flatnonzero(np.isfinite(diameters) & (diameters > 0))
+                features = [feature[rows] for feature in features]
+                features.append(np.log10(diameters[rows]))
+            points = np.column_stack(features).astype(np.float64)
+            scale = points.std(axis=0) if len(points) else np.ones(
+                len(features))
+            scale[~(scale > 0)] = 1
+            self._similarity[known] = (KDTree(points / scale), rows)
+        return self._similarity[known]
+
+    def _bitmaps(self):
+        """Return the bitmaps of approach positions, by name (see `bitmap`)."""
+        if self._bitmap_index is None:
+            size = len(self)
+            diameters = self._columns['diameter']
+            named = np.array([bool(neo.name) for neo in self._neos] + [False])
+            bitmaps = {
+                'hazardous': Bitmap.from_mask(self._columns['hazardous']),
+                'diameter-known': Bitmap.from_mask(~np.isnan(diameters)),
+                'named': Bitmap.from_mask(named[self._columns.neo_rows]),
+            }
+            years = self._times.astype('datetime64[Y]')
+            order = np.argsort(years, kind='stable')
+            keys, starts = np.unique(years[order], return_index=True)
+            for key, rows in zip(keys, np.split(order, starts[1:])):
+                bitmaps[str(key)] = Bitmap.from_positions(rows, size)
+            self._bitmap_index = bitmaps
+        return self._bitmap_index
+
+    def _bitmap_candidates(self, filters, limit=None):
+        """Return the bitmap of approaches that may match some filters.
+
+        Hazardous filters select the approaches of hazardous NEOs (or of
+        the others), and diameter comparisons the approaches of NEOs
+        whose diameter is known, since no comparison of an unknown (NaN)
+        diameter passes. Date filters then narrow them to the years of
+        their range.
+
+        :param filters: A collection of filters capturing
+        user-specified criteria.
+        :param limit: An optional maximum number of candidates, beyond
+        which there's no need to combine the bitmaps.
+        :return: A `Bitmap` that includes every matching approach, or
+        None if there are no hazardous or diameter filters, or if there
+        are clearly more than `limit` candidates.
+        """
+        # The bitmaps that the candidates are in, and those they aren't in:
+        included, excluded = [], []
+        first = last = None
+        for _filter in filters:
+            if (isinstance(_filter, HazardousFilter)
+                    and _filter.op in (operator.eq, operator.ne)):
+                hazardous = (_filter.op is operator.eq) == bool(_filter.value)
+                (included if hazardous else excluded).append('hazardous')
+            elif (isinstance(_filter, DiameterFilter)
+                  and _filter.op is not operator.ne):
+                included.append('diameter-known')
+            elif isinstance(_filter, DateFilter) and _filter.op in _RANGE_OPS:
+                year = _filter.value.year
+                if _filter.op in (operator.eq, operator.ge):
+                    first = year if first is None else max(first, year)
+                if _filter.op in (operator.eq, operator.le):
+                    last = year if last is None else min(last, year)
+        if not included and not excluded:
+            return None
+        bitmaps = self._bitmaps()
+        included = [bitmaps[name] for name in included]
+        excluded = [bitmaps[name] for name in excluded]
+        # No more candidates than are in the smallest of the bitmaps:
+        if limit is not None and min(
+                [len(bitmap) for bitmap in included]
+                + [len(self) - len(bitmap) for bitmap in excluded]) > limit:
+            return None
+
+        if included:
+            candidates = included[0]
+            for bitmap in included[1:]:
+                candidates &= bitmap
+        else:
+            candidates = ~excluded.pop()
+        for bitmap in excluded:
+            candidates -= bitmap
+        if first is None and last is None:
+            return candidates
+
+        years = Bitmap(len(self))
+        for key, bitmap in bitmaps.items():
+            if (key.isdigit() and (first is None or int(key) >= first)
+                    and (last is None or int(key) <= last)):
+                years |= bitmap
+        return candidates & years
+
+    def _indexed_rows(self, filters, within=None):
+        """Return the candidates of the grid and bitmap indexes for filters.
+
+        :param filters: A collection of filters capturing
+        user-specified criteria.
+        :param within: An optional number of rows that the caller would
+        otherwise scan, such as those within the time range of the
+        filters, which the candidates must be fewer than.
+        :return: A sorted array of the rows of the cells within the
+        bounds of the filters on time, distance and velocity, narrowed
+        to the candidates of the bitmaps for hazardous, diameter and date
+        filters, or None if there are too many rows to be worth
+        gathering, if no filter bounds distance, velocity, hazardousness
+        or diameter, or while recording `filter_stats`.
+        """
+        if self.filter_stats is not None and self.filter_stats.recording:
+            # Selectivities are recorded over every row, not candidates.
+            return None
+        limit = len(self) // _GATHER_FRACTION
+        if within is not None:
+            limit = min(limit, within)
+        rows = None
+        bounds = {}
+        for _filter in filters:
+            column = _GRID_COLUMNS.get(type(_filter))
+            if column is None or _filter.op not in _RANGE_OPS:
+                continue
+            low = high = _filter.value
+            if column == 'time':
+                # Dates bound every minute of their day:
+                low = int(np.datetime64(_filter.value, 'D')
+                          .astype('datetime64[m]').astype(np.int64))
+                high = low + 24 * 60 - 1
+            lowest, highest = bounds.get(column, (None, None))
+            if _filter.op in (operator.eq, operator.ge):
+                lowest = low if lowest is None else max(lowest, low)
+            if _filter.op in (operator.eq, operator.le):
+                highest = high if highest is None else min(highest, high)
+            bounds[column] = (lowest, highest)
+        if 'distance' in bounds or 'velocity' in bounds:
+            rows = self._range_index().candidates(bounds, limit)
+
+        # Whichever of the grid's and the bitmaps' candidates are fewer:
+        if rows is not None:
+            limit = len(rows)
+        candidates = self._bitmap_candidates(filters, limit)
+        if candidates is None or len(candidates) >= limit:
+            return rows
+        return candidates.positions()
+
+    def _encode_cursor(self, position, filters):
+        """Encode a position in time order as an opaque page cursor."""
+        token = (f"{self.fingerprint[:16]}:{_filters_digest(filters)}:"
+                 f"{position}")
+        return base64.urlsafe_b64encode(token.encode()).decode()
+
+    def _decode_cursor(self, cursor, filters):
+        """Decode a page cursor into a position in time order."""
+        try:
+            token = base64.urlsafe_b64decode(cursor.encode()).decode()
+            fingerprint, digest, position = token.split(':')
+            position = int(position)
+        except (ValueError, AttributeError):
+            raise InvalidCursorError(f"Malformed page cursor: {cursor!r}.")
+        if fingerprint != self.fingerprint[:16]:
+            raise InvalidCursorError("This page cursor belongs to a "
+                                     "different data set.")
+        if digest != _filters_digest(filters):
+            raise InvalidCursorError("This page cursor belongs to a query "
+                                     "with different filters.")
+        return position
+
+
+def _filters_digest(filters):
+    """Return a short hash of a collection of filters, in any order."""
+    text = '\n'.join(sorted(repr(_filter) for _filter in filters))
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _link(neos, approaches):
+    """Link close approaches to their NEOs with a vectorized join.
+
+    Rather than probing a dictionary once per approach (as
+    `CloseApproach.link_neo` does), the approaches' designations are
+    factorized into a table of distinct designations, and that table is
+    joined to the sorted NEO designations with a binary search. Each
+    approach then references the single designation string of its NEO
+    (or of the table, if unlinked) instead of its own copy.
+
+    :param neos: A list of `NearEarthObject`s, whose positions are their
+    integer ids.
+    :param approaches: A list of unlinked `CloseApproach`es.
+    :return: An `int64` array of the id of each approach's NEO, or -1
+    where no NEO has the approach's designation.
+    """
+    codes, table = pd.factorize(
+        np.array([i._designation for i in approaches], dtype=object))
+    table = np.asarray(table, dtype=object)
+
+    table_rows = np.full(len(table), -1, dtype=np.int64)
+    if neos and len(table):
+        designations = np.array([i.designation for i in neos], dtype=object)
+        sorter = np.argsort(designations, kind='stable')
+        positions = np.minimum(
+            np.searchsorted(designations[sorter], table), len(neos) - 1)
+        found = designations[sorter][positions] == table
+        table_rows[found] = sorter[positions[found]]
+    neo_rows = table_rows[codes]
+
+    interned = [neos[row].designation if row >= 0 else designation
+                for row, designation in zip(table_rows.tolist(), table)]
+    for approach, code, row in zip(approaches, codes.tolist(),
+                                   neo_rows.tolist()):
+        approach._designation = interned[code]
+        if row >= 0:
+            approach.neo = neos[row]
+            approach.neo.approaches.append(approach)
+        else:
+            approach.neo = None
+    return neo_rows
 
 
 if __name__ == '__main__':
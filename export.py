@@ -0,0 +1,170 @@
+"""Export close approaches to a directory of files, one per time partition.
+
+Rather than one file of every matching close approach, the
+`export_partitions` function writes one file per year (or month) of
+approach times, in any of the output formats of the `write` module, and
+a manifest that lists each partition's file, number of rows and SHA-256
+checksum. The partition files are written concurrently by worker
+processes, and downstream loaders can likewise read them in parallel,
+verifying each against the manifest.
+
+The main module calls `export_partitions` for `query --outdir`.
+"""
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import pathlib
+
+from models import NearEarthObject, CloseApproach
+from write import open_writer
+
+# The name of the file that lists the partitions of an export:
+MANIFEST = 'manifest.json'
+
+
+def export_partitions(database, outdir, filters=(), by='year',
+                      extension='.csv', columns=(), workers=1, within=None):
+    """Write the approaches that match the filters to partition files.
+
+    Each partition's records are only built when it's about to be
+    written, and at most two per worker are waiting to be written at any
+    time, so the records of the whole export are never held at once.
+
+    Partition files listed by the manifest of an earlier export to the
+    same directory, but not by this one, are removed once the new
+    manifest is in place.
+
+    :param database: An `NEODatabase`.
+    :param outdir: The directory in which to write the partition files
+    and manifest, which is created if it doesn't exist.
+    :param filters: A collection of filters capturing user-specified
+    criteria.
+    :param by: 'year' or 'month'.
+    :param extension: The extension of the partition files, which
+    chooses their format (such as '.csv', '.jsonl' or '.json.gz').
+    :param columns: The names of additional columns to write, as with
+    `NEODatabase.approach_fields`.
+    :param workers: The number of worker processes to write partitions
+    with, or None for one per CPU. With 1, they're written in this
+    process.
+    :param within: An optional array of positions, as returned by
+    `NEODatabase.query_positions`, to which the matches are restricted.
+    :return: The manifest, as a dictionary.
+    :raises UnsupportedCriterionError: If a column isn't loaded.
+    """
+    outdir = pathlib.Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    previous = _partition_files(outdir / MANIFEST)
+    fields = database.approach_fields(columns)
+    positions = database.query_positions(filters, within)
+    tasks = ((key, outdir / f'{key}{extension}',
+              _records(database.approaches_at(rows)), fields.at(rows))
+             for key, rows in database.partition_positions(positions, by))
+
+    if workers == 1:
+        results = [_write_partition(*task) for task in tasks]
+    else:
+        workers = workers or os.cpu_count() or 1
+        results = []
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            # Submit partitions as earlier ones finish, in order.
+            pending = collections.deque()
+            for task in tasks:
+                if len(pending) == 2 * workers:
+                    results.append(pending.popleft().result())
+                pending.append(executor.submit(_write_partition, *task))
+            results.extend(future.result() for future in pending)
+
+    manifest = {'partition_by': by,
+                'format': extension,
+                'columns': list(columns),
+                'rows': sum(result['rows'] for result in results),
+                'partitions': results}
+    temporary = outdir / f'{MANIFEST}.tmp'
+    with open(temporary, 'w') as outfile:
+        json.dump(manifest, outfile, indent=2)
+    os.replace(temporary, outdir / MANIFEST)
+
+    for name in previous - {result['file'] for result in results}:
+        try:
+            (outdir / name).unlink()
+        except FileNotFoundError:
+            pass
+    return manifest
+
+
+def _records(approaches):
+    """Return plain records of approaches, to send to a worker.
+
+    Workers get plain records, rather than linked objects (which would
+    drag every other approach of their NEOs along). An approach that
+    isn't linked to an NEO gets its own designation, no name, an unknown
+    diameter and not hazardous, as a `NearEarthObject` with no other
+    data would have.
+
+    :param approaches: A stream of `CloseApproach`es.
+    :return: A list of tuples of NEO and approach attributes.
+    """
+    records = []
+    for approach in approaches:
+        neo = approach.neo
+        if neo is None:
+            records.append((approach._designation, '', False, float('nan'),
+                            approach.time, approach.distance,
+                            approach.velocity))
+        else:
+            records.append((neo.designation, neo.name or '', neo.hazardous,
+                            neo.diameter, approach.time, approach.distance,
+                            approach.velocity))
+    return records
+
+
+def _partition_files(path):
+    """Return the names of the partition files listed by a manifest.
+
+    :param path: The path of a manifest, which may not exist.
+    :return: A set of file names, empty if there's no readable manifest.
+    """
+    try:
+        with open(path) as infile:
+            manifest = json.load(infile)
+        return {pathlib.Path(partition['file']).name
+                for partition in manifest['partitions']}
+    except (OSError, ValueError, KeyError, TypeError):
+        return set()
+
+
+def _write_partition(key, path, records, fields):
+    """Write one partition file, in a worker.
+
+    :param key: The partition's key, such as '2020'.
+    :param path: The path of the partition file.
+    :param records: A list of tuples of NEO and approach attributes.
+    :param fields: A `ColumnFields` of the records' additional columns.
+    :return: The partition's entry in the manifest.
+    """
+    with open_writer(path, fields if fields.names else None) as writer:
+        for row, (designation, name, hazardous, diameter,
+                  time, distance, velocity) in enumerate(records):
+            approach = CloseApproach(designation, time, distance, velocity)
+            approach.neo = NearEarthObject(designation, name,
+                                           'Y' if hazardous else 'N',
+                                           diameter)
+            approach._row = row
+            writer.write(approach)
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for block in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(block)
+    return {'key': key,
+            'file': path.name,
+            'rows': len(records),
+            'bytes': path.stat().st_size,
+            'sha256': digest.hexdigest()}
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
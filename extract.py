@@ -11,72 +11,583 @@ The `load_approaches` function extracts close approach data from a
 JSON file, formatted as described in the project instructions, into
 a collection of `CloseApproach` objects.
 
+The `load_neo_columns` function extracts additional NEO attributes,
+such as orbital elements, from the same CSV file into typed arrays -
+one per attribute - rather than into the `NearEarthObject`s, and
+`load_neos_and_columns` extracts both from a single parse of the file.
+
+The `load_approach_columns` function likewise extracts additional
+close approach fields, such as the 3-sigma distance bounds, from the
+same JSON file into typed arrays parallel to `load_approaches`, and
+`load_approaches_and_columns` extracts both from a single parse.
+
+The `stream_approaches` function instead generates `CloseApproach`
+objects one at a time, decoding the JSON file record by record, so
+that its memory use doesn't grow with the size of the file.
+
+Every function accepts files compressed with gzip, bzip2 or xz, which
+are recognized by their leading (magic) bytes rather than by their
+names, and decompressed as they're read - without temporary files.
+
+Given more than one `workers`, the loading functions parse in
+parallel: the CSV file is split on line boundaries, and the JSON file's
+'data' array on record boundaries, into byte ranges that worker
+processes parse and type-convert into columns (including any additional
+columns), which are concatenated in order - so the result is identical
+to parsing in one process.
+Compressed files can't be split into byte ranges, so they're always
+parsed in one process.
+
 The main module calls these functions with the arguments provided at
 the command line, and uses the resulting collections to build an
 `NEODatabase`.
 """
+import bz2
+import concurrent.futures
 import csv
+import gzip
+import io
 import json
+import lzma
+import mmap
+import os
+import re
 
+import numpy as np
 import pandas as pd
 
 from models import NearEarthObject, CloseApproach
 
+# Compression formats of data files, by the bytes that files of each
+# format start with:
+_MAGIC_BYTES = ((b'\x1f\x8b', gzip), (b'BZh', bz2), (b'\xfd7zXZ\x00', lzma))
+
+
+def open_data_file(path, mode='r'):
+    """Open a data file, decompressing it as it's read if it's compressed.
+
+    :param path: A path to a plain, gzip, bzip2 or xz-compressed file.
+    :param mode: 'r' to read text, or 'rb' to read bytes.
+    :return: A file object of the (decompressed) contents.
+    """
+    compression = _compression(path)
+    if compression is None:
+        return open(path, mode)
+    return compression.open(path, 'rt' if mode == 'r' else mode)
+
+
+def _compression(path):
+    """Return the module that decompresses a file, or None if it's plain."""
+    with open(path, 'rb') as infile:
+        start = infile.read(6)
+    for magic, module in _MAGIC_BYTES:
+        if start.startswith(magic):
+            return module
+    return None
+
 
-def load_neos(neo_csv_path='./data/neos.csv'):
+class UnknownColumnError(ValueError):
+    """A requested column isn't in a data file."""
+
+
+def load_neos(neo_csv_path='./data/neos.csv', workers=1):
     """Read near-Earth object information from a CSV file.
 
     :param neo_csv_path: A path to a CSV file containing data about
     near-Earth objects.
+    :param workers: The number of worker processes to parse the file
+    with, or None for one per CPU. With 1, the file is parsed in this
+    process.
     :return: A collection of `NearEarthObject`s.
     """
-    # Create dataframe with select CSV columns:
-    select_columns = ['pdes', 'name', 'pha', 'diameter']
-    csv_dataframe = pd.read_csv(neo_csv_path,
-                                usecols=select_columns,
-                                low_memory=False)
-    # Create temporary CSV file of select data:
-    select_csv = csv_dataframe.to_csv('./data/csv_select.csv', index=False)
-    # Extract only select data:
-    with open('./data/csv_select.csv', 'r') as csv_file:
-        csv_reader = csv.DictReader(csv_file)
-    # Generate and return neo collection with constructor:
-        neo_coll = [NearEarthObject(**row) for row in csv_reader]
-        return neo_coll
+    return load_neos_and_columns(neo_csv_path, (), workers)[0]
+
 
+# The NEO attributes of the CSV file, which `NearEarthObject`s are made
+# from:
+_NEO_FIELDS = ['pdes', 'name', 'pha', 'diameter']
 
-def load_approaches(cad_json_path='./data/cad.json'):
+
+def _csv_rows(csv_dataframe):
+    """Return the rows of a dataframe as dictionaries of CSV strings.
+
+    The dataframe is written out as CSV text in memory and read back, so
+    that every value is the string that a CSV file of it would hold
+    (such as '' for a missing value).
+    """
+    return list(csv.DictReader(io.StringIO(
+        csv_dataframe.to_csv(index=False))))
+
+
+# The additional NEO attributes loaded by default: absolute magnitude
+# (H), geometric albedo, eccentricity (e), semi-major axis (a),
+# perihelion distance (q), inclination (i) and the minimum orbit
+# intersection distance with Earth (moid).
+NEO_COLUMNS = ('H', 'albedo', 'e', 'a', 'q', 'i', 'moid')
+
+
+def load_neo_columns(neo_csv_path='./data/neos.csv', columns=NEO_COLUMNS):
+    """Read additional numeric NEO attributes from a CSV file.
+
+    :param neo_csv_path: A path to a CSV file containing data about
+    near-Earth objects.
+    :param columns: The names of the numeric CSV columns to load.
+    :return: A dictionary mapping 'pdes' to a list of primary
+    designations, and each of `columns` to a parallel `float64` array,
+    with NaN for missing values.
+    :raises UnknownColumnError: If the file has no such column.
+    """
+    return load_neos_and_columns(neo_csv_path, columns)[1]
+
+
+def load_neos_and_columns(neo_csv_path='./data/neos.csv',
+                          columns=NEO_COLUMNS, workers=1):
+    """Read NEOs and additional numeric NEO attributes from a CSV file.
+
+    The file is parsed once, for both the `NearEarthObject`s (as by
+    `load_neos`) and the columns (as by `load_neo_columns`).
+
+    :param neo_csv_path: A path to a CSV file containing data about
+    near-Earth objects.
+    :param columns: The names of the numeric CSV columns to load.
+    :param workers: The number of worker processes to parse the file
+    with, or None for one per CPU. With 1, the file is parsed in this
+    process.
+    :return: A tuple of a collection of `NearEarthObject`s, and a
+    dictionary mapping 'pdes' to a list of their primary designations
+    and each of `columns` to a parallel `float64` array.
+    :raises UnknownColumnError: If the file has no such column, which is
+    checked before the file is parsed.
+    """
+    columns = [column for column in columns if column != 'pdes']
+    check_neo_columns(neo_csv_path, columns)
+    if workers != 1 and _compression(neo_csv_path) is None:
+        neos, arrays = _load_neos_parallel(neo_csv_path, workers, columns)
+    else:
+        with open_data_file(neo_csv_path, 'rb') as neo_file:
+            csv_dataframe = pd.read_csv(neo_file,
+                                        usecols=_neo_usecols(columns),
+                                        low_memory=False)
+        neos = [NearEarthObject(**row)
+                for row in _csv_rows(csv_dataframe[_NEO_FIELDS])]
+        arrays = _neo_columns(csv_dataframe, columns)
+    return neos, {'pdes': [neo.designation for neo in neos], **arrays}
+
+
+def _neo_usecols(columns):
+    """Return the CSV columns to read for NEOs and additional columns."""
+    return _NEO_FIELDS + [column for column in columns
+                          if column not in _NEO_FIELDS]
+
+
+def _neo_columns(csv_dataframe, columns):
+    """Convert columns of a dataframe into `float64` arrays, NaN if missing."""
+    return {column: pd.to_numeric(csv_dataframe[column], errors='coerce')
+            .to_numpy(dtype=np.float64)
+            for column in columns}
+
+
+def check_neo_columns(neo_csv_path, columns):
+    """Check that a CSV file of NEOs has some columns, from its header.
+
+    :param neo_csv_path: A path to a CSV file containing data about
+    near-Earth objects.
+    :param columns: The names of columns to look for.
+    :raises UnknownColumnError: If the file has no such column.
+    """
+    with open_data_file(neo_csv_path) as neo_file:
+        header = next(csv.reader(neo_file), [])
+    _check_columns(columns, header, neo_csv_path)
+
+
+def _check_columns(columns, available, path):
+    """Raise an `UnknownColumnError` for columns not in `available`."""
+    unknown = [column for column in columns if column not in available]
+    if unknown:
+        raise UnknownColumnError(
+            f"{path} has no {', '.join(map(repr, unknown))} "
+            f"column{'s' if len(unknown) > 1 else ''}.")
+
+
+def load_approaches(cad_json_path='./data/cad.json', workers=1):
     """Read close approach data from a JSON file.
 
     :param cad_json_path: A path to a JSON file containing data about
     close approaches.
+    :param workers: The number of worker processes to parse the file
+    with, or None for one per CPU. With 1, the file is parsed in this
+    process.
     :return: A collection of `CloseApproach`es.
     """
-    # Create list of JSON dictionaries of all data (including extraneous):
-    with open(cad_json_path, 'r') as json_file:
+    return load_approaches_and_columns(cad_json_path, (), workers)[0]
+
+
+# The close approach fields that `CloseApproach`es are made from:
+_APPROACH_FIELDS = ('des', 'cd', 'dist', 'v_rel')
+
+# The additional close approach fields loaded by default: the Julian
+# date (jd), the 3-sigma minimum and maximum distances (dist_min,
+# dist_max), the velocity relative to a massless Earth (v_inf), and the
+# 3-sigma time uncertainty (t_sigma_f, converted to minutes).
+APPROACH_COLUMNS = ('jd', 'dist_min', 'dist_max', 'v_inf', 't_sigma_f')
+
+
+def load_approach_columns(cad_json_path='./data/cad.json',
+                          columns=APPROACH_COLUMNS):
+    """Read additional numeric close approach fields from a JSON file.
+
+    The 't_sigma_f' field is formatted as 'D_HH:MM', 'HH:MM' or
+    '< HH:MM' - it is converted into a number of minutes (where an
+    upper bound, such as '< 00:01', becomes the bound).
+
+    :param cad_json_path: A path to a JSON file containing data about
+    close approaches.
+    :param columns: The names of the fields to load.
+    :return: A dictionary mapping each of `columns` to a `float64` array,
+    parallel to the collection returned by `load_approaches`, with NaN
+    for missing values.
+    :raises UnknownColumnError: If the file has no such field.
+    """
+    return load_approaches_and_columns(cad_json_path, columns)[1]
+
+
+def load_approaches_and_columns(cad_json_path='./data/cad.json',
+                                columns=APPROACH_COLUMNS, workers=1):
+    """Read close approaches and additional numeric fields from a JSON file.
+
+    The file is parsed once, for both the `CloseApproach`es (as by
+    `load_approaches`) and the columns (as by `load_approach_columns`).
+
+    :param cad_json_path: A path to a JSON file containing data about
+    close approaches.
+    :param columns: The names of the fields to load as columns.
+    :param workers: The number of worker processes to parse the file
+    with, or None for one per CPU. With 1, the file is parsed in this
+    process.
+    :return: A tuple of a collection of `CloseApproach`es, and a
+    dictionary mapping each of `columns` to a parallel `float64` array.
+    :raises UnknownColumnError: If the file has no such field, which is
+    checked before the file is parsed.
+    """
+    check_approach_columns(cad_json_path, columns)
+    if workers != 1 and _compression(cad_json_path) is None:
+        return _load_approaches_parallel(cad_json_path, workers, columns)
+    with open_data_file(cad_json_path) as json_file:
         json_data = json.load(json_file)
-        json_listofdicts = [
-            dict(zip(json_data['fields'], data))
-            for data in json_data['data']
-        ]
-    # Filter out extraneous data fields:
-        select_fields = ['des', 'cd', 'dist', 'v_rel']
-        filtered_dict_list = [
-            dict((k, d[k]) for k in select_fields if k in d)
-            for d in json_listofdicts
-        ]
-    # Create temporary CSV file of select fields:
-    keys = filtered_dict_list[0].keys()
-    with open('./data/json_select.csv', 'w') as csv_out:
-        csv_writer = csv.DictWriter(csv_out, fieldnames=keys)
-        csv_writer.writeheader()
-        csv_writer.writerows(filtered_dict_list)
-    # Extract only select data:
-    with open('./data/json_select.csv', 'r') as csv_file:
-        csv_reader = csv.DictReader(csv_file)
-    # Return approach collection with constructor:
-        approach_coll = [CloseApproach(**row) for row in csv_reader]
-        return approach_coll
+    fields = json_data['fields']
+    # Make the approaches from select fields:
+    positions = [fields.index(key) for key in _APPROACH_FIELDS]
+    approaches = [CloseApproach(*(data[i] for i in positions))
+                  for data in json_data['data']]
+    return approaches, _approach_columns(json_data['data'], fields, columns)
+
+
+def check_approach_columns(cad_json_path, columns):
+    """Check that a close approach data file has some fields.
+
+    Only the file's 'fields' array is read, not its data.
+
+    :param cad_json_path: A path to a JSON file containing data about
+    close approaches.
+    :param columns: The names of fields to look for.
+    :raises UnknownColumnError: If the file has no such field.
+    """
+    _check_columns(columns, _cad_fields(cad_json_path), cad_json_path)
+
+
+def _approach_columns(records, fields, columns):
+    """Convert fields of close approach records into `float64` arrays.
+
+    :param records: The records of a 'data' array.
+    :param fields: The field names of the records.
+    :param columns: The names of the fields to convert.
+    :return: A dictionary mapping each of `columns` to an array.
+    """
+    approach_columns = {}
+    for column in columns:
+        i = fields.index(column)
+        convert = _minutes if column == 't_sigma_f' else _float
+        approach_columns[column] = np.array(
+            [convert(data[i]) for data in records], dtype=np.float64)
+    return approach_columns
+
+
+def _float(value):
+    """Convert a JSON value into a float, or NaN if it's missing."""
+    if value is None or value == '':
+        return float('nan')
+    return float(value)
+
+
+def _minutes(value):
+    """Convert a 't_sigma_f' duration into minutes, or NaN if missing."""
+    if not value:
+        return float('nan')
+    days, _, clock = value.lstrip('< ').rpartition('_')
+    hours, minutes = clock.split(':')
+    return (int(days or 0) * 24 + int(hours)) * 60 + float(minutes)
+
+
+# The order of fields in the close approach data API, used if a file's
+# 'fields' can't be found near its start or its end:
+CAD_FIELDS = ('des', 'orbit_id', 'jd', 'cd', 'dist', 'dist_min', 'dist_max',
+              'v_rel', 'v_inf', 't_sigma_f', 'h')
+
+# The 'fields' array of a close approach data file:
+_FIELDS_PATTERN = re.compile(r'"fields"\s*:\s*(\[[^\]]*\])')
+# Whitespace and commas between the records of a JSON array:
+_SEPARATOR_PATTERN = re.compile(r'[\s,]*')
+
+
+def stream_approaches(cad_json_path='./data/cad.json', neos=None,
+                      chunk_size=1 << 16):
+    """Read close approach data from a JSON file, one record at a time.
+
+    Unlike `load_approaches`, the file is never held in memory: it is
+    read in chunks, and each record of its 'data' array is decoded and
+    converted into a `CloseApproach` as soon as it's complete.
+
+    :param cad_json_path: A path to a JSON file containing data about
+    close approaches.
+    :param neos: An optional mapping from primary designations to
+    `NearEarthObject`s. If given, each approach's `.neo` references its
+    NEO (without adding the approach to the NEO's `.approaches`).
+    Approaches of unknown NEOs are kept unlinked, as in an
+    `NEODatabase`.
+    :param chunk_size: The number of characters to read at a time.
+    :return: A stream of `CloseApproach`es.
+    """
+    fields = _cad_fields(cad_json_path)
+    positions = [fields.index(key) for key in _APPROACH_FIELDS]
+    with open_data_file(cad_json_path) as json_file:
+        for record in _stream_array(json_file, 'data', chunk_size):
+            approach = CloseApproach(*(record[i] for i in positions))
+            if neos is not None:
+                approach.neo = neos.get(approach._designation)
+            yield approach
+
+
+def _cad_fields(cad_json_path, window=1 << 16):
+    """Find the field names of a close approach data file.
+
+    The API writes the (short) 'fields' array either before or after
+    the (long) 'data' array, so only the start and the end of the file
+    are searched. The end of a compressed file can't be sought, so it's
+    found by decompressing the file, a window at a time.
+
+    :raises ValueError: If neither end of the file has a 'fields' array.
+    """
+    with open_data_file(cad_json_path, 'rb') as json_file:
+        head = json_file.read(window)
+        if _compression(cad_json_path) is None:
+            json_file.seek(max(0, os.fstat(json_file.fileno()).st_size
+                               - window))
+            tail = json_file.read()
+        else:
+            tail = head
+            for chunk in iter(lambda: json_file.read(window), b''):
+                tail = (tail + chunk)[-window:]
+    for text in (head, tail):
+        match = _FIELDS_PATTERN.search(text.decode('utf-8', 'replace'))
+        if match:
+            return json.loads(match.group(1))
+    raise ValueError(f"{cad_json_path} has no 'fields' array within "
+                     f"{window} bytes of its start or end.")
+
+
+def _stream_array(json_file, key, chunk_size):
+    """Generate the elements of a top-level JSON array, one at a time.
+
+    :param json_file: A text file containing a JSON object.
+    :param key: The key of the array in that object.
+    :param chunk_size: The number of characters to read at a time.
+    :return: A stream of decoded array elements.
+    """
+    decoder = json.JSONDecoder()
+    marker = f'"{key}"'
+
+    # Skip ahead to just after the opening bracket of the array:
+    buffer = ''
+    while True:
+        found = buffer.find(marker)
+        if found >= 0:
+            bracket = buffer.find('[', found + len(marker))
+            if bracket >= 0:
+                buffer = buffer[bracket + 1:]
+                break
+        chunk = json_file.read(chunk_size)
+        if not chunk:
+            raise ValueError(f"No {marker} array in the JSON file.")
+        buffer = (buffer if found >= 0 else buffer[-len(marker):]) + chunk
+
+    # Decode each element as soon as the buffer holds all of it:
+    position = 0
+    while True:
+        position = _SEPARATOR_PATTERN.match(buffer, position).end()
+        if position < len(buffer):
+            if buffer[position] == ']':
+                return
+            try:
+                element, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                pass
+            else:
+                yield element
+                continue
+        chunk = json_file.read(chunk_size)
+        if not chunk:
+            raise ValueError(f"Unterminated {marker} array in the JSON file.")
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+# The number of byte ranges per worker process, so that workers that
+# finish early can take on more of the file:
+_RANGES_PER_WORKER = 4
+# The month abbreviations of the 'cd' field, by month number:
+_MONTHS = {month: f'{number:02d}' for number, month in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+     'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+# The start of the 'data' array of a close approach data file:
+_DATA_PATTERN = re.compile(rb'"data"\s*:\s*\[\s*')
+# The end of the last record of the 'data' array (records are flat
+# arrays of strings and numbers, so never contain brackets):
+_DATA_END_PATTERN = re.compile(rb'\]\s*\]')
+# The end of a record of the 'data' array, followed by another one:
+_RECORD_PATTERN = re.compile(rb'\]\s*,')
+# The end of a line of a CSV file:
+_LINE_PATTERN = re.compile(rb'\n')
+
+
+def _load_neos_parallel(neo_csv_path, workers, columns=()):
+    """Read NEOs from a CSV file, parsing line ranges in parallel.
+
+    The file is split on line boundaries, which (as in NASA's files)
+    must not occur within quoted fields.
+
+    :return: A tuple of a list of `NearEarthObject`s, and a dictionary
+    mapping each of `columns` to a parallel `float64` array.
+    """
+    with open(neo_csv_path, 'rb') as csv_file:
+        header = csv_file.readline()
+        size = os.fstat(csv_file.fileno()).st_size
+    ranges = _byte_ranges(neo_csv_path, len(header), size, _LINE_PATTERN,
+                          workers)
+    if not ranges:
+        return [], {column: np.empty(0) for column in columns}
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        chunks = list(executor.map(
+            _parse_neo_range,
+            *zip(*[(neo_csv_path, header, start, stop, columns)
+                   for start, stop in ranges])))
+    neos = [NearEarthObject(**row) for rows, _ in chunks for row in rows]
+    return neos, {column: np.concatenate([arrays[column]
+                                          for _, arrays in chunks])
+                  for column in columns}
+
+
+def _parse_neo_range(neo_csv_path, header, start, stop, columns=()):
+    """Parse a range of lines of a CSV file of NEOs, in a worker.
+
+    The lines go through the same selection as `load_neos`, so that
+    each NEO is made from exactly the same strings.
+
+    :return: A tuple of a list of rows of NEO attributes, and a
+    dictionary mapping each of `columns` to an array.
+    """
+    with open(neo_csv_path, 'rb') as csv_file:
+        csv_file.seek(start)
+        lines = csv_file.read(stop - start)
+    csv_dataframe = pd.read_csv(io.BytesIO(header + lines),
+                                usecols=_neo_usecols(columns),
+                                low_memory=False)
+    return (_csv_rows(csv_dataframe[_NEO_FIELDS]),
+            _neo_columns(csv_dataframe, columns))
+
+
+def _load_approaches_parallel(cad_json_path, workers, columns=()):
+    """Read close approaches from a JSON file, parsing record ranges in
+    parallel.
+
+    :return: A tuple of a list of `CloseApproach`es, and a dictionary
+    mapping each of `columns` to a parallel `float64` array.
+    """
+    fields = _cad_fields(cad_json_path)
+    positions = [fields.index(key) for key in _APPROACH_FIELDS]
+    empty = [], {column: np.empty(0) for column in columns}
+    with open(cad_json_path, 'rb') as json_file, \
+            mmap.mmap(json_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = _DATA_PATTERN.search(data)
+        if start is None:
+            raise ValueError('No "data" array in the JSON file.')
+        start = start.end()
+        stop = _DATA_END_PATTERN.search(data, start)
+        if data[start:start + 1] == b']':
+            return empty
+        if stop is None:
+            raise ValueError('Unterminated "data" array in the JSON file.')
+        ranges = _byte_ranges(cad_json_path, start, stop.start() + 1,
+                              _RECORD_PATTERN, workers)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        chunks = list(executor.map(
+            _parse_approach_range,
+            *zip(*[(cad_json_path, positions, start, stop, fields, columns)
+                   for start, stop in ranges])))
+    approaches = []
+    for designations, times, distances, velocities, _ in chunks:
+        approaches.extend(map(CloseApproach, designations, times.tolist(),
+                              distances.tolist(), velocities.tolist()))
+    return approaches, {column: np.concatenate([chunk[-1][column]
+                                                for chunk in chunks])
+                        for column in columns}
+
+
+def _parse_approach_range(cad_json_path, positions, start, stop, fields=(),
+                          columns=()):
+    """Parse a range of records of a close approach data file, in a worker.
+
+    :return: A tuple of a list of designations, arrays of times,
+    distances and velocities, and a dictionary mapping each of `columns`
+    to an array.
+    """
+    with open(cad_json_path, 'rb') as json_file:
+        json_file.seek(start)
+        records = json_file.read(stop - start)
+    records = json.loads(b'[' + records.rstrip(b', \t\r\n') + b']')
+    des, cd, dist, v_rel = positions
+    # NASA's 'cd' format, 2020-Jan-01 00:54, in ISO 8601 format:
+    times = np.array([f'{i[cd][:5]}{_MONTHS[i[cd][5:8]]}{i[cd][8:]}'
+                      for i in records], dtype='datetime64[m]')
+    return ([str(i[des]) for i in records],
+            times,
+            np.array([float(i[dist]) for i in records], dtype=np.float64),
+            np.array([float(i[v_rel]) for i in records], dtype=np.float64),
+            _approach_columns(records, list(fields), columns))
+
+
+def _byte_ranges(path, start, stop, boundary, workers):
+    """Split a byte range of a file into ranges for worker processes.
+
+    :param path: A path to the file.
+    :param start: The first byte of the range to split.
+    :param stop: The end of the range to split.
+    :param boundary: A compiled bytes pattern, just after which a range
+    may end.
+    :param workers: The number of worker processes, or None for one
+    per CPU.
+    :return: A list of `(start, stop)` byte ranges, in order.
+    """
+    count = (workers or os.cpu_count() or 1) * _RANGES_PER_WORKER
+    step = max(1, (stop - start) // count)
+    ranges = []
+    with open(path, 'rb') as infile, \
+            mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        while start < stop:
+            match = boundary.search(data, min(start + step, stop), stop)
+            end = match.end() if match else stop
+            ranges.append((start, end))
+            start = end
+    return ranges
 
 
 if __name__ == '__main__':
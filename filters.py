@@ -14,7 +14,11 @@ subclasses of `AttributeFilter` - a 1-argument callable
 (on a `CloseApproach`) constructed from a comparator
 (from the `operator` module), a reference value, and a class method
 `get` that subclasses can override to fetch an attribute of interest
-from the supplied `CloseApproach`.
+from the supplied `CloseApproach`. Subclasses can likewise override the
+class method `column` to fetch the same attribute for every close
+approach at once from a mapping of `numpy` arrays, so that `mask`
+evaluates the filter on a whole column without touching any
+`CloseApproach` objects.
 
 The `limit` function simply limits the maximum number of values
 produced by an iterator.
@@ -22,6 +26,8 @@ produced by an iterator.
 import itertools
 import operator
 
+import numpy as np
+
 
 class UnsupportedCriterionError(NotImplementedError):
     """A filter criterion is unsupported."""
@@ -42,9 +48,14 @@ class AttributeFilter:
 
     Concrete subclasses can override the `get` classmethod to provide
     custom behavior to fetch a desired attribute from the given
-    `CloseApproach`.
+    `CloseApproach`, and the `column` classmethod to fetch the same
+    attribute of many approaches at once, as an array. Subclasses that
+    fetch an attribute of the approach's NEO set `needs_neo`.
     """
 
+    # Whether this filter compares an attribute of the approach's NEO:
+    needs_neo = False
+
     def __init__(self, op, value):
         """Create a new `AttributeFilter`.
 
@@ -82,6 +93,30 @@ class AttributeFilter:
         """
         raise UnsupportedCriterionError
 
+    def mask(self, columns):
+        """Evaluate this filter on a whole column of close approaches.
+
+        :param columns: A mapping from column names to `numpy` arrays,
+        with one entry per close approach.
+        :return: A boolean `numpy` array, True where the close approach
+        satisfies this filter.
+        """
+        return self.op(self.column(columns), self.value)
+
+    @classmethod
+    def column(cls, columns):
+        """Get a column of the attribute of interest.
+
+        Concrete subclasses can override this method to get the
+        attribute of interest of every close approach at once.
+
+        :param columns: A mapping from column names to `numpy` arrays,
+        with one entry per close approach.
+        :return: An array of values, comparable to `self.value` via
+        `self.op`.
+        """
+        raise UnsupportedCriterionError
+
     def __repr__(self):
         """Return `repr(self)`.
 
@@ -115,6 +150,19 @@ class DateFilter(AttributeFilter):
         """
         return approach.time.date()
 
+    @classmethod
+    def column(cls, columns):
+        """Get the column of approach dates of many close approaches."""
+        return columns['date']
+
+    def mask(self, columns):
+        """Evaluate this filter on a whole column of approach dates.
+
+        The reference date is converted to a `numpy` date once, rather
+        than compared with every date of the column as a `date` object.
+        """
+        return self.op(self.column(columns), np.datetime64(self.value, 'D'))
+
 
 class DistanceFilter(AttributeFilter):
     """Concrete subclass of superclass 'AttributeFilter'.
@@ -138,6 +186,11 @@ class DistanceFilter(AttributeFilter):
         """
         return approach.distance
 
+    @classmethod
+    def column(cls, columns):
+        """Get the column of approach distances of many close approaches."""
+        return columns['distance']
+
 
 class VelocityFilter(AttributeFilter):
     """Concrete subclass of superclass 'AttributeFilter'.
@@ -162,6 +215,11 @@ class VelocityFilter(AttributeFilter):
         """
         return approach.velocity
 
+    @classmethod
+    def column(cls, columns):
+        """Get the column of approach velocities of many close approaches."""
+        return columns['velocity']
+
 
 class DiameterFilter(AttributeFilter):
     """Concrete subclass of superclass 'AttributeFilter'.
@@ -172,6 +230,8 @@ class DiameterFilter(AttributeFilter):
     `CloseApproach`.
     """
 
+    needs_neo = True
+
     @classmethod
     def get(cls, approach):
         """Get a diameter value from a close approach's neo attribute.
@@ -182,10 +242,17 @@ class DiameterFilter(AttributeFilter):
         :param approach: A `CloseApproach` on which to evaluate
         this filter.
         :return: The value of a diameter, comparable to `self.value`
-        via `self.op`.
+        via `self.op` (NaN if the approach isn't linked to an NEO).
         """
+        if approach.neo is None:
+            return float('nan')
         return approach.neo.diameter
 
+    @classmethod
+    def column(cls, columns):
+        """Get the column of NEO diameters of many close approaches."""
+        return columns['diameter']
+
 
 class HazardousFilter(AttributeFilter):
     """Concrete subclass of superclass 'AttributeFilter'.
@@ -196,6 +263,8 @@ class HazardousFilter(AttributeFilter):
     `CloseApproach`.
     """
 
+    needs_neo = True
+
     @classmethod
     def get(cls, approach):
         """Get a hazardous value from a close approach's neo attribute.
@@ -206,16 +275,91 @@ class HazardousFilter(AttributeFilter):
         :param approach: A `CloseApproach` on which to evaluate
         this filter.
         :return: The value of a hazardous, comparable to `self.value`
-        via `self.op`.
+        via `self.op` (False if the approach isn't linked to an NEO).
         """
-        return approach.neo.hazardous
+        return approach.neo is not None and approach.neo.hazardous
+
+    @classmethod
+    def column(cls, columns):
+        """Get the column of NEO hazardous flags of many close approaches."""
+        return columns['hazardous']
+
+
+class MoidFilter(AttributeFilter):
+    """Concrete subclass of superclass 'AttributeFilter'.
+
+    Concrete subclass that overrides the `column` classmethod in the
+    superclass 'AttributeFilter' to fetch the minimum orbit
+    intersection distance (MOID) of the NEOs of many close approaches.
+    The MOID isn't an attribute of `NearEarthObject`s, so this filter
+    can only be evaluated on columns.
+    """
+
+    needs_neo = True
+
+    @classmethod
+    def column(cls, columns):
+        """Get the column of NEO MOIDs of many close approaches."""
+        return columns['moid']
+
+
+class MagnitudeFilter(AttributeFilter):
+    """Concrete subclass of superclass 'AttributeFilter'.
+
+    Concrete subclass that overrides the `column` classmethod in the
+    superclass 'AttributeFilter' to fetch the absolute magnitude (H) of
+    the NEOs of many close approaches. The absolute magnitude isn't an
+    attribute of `NearEarthObject`s, so this filter can only be
+    evaluated on columns.
+    """
+
+    needs_neo = True
+
+    @classmethod
+    def column(cls, columns):
+        """Get the column of NEO absolute magnitudes of many approaches."""
+        return columns['H']
+
+
+class DistanceMinFilter(AttributeFilter):
+    """Concrete subclass of superclass 'AttributeFilter'.
+
+    Concrete subclass that overrides the `column` classmethod in the
+    superclass 'AttributeFilter' to fetch the 3-sigma minimum approach
+    distance of many close approaches. This field isn't an attribute of
+    `CloseApproach` objects, so this filter can only be evaluated on
+    columns.
+    """
+
+    @classmethod
+    def column(cls, columns):
+        """Get the column of 3-sigma minimum distances of approaches."""
+        return columns['dist_min']
+
+
+class VelocityInfinityFilter(AttributeFilter):
+    """Concrete subclass of superclass 'AttributeFilter'.
+
+    Concrete subclass that overrides the `column` classmethod in the
+    superclass 'AttributeFilter' to fetch the velocity relative to a
+    massless Earth (v_inf) of many close approaches. This field isn't
+    an attribute of `CloseApproach` objects, so this filter can only be
+    evaluated on columns.
+    """
+
+    @classmethod
+    def column(cls, columns):
+        """Get the column of v_inf velocities of many close approaches."""
+        return columns['v_inf']
 
 
 def create_filters(date=None, start_date=None, end_date=None,
                    distance_min=None, distance_max=None,
                    velocity_min=None, velocity_max=None,
                    diameter_min=None, diameter_max=None,
-                   hazardous=None):
+                   hazardous=None, moid_min=None, moid_max=None,
+                   h_min=None, h_max=None,
+                   dist_min_max=None, v_inf_max=None):
     """Create a collection of filters from user-specified criteria.
 
     Each of these arguments is provided by the main module with a
@@ -255,6 +399,18 @@ def create_filters(date=None, start_date=None, end_date=None,
     `CloseApproach`.
     :param hazardous: Whether the NEO of a matching `CloseApproach`
     is potentially hazardous.
+    :param moid_min: A minimum MOID, in au, of the NEO of a matching
+    `CloseApproach`.
+    :param moid_max: A maximum MOID, in au, of the NEO of a matching
+    `CloseApproach`.
+    :param h_min: A minimum absolute magnitude of the NEO of a
+    matching `CloseApproach`.
+    :param h_max: A maximum absolute magnitude of the NEO of a
+    matching `CloseApproach`.
+    :param dist_min_max: A maximum 3-sigma minimum approach distance,
+    in au, for a matching `CloseApproach`.
+    :param v_inf_max: A maximum velocity relative to a massless Earth,
+    in km/s, for a matching `CloseApproach`.
     :return: A collection of filters for use with `query`.
     """
     filters = []
@@ -289,6 +445,22 @@ def create_filters(date=None, start_date=None, end_date=None,
     if hazardous is not None:  # Must contain 'is not None' to be accurate.
         filters.append(HazardousFilter(operator.eq, hazardous))
 
+    # Orbital and physical column filters for NEOs:
+    if moid_min is not None:
+        filters.append(MoidFilter(operator.ge, moid_min))
+    if moid_max is not None:
+        filters.append(MoidFilter(operator.le, moid_max))
+    if h_min is not None:
+        filters.append(MagnitudeFilter(operator.ge, h_min))
+    if h_max is not None:
+        filters.append(MagnitudeFilter(operator.le, h_max))
+
+    # Uncertainty column filters for Close Approaches:
+    if dist_min_max is not None:
+        filters.append(DistanceMinFilter(operator.le, dist_min_max))
+    if v_inf_max is not None:
+        filters.append(VelocityInfinityFilter(operator.le, v_inf_max))
+
     return tuple(filters)  # Filters are immutable moving forward.
 
 
@@ -0,0 +1,94 @@
+"""Index rows by several numeric columns at once, in a grid of cells.
+
+A `GridIndex` divides the range of each indexed column into bins of
+roughly equal numbers of rows (at quantiles of its values), so that the
+bins of all the columns divide the rows into the cells of a grid. The
+rows are stored grouped by cell, so a query for the rows whose values
+fall within a range of every column - a (hyper)rectangle - only visits
+the cells that overlap that rectangle, rather than every row.
+
+The `NEODatabase` constructor builds a `GridIndex` over the time,
+distance and velocity of its close approaches, to answer queries that
+combine range filters on several of them.
+"""
+import numpy as np
+
+
+class GridIndex:
+    """A grid of cells of rows, binned by several numeric columns.
+
+    The cells hold the rows whose values fall within their bins:
+    candidates for range queries, whose values still need comparing
+    with the bounds of the range, as the cells at the edges of a range
+    only partly overlap it.
+    """
+
+    def __init__(self, columns, cell_size=64):
+        """Create a new `GridIndex`.
+
+        :param columns: A mapping from names to equally long columns of
+        numbers (NaN values are binned with the largest values).
+        :param cell_size: The typical number of rows per cell.
+        """
+        self.names = tuple(columns)
+        values = [np.asarray(columns[name], dtype=np.float64)
+                  for name in self.names]
+        size = len(values[0]) if values else 0
+        bins = max(1, round((size / cell_size) ** (1 / max(len(values), 1))))
+
+        # The edges between the bins of each column, and each row's cell:
+        self._edges = []
+        cells = np.zeros(size, dtype=np.int64)
+        for column in values:
+            known = column[~np.isnan(column)]
+            edges = (np.unique(np.quantile(known, np.linspace(0, 1, bins + 1)
+                                           [1:-1]))
+                     if len(known) else np.empty(0))
+            self._edges.append(edges)
+            cells = (cells * (len(edges) + 1)
+                     + np.searchsorted(edges, column, side='right'))
+
+        # Rows grouped by cell (in row order within each cell), and the
+        # start of each cell's group, followed by the end of the last:
+        self._rows = np.argsort(cells, kind='stable')
+        self._offsets = np.searchsorted(cells[self._rows],
+                                        np.arange(self.cell_count + 1))
+
+    @property
+    def cell_count(self):
+        """Return the number of cells of the grid."""
+        return int(np.prod([len(edges) + 1 for edges in self._edges]))
+
+    def candidates(self, bounds, limit=None):
+        """Return the rows of the cells that overlap a range of values.
+
+        :param bounds: A mapping from indexed column names to `(low,
+        high)` pairs of inclusive bounds, either of which can be None.
+        Columns without bounds are unbounded.
+        :param limit: An optional maximum number of rows to gather.
+        :return: A sorted array of the rows of every cell that overlaps
+        the range, which includes every row whose values are within it,
+        or None if there are more than `limit` of them.
+        """
+        cells = np.zeros(1, dtype=np.int64)
+        for name, edges in zip(self.names, self._edges):
+            low, high = bounds.get(name, (None, None))
+            first = 0 if low is None else np.searchsorted(edges, low,
+                                                          side='right')
+            last = (len(edges) if high is None
+                    else np.searchsorted(edges, high, side='right'))
+            cells = (cells[:, np.newaxis] * (len(edges) + 1)
+                     + np.arange(first, last + 1)).ravel()
+
+        starts, stops = self._offsets[cells], self._offsets[cells + 1]
+        lengths = stops - starts
+        if limit is not None and lengths.sum() > limit:
+            return None
+        # The positions in `_rows` of every candidate, cell by cell:
+        positions = (np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                     + np.arange(lengths.sum()))
+        return np.sort(self._rows[positions])
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
@@ -6,6 +6,9 @@ NASA's dataset provides timestamps as naive datetimes
 The `cd_to_datetime` function converts a string, formatted as the
 `cd` field of NASA's close approach data, into a Python `datetime`
 
+The `str_to_date` function converts a YYYY-MM-DD string, as given by
+users, into a Python `date`.
+
 The `datetime_to_str` function converts a Python `datetime` into a
 string. Although `datetime`s already have human-readable string
 representations, those representations display seconds, but NASA's
@@ -34,6 +37,19 @@ def cd_to_datetime(calendar_date):
     return datetime.datetime.strptime(calendar_date, "%Y-%b-%d %H:%M")
 
 
+def str_to_date(date_string):
+    """Convert a date in YYYY-MM-DD format into a `date`.
+
+    In Python 3.7+, there is `datetime.date.fromisoformat`, but alas -
+    we're supporting Python 3.6+.
+
+    :param date_string: A date in the format YYYY-MM-DD.
+    :return: A `datetime.date` corresponding to the given date string.
+    :raises ValueError: If the string isn't a valid date.
+    """
+    return datetime.datetime.strptime(date_string, '%Y-%m-%d').date()
+
+
 def datetime_to_str(dt):
     """Convert a naive Python datetime into a human-readable string.
 
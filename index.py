@@ -0,0 +1,145 @@
+"""Auxiliary indexes for fast lookups in an `NEODatabase`.
+
+The `NameIndex` class answers case-insensitive lookups over the names
+and primary designations of a collection of `NearEarthObject`s. The
+keys are kept as a sorted array, so exact and prefix lookups are a
+pair of binary searches, and bounded edit-distance (fuzzy) lookups walk
+the sorted array as an implicit trie - whole ranges of keys that share
+a prefix too far from the search text are skipped with one more binary
+search.
+
+The `NEODatabase` constructor builds these indexes once, and its
+lookup methods delegate to them.
+"""
+import bisect
+
+# A character that sorts after every other character, used to find the
+# end of the run of sorted keys that begin with a given prefix.
+_MAX_CHAR = '\U0010ffff'
+
+
+class NameIndex:
+    """A case-insensitive index over NEO names and designations.
+
+    Every NEO is indexed under its primary designation and, if it has
+    one, its IAU name. Keys are case-folded, so 'halley', 'HALLEY' and
+    'Halley' are all the same key.
+    """
+
+    def __init__(self, neos):
+        """Create a new `NameIndex`.
+
+        :param neos: A collection of `NearEarthObject`s to index.
+        """
+        # The NEOs of each key, in order, as dictionary keys (NEOs are
+        # hashed by identity), so that repeats are found in constant time:
+        entries = {}
+        for neo in neos:
+            for text in (neo.designation, neo.name):
+                if text:
+                    entries.setdefault(text.casefold(), {})[neo] = None
+        # Sorted keys, with the NEOs of each key in a parallel list:
+        self._keys = sorted(entries)
+        self._values = [tuple(entries[key]) for key in self._keys]
+
+    def __len__(self):
+        """Return the number of distinct keys in this index."""
+        return len(self._keys)
+
+    def exact(self, text):
+        """Find the NEOs whose name or designation equals `text`.
+
+        :param text: The name or designation to search for, in any
+        capitalization.
+        :return: A list of matching `NearEarthObject`s.
+        """
+        key = text.casefold()
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return list(self._values[i])
+        return []
+
+    def prefix(self, text, limit=None):
+        """Find the NEOs whose name or designation starts with `text`.
+
+        :param text: The prefix to search for, in any capitalization.
+        :param limit: The maximum number of NEOs to return, or None.
+        :return: A list of matching `NearEarthObject`s, in key order.
+        """
+        key = text.casefold()
+        start = bisect.bisect_left(self._keys, key)
+        stop = bisect.bisect_right(self._keys, key + _MAX_CHAR, start)
+        return self._collect(range(start, stop), limit)
+
+    def fuzzy(self, text, max_distance=1, limit=None):
+        """Find the NEOs within an edit distance of `text`.
+
+        The edit (Levenshtein) distance counts the single-character
+        insertions, deletions and substitutions needed to turn one
+        string into another.
+
+        :param text: The name or designation to search for, in any
+        capitalization.
+        :param max_distance: The largest edit distance to accept.
+        :param limit: The maximum number of NEOs to return, or None.
+        :return: A list of matching `NearEarthObject`s, closest first.
+        """
+        query = text.casefold()
+        keys = self._keys
+        # rows[d] is the edit-distance row of `path[:d]` against `query`.
+        rows = [list(range(len(query) + 1))]
+        path = ''
+        found = []
+        i = 0
+        while i < len(keys):
+            key = keys[i]
+            # Reuse the rows of the prefix shared with the previous key.
+            common = 0
+            shared = min(len(path), len(key))
+            while common < shared and path[common] == key[common]:
+                common += 1
+            del rows[common + 1:]
+            pruned = False
+            for depth in range(common, len(key)):
+                rows.append(_next_row(rows[-1], query, key[depth]))
+                if min(rows[-1]) > max_distance:
+                    # No key with this prefix can be close enough.
+                    path = key[:depth + 1]
+                    i = bisect.bisect_right(keys, path + _MAX_CHAR, i)
+                    pruned = True
+                    break
+            if pruned:
+                continue
+            path = key
+            if rows[-1][-1] <= max_distance:
+                found.append((rows[-1][-1], i))
+            i += 1
+        found.sort()
+        return self._collect((i for _, i in found), limit)
+
+    def _collect(self, positions, limit):
+        """Return the distinct NEOs stored at the given key positions."""
+        neos = []
+        seen = set()
+        for i in positions:
+            for neo in self._values[i]:
+                if neo not in seen:
+                    seen.add(neo)
+                    neos.append(neo)
+                    if limit and len(neos) >= limit:
+                        return neos
+        return neos
+
+
+def _next_row(previous, query, char):
+    """Extend an edit-distance row by one character of the key."""
+    row = [previous[0] + 1]
+    for j, query_char in enumerate(query, 1):
+        row.append(min(row[j - 1] + 1,
+                       previous[j] + 1,
+                       previous[j - 1] + (query_char != char)))
+    return row
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
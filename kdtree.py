@@ -0,0 +1,123 @@
+"""Find the nearest points to a point, in a k-d tree.
+
+A `KDTree` splits a set of points in two at the median of the dimension
+in which they are most spread out, and splits each half again, until
+every leaf holds only a few points. Each node keeps the bounding box of
+its points, so a search for the nearest points to a point visits nodes
+nearest-box-first and stops as soon as no unvisited box is nearer than
+the farthest of the points found so far - usually after a few leaves,
+rather than every point.
+
+The `NEODatabase` builds `KDTree`s over the distances, velocities and
+diameters of its close approaches, to find the approaches most like a
+given one (see `NEODatabase.similar`).
+"""
+import heapq
+
+import numpy as np
+
+
+class KDTree:
+    """A k-d tree over points, for nearest neighbour searches."""
+
+    def __init__(self, points, leaf_size=32):
+        """Create a new `KDTree`.
+
+        :param points: An array of shape `(count, dimensions)` of finite
+        coordinates.
+        :param leaf_size: The largest number of points per leaf.
+        """
+        self.points = np.asarray(points, dtype=np.float64)
+        count = len(self.points)
+        # Points grouped by node, so that every node's points are the
+        # contiguous range `_order[start:stop]`:
+        self._order = np.arange(count)
+        # Per node: its range of points, its children (-1 for leaves)
+        # and the bounding box of its points:
+        starts, stops, lefts, rights, lows, highs = [], [], [], [], [], []
+
+        pending = [(0, count, None)]
+        while pending:
+            start, stop, parent = pending.pop()
+            node = len(starts)
+            if parent is not None:
+                parent_node, side = parent
+                (lefts if side == 0 else rights)[parent_node] = node
+            rows = self._order[start:stop]
+            box = self.points[rows]
+            low = box.min(axis=0) if len(box) else np.zeros(
+                self.points.shape[1:])
+            high = box.max(axis=0) if len(box) else low
+            starts.append(start)
+            stops.append(stop)
+            lefts.append(-1)
+            rights.append(-1)
+            lows.append(low)
+            highs.append(high)
+            if stop - start <= leaf_size:
+                continue
+
+            # Split at the median of the most spread out dimension:
+            dimension = int(np.argmax(high - low))
+            middle = (stop - start) // 2
+            split = np.argpartition(box[:, dimension], middle)
+            self._order[start:stop] = rows[split]
+            pending.append((start + middle, stop, (node, 1)))
+            pending.append((start, start + middle, (node, 0)))
+
+        self._starts = starts
+        self._stops = stops
+        self._lefts = lefts
+        self._rights = rights
+        self._lows = np.array(lows).reshape(len(starts), -1)
+        self._highs = np.array(highs).reshape(len(starts), -1)
+
+    def __len__(self):
+        """Return the number of points."""
+        return len(self.points)
+
+    def nearest(self, point, k=1, exclude=()):
+        """Return the `k` points nearest to a point.
+
+        :param point: The coordinates of the point.
+        :param k: The number of points to return.
+        :param exclude: Positions of points to skip, such as the point
+        itself.
+        :return: A pair of an array of the positions of the nearest
+        points, nearest first, and an array of their (Euclidean)
+        distances from the point.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        exclude = set(exclude)
+        # The best points so far, as a max-heap of (-squared distance,
+        # position) pairs, and the nodes to visit, nearest box first:
+        best = []
+        nodes = [(0.0, 0)] if len(self.points) and k > 0 else []
+        while nodes:
+            bound, node = heapq.heappop(nodes)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            if self._lefts[node] < 0:
+                rows = self._order[self._starts[node]:self._stops[node]]
+                squares = ((self.points[rows] - point) ** 2).sum(axis=1)
+                for row, square in zip(rows.tolist(), squares.tolist()):
+                    if row in exclude:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-square, row))
+                    elif square < -best[0][0]:
+                        heapq.heapreplace(best, (-square, row))
+                continue
+            for child in (self._lefts[node], self._rights[node]):
+                gap = (np.maximum(self._lows[child] - point, 0)
+                       + np.maximum(point - self._highs[child], 0))
+                heapq.heappush(nodes, (float((gap ** 2).sum()), child))
+
+        best.sort(key=lambda pair: (-pair[0], pair[1]))
+        positions = np.array([row for _, row in best], dtype=np.int64)
+        distances = np.sqrt([-square for square, _ in best])
+        return positions, distances
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
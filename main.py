@@ -4,16 +4,29 @@ See `README.md` for a detailed discussion of this project.
 
 This script can be invoked from the command line::
 
-    $ python3 main.py {inspect,query,interactive} [args]
+    $ python3 main.py {inspect,query,batch,save,interactive} [args]
 
 The `inspect` subcommand looks up an NEO by name or by primary
-designation, and optionally lists all of that NEO's known close
-approaches:
+designation, summarizes its close approaches, and optionally lists all
+of that NEO's known close approaches:
 
     $ python3 main.py inspect --pdes 1P
     $ python3 main.py inspect --name Halley
     $ python3 main.py inspect --verbose --name Halley
 
+Name lookups ignore capitalization, and can also match by prefix or
+within a small number of typos (of names and designations alike):
+
+    $ python3 main.py inspect --name halley
+    $ python3 main.py inspect --name Hal --prefix
+    $ python3 main.py inspect --name Haley --fuzzy 2
+
+An NEO's close approaches can also be listed within a time window, or
+just the next one on or after a date (today, by default):
+
+    $ python3 main.py inspect --pdes 99942 --start-date 2020-01-01 --end-date 2040-12-31
+    $ python3 main.py inspect --pdes 433 --next 2030-01-01
+
 The `query` subcommand searches for close approaches that match given
 criteria:
 
@@ -23,12 +36,74 @@ criteria:
     $ python3 main.py query --date 2020-03-14 --max-velocity 25 --min-diameter 0.5 --hazardous
     $ python3 main.py query --start-date 2000-01-01 --max-diameter 0.1 --not-hazardous
     $ python3 main.py query --hazardous --max-distance 0.05 --min-velocity 30
+    $ python3 main.py query --max-moid 0.01 --max-h 22
+    $ python3 main.py query --max-dist-min 0.001 --max-v-inf 10
+
+The matching close approaches can also just be counted:
+
+    $ python3 main.py query --start-date 2020-01-01 --end-date 2020-12-31 --count
 
 The set of results can be limited in size and/or saved to an output
-file in CSV or JSON format:
+file in CSV or JSON format, as JSON lines (one object per line), or as
+columns in a `numpy` NPZ archive:
 
     $ python3 main.py query --limit 5 --outfile results.csv
     $ python3 main.py query --limit 15 --outfile results.json
+    $ python3 main.py query --hazardous --outfile results.jsonl
+    $ python3 main.py query --hazardous --outfile results.npz
+
+The same results can be written to several outputs in a single pass,
+each with its own limit (after a colon), with '-' for standard output:
+
+    $ python3 main.py query --hazardous --outfile=-:5 --outfile results.csv --outfile results.json:100
+
+With `--pipeline`, the results are serialized and written to the output
+file on background threads, while the query goes on:
+
+    $ python3 main.py query --start-date 2000-01-01 --pipeline --outfile results.csv.gz
+    $ python3 main.py query --export-columns dist_min,dist_max --outfile results.csv
+
+Output files whose names end with '.gz', '.bz2' or '.xz' are compressed
+as they're written, and data files compressed with gzip, bzip2 or xz are
+decompressed as they're read:
+
+    $ python3 main.py --cadfile cad.json.xz query --limit 15 --outfile results.csv.gz
+
+For one-off exports, `--stream` filters the close approach data file
+record by record instead of loading the whole database first:
+
+    $ python3 main.py query --stream --hazardous --outfile results.csv
+
+With `--outdir`, the results are instead written to a directory of files,
+one per year (or month, with `--partition-by month`) of approach times,
+by several worker processes at once, along with a `manifest.json` that
+lists each file's number of rows and SHA-256 checksum:
+
+    $ python3 main.py --workers 4 query --outdir export --partition-by month --partition-format csv.gz
+
+The `batch` subcommand runs many queries, read from a file with one
+JSON object per line, in a single pass over the close approaches. Each
+object names the `create_filters` criteria (dates in YYYY-MM-DD format),
+an output file and, optionally, a limit:
+
+    $ python3 main.py batch --queries queries.jsonl
+
+    {"filters": {"start_date": "2020-01-01", "hazardous": true}, "outfile": "a.csv"}
+    {"filters": {"distance_max": 0.01}, "outfile": "b.json", "limit": 100}
+
+The `save` subcommand saves the NEO database to a directory of
+memory-mapped column files, which `--store` then opens almost instantly
+- and which several processes on one host share a single copy of:
+
+    $ python3 main.py save data/store
+    $ python3 main.py --store data/store query --hazardous --limit 5
+
+The `serve` subcommand serves queries over HTTP on a local port, and
+streams the matching close approaches back as JSON lines while the scan
+is still running (see the `service` module):
+
+    $ python3 main.py serve --port 8000
+    $ curl -d '{"filters": {"hazardous": true}, "limit": 5}' localhost:8000/query
 
 The `interactive` subcommand loads the NEO database and spawns an
 interactive command shell that can repeatedly execute `inspect` and
@@ -36,12 +111,23 @@ interactive command shell that can repeatedly execute `inspect` and
 time. However, it doesn't hot-reload.
 
 If needed, the script can load data from data files other than the
-default with `--neofile` or `--cadfile`.
+default with `--neofile` or `--cadfile`, and parse them with several
+worker processes with `--workers`:
+
+    $ python3 main.py --workers 4 query --hazardous --limit 5
+
+With `--filter-stats`, the script records how often each filter passes,
+in a `filter-stats.json` file next to the data. Whenever that file
+exists, queries evaluate the most selective filters first:
+
+    $ python3 main.py --filter-stats query --hazardous --max-distance 0.05 --count
 """
 
 import argparse
+import asyncio
 import cmd
 import datetime
+import json
 import pathlib
 import sys
 import time
@@ -49,14 +135,27 @@ import time
 import shlex
 
 from database import NEODatabase
-from extract import load_neos, load_approaches
-from filters import create_filters, limit
-from write import write_to_csv, write_to_json
+from extract import (load_neos, load_neos_and_columns,
+                     load_approaches_and_columns, stream_approaches,
+                     check_neo_columns, check_approach_columns,
+                     UnknownColumnError,
+                     APPROACH_COLUMNS, NEO_COLUMNS)
+from filters import create_filters, UnsupportedCriterionError
+from helpers import datetime_to_str, str_to_date
+from export import export_partitions
+from selectivity import FilterStats, STATS_FILE
+from service import serve
+from store import StoreFormatError
+from write import WRITERS, StdoutWriter, open_writer, output_format, tee
 
 # Paths to the root of the project and the `data` subfolder.
 PROJECT_ROOT = pathlib.Path(__file__).parent.resolve()
 DATA_ROOT = PROJECT_ROOT / 'data'
 
+# The message for filters on columns that haven't been loaded.
+UNSUPPORTED_MESSAGE = ("Some of these filters or columns need data that is "
+                       "not loaded (see `--neo-columns` and `--cad-columns`).")
+
 # The current time, for use with the kill-on-change feature of the
 # interactive shell.
 _START = time.time()
@@ -68,23 +167,46 @@ def date_fromisoformat(date_string):
     Return a `datetime.date` corresponding to a string in YYYY-MM-DD
     format.
 
-    In Python 3.7+, there is `datetime.date.fromisoformat`, but alas -
-    we're supporting Python 3.6+.
-
     :param date_string: A date in the format YYYY-MM-DD.
     :return: A `datetime.date` corresponding the given date string.
     """
     try:
-        return datetime.datetime.strptime(date_string, '%Y-%m-%d').date()
+        return str_to_date(date_string)
     except ValueError:
         raise argparse.ArgumentTypeError(
             f"'{date_string}' is not a valid date. Use YYYY-MM-DD.")
 
 
+def column_list(text):
+    """Return a tuple of column names from a comma-separated string.
+
+    :param text: Column names separated by commas (e.g. 'H,moid').
+    :return: A tuple of the non-empty column names.
+    """
+    return tuple(name.strip() for name in text.split(',') if name.strip())
+
+
+def outfile_spec(text):
+    """Return an output path and its own limit from an `--outfile` value.
+
+    :param text: An output path, optionally followed by a colon and the
+    maximum number of results to write to it (e.g. 'results.csv:100').
+    A path of '-' stands for standard output.
+    :return: A tuple of the path (or None, for standard output) and the
+    limit (or None).
+    """
+    path, colon, count = text.rpartition(':')
+    if not colon or not count.isdigit():
+        path, count = text, None
+    else:
+        count = int(count)
+    return (None if path == '-' else pathlib.Path(path)), count
+
+
 def make_parser():
     """Create an ArgumentParser for this script.
 
-    :return: A tuple of the top-level, inspect, and query parsers.
+    :return: A tuple of the top-level, inspect, query and similar parsers.
     """
     parser = argparse.ArgumentParser(
         description="Explore past and future close approaches of "
@@ -97,6 +219,32 @@ def make_parser():
     parser.add_argument('--cadfile', default=(DATA_ROOT / 'cad.json'),
                         type=pathlib.Path,
                         help="Path to JSON file of close approach data.")
+    parser.add_argument('--neo-columns', default=NEO_COLUMNS,
+                        type=column_list,
+                        help="Comma-separated numeric columns of the NEO "
+                             "CSV file to load for filtering, in addition "
+                             "to the NEO attributes (default "
+                             f"{','.join(NEO_COLUMNS)}).")
+    parser.add_argument('--cad-columns', default=APPROACH_COLUMNS,
+                        type=column_list,
+                        help="Comma-separated numeric fields of the close "
+                             "approach JSON file to load for filtering and "
+                             "export, in addition to the approach "
+                             f"attributes (default "
+                             f"{','.join(APPROACH_COLUMNS)}).")
+    parser.add_argument('--workers', default=1, type=int,
+                        help="Number of worker processes with which to "
+                             "parse the data files, or 0 for one per CPU "
+                             "(default 1, parsing in this process).")
+    parser.add_argument('--store', type=pathlib.Path,
+                        help="Directory of a column store, written by the "
+                             "`save` subcommand, to open instead of "
+                             "loading the data files.")
+    parser.add_argument('--filter-stats', action='store_true',
+                        help="Record how often each filter passes, and add "
+                             f"the counts to the {STATS_FILE} file next to "
+                             "the data, by which later runs evaluate the "
+                             "most selective filters first.")
     subparsers = parser.add_subparsers(dest='cmd')
 
     # Add the `inspect` subcommand parser.
@@ -116,6 +264,41 @@ def make_parser():
                             '--name',
                             help="The IAU name of the NEO to inspect "
                                  "(e.g. 'Halley').")
+    inspect.add_argument('-s',
+                         '--start-date',
+                         type=date_fromisoformat,
+                         help="Additionally, print the close approaches of "
+                              "this NEO on or after the given date, in "
+                              "YYYY-MM-DD format (e.g. 2020-12-31).")
+    inspect.add_argument('-e',
+                         '--end-date',
+                         type=date_fromisoformat,
+                         help="Additionally, print the close approaches of "
+                              "this NEO on or before the given date, in "
+                              "YYYY-MM-DD format (e.g. 2020-12-31).")
+    inspect.add_argument('--next',
+                         dest='next_after',
+                         nargs='?',
+                         const=True,
+                         type=date_fromisoformat,
+                         metavar='DATE',
+                         help="Additionally, print the next close approach "
+                              "of this NEO on or after the given date "
+                              "(default today), in YYYY-MM-DD format.")
+    inspect_match = inspect.add_mutually_exclusive_group()
+    inspect_match.add_argument('--prefix',
+                               action='store_true',
+                               help="With --name, inspect every NEO whose "
+                                    "name or designation starts with the "
+                                    "given text.")
+    inspect_match.add_argument('--fuzzy',
+                               nargs='?',
+                               const=1,
+                               type=int,
+                               metavar='N',
+                               help="With --name, inspect every NEO whose "
+                                    "name or designation is within N "
+                                    "typos (default 1) of the given text.")
 
     # Add the `query` subcommand parser.
     query = subparsers.add_parser('query',
@@ -193,17 +376,163 @@ def make_parser():
                          action='store_false',
                          help="If specified, only return close approaches "
                               "of NEOs that are not potentially hazardous.")
+    filters.add_argument('--min-moid',
+                         dest='moid_min',
+                         type=float,
+                         help="In astronomical units. Only return close "
+                              "approaches of NEOs whose minimum orbit "
+                              "intersection distance with Earth is as large "
+                              "or larger than the given distance.")
+    filters.add_argument('--max-moid',
+                         dest='moid_max',
+                         type=float,
+                         help="In astronomical units. Only return close "
+                              "approaches of NEOs whose minimum orbit "
+                              "intersection distance with Earth is as small "
+                              "or smaller than the given distance.")
+    filters.add_argument('--min-h',
+                         dest='h_min',
+                         type=float,
+                         help="Only return close approaches of NEOs whose "
+                              "absolute magnitude is as large or larger "
+                              "(that is, as faint or fainter) than the "
+                              "given magnitude.")
+    filters.add_argument('--max-h',
+                         dest='h_max',
+                         type=float,
+                         help="Only return close approaches of NEOs whose "
+                              "absolute magnitude is as small or smaller "
+                              "(that is, as bright or brighter) than the "
+                              "given magnitude.")
+    filters.add_argument('--max-dist-min',
+                         dest='dist_min_max',
+                         type=float,
+                         help="In astronomical units. Only return close "
+                              "approaches whose 3-sigma minimum distance is "
+                              "as near or nearer to Earth as the given "
+                              "distance.")
+    filters.add_argument('--max-v-inf',
+                         dest='v_inf_max',
+                         type=float,
+                         help="In kilometers per second. Only return close "
+                              "approaches whose velocity relative to a "
+                              "massless Earth is as slow or slower than the "
+                              "given velocity.")
     query.add_argument('-l',
                        '--limit',
                        type=int,
                        help="The maximum number of matches to return. "
                             "Defaults to 10 if no --outfile is given.")
+    query.add_argument('-c',
+                       '--count',
+                       action='store_true',
+                       help="Only print the number of matching close "
+                            "approaches.")
+    query.add_argument('--export-columns',
+                       type=column_list,
+                       default=(),
+                       help="Comma-separated approach or NEO columns (e.g. "
+                            "'dist_min,dist_max,v_inf,moid') to add to "
+                            "each record of the --outfile.")
+    query.add_argument('--stream',
+                       action='store_true',
+                       help="Filter the close approach data file record by "
+                            "record, without loading the whole database. "
+                            "Only applies at the command line.")
+    query.add_argument('--pipeline',
+                       action='store_true',
+                       help="Serialize and write the --outfile on "
+                            "background threads, overlapping them with "
+                            "the query.")
     query.add_argument('-o',
                        '--outfile',
+                       type=outfile_spec,
+                       action='append',
+                       help="File in which to save structured results, "
+                            "optionally followed by ':N' to write at most "
+                            "N results to it, or '-' for standard output "
+                            "(as in '--outfile=-:5'). "
+                            "Repeat to write the same results to several "
+                            "outputs in one pass. If omitted, results are "
+                            "printed to standard output.")
+    query.add_argument('--outdir',
                        type=pathlib.Path,
-                       help="File in which to save structured results. "
-                            "If omitted, results are printed to standard "
-                            "output.")
+                       help="Directory in which to save every match, one "
+                            "file per partition (see --partition-by), "
+                            "along with a manifest. Ignores --limit.")
+    query.add_argument('--partition-by',
+                       choices=('year', 'month'),
+                       default='year',
+                       help="The span of approach times of each file in "
+                            "the --outdir. Defaults to 'year'.")
+    query.add_argument('--partition-format',
+                       default='csv',
+                       help="The format of the files in the --outdir (e.g. "
+                            "'csv', 'json', 'jsonl', 'npz' or 'csv.gz'). "
+                            "Defaults to 'csv'.")
+
+    # Add the `batch` subcommand parser.
+    batch = subparsers.add_parser('batch',
+                                  description="Run many queries in a single "
+                                              "pass over the close "
+                                              "approaches.")
+    batch.add_argument('-q',
+                       '--queries',
+                       type=pathlib.Path,
+                       required=True,
+                       help="File of queries, one JSON object per line, "
+                            "each with 'filters', 'outfile' and optionally "
+                            "'limit' keys.")
+
+    # Add the `save` subcommand parser.
+    save = subparsers.add_parser('save',
+                                 description="Save the database as a "
+                                             "memory-mapped column store.")
+    save.add_argument('path',
+                      type=pathlib.Path,
+                      help="Directory in which to save the column store.")
+
+    # Add the `serve` subcommand parser.
+    service = subparsers.add_parser('serve',
+                                    description="Serve queries over HTTP, "
+                                                "streaming the results as "
+                                                "JSON lines.")
+    service.add_argument('--host',
+                         default='127.0.0.1',
+                         help="The interface on which to listen. Defaults "
+                              "to 127.0.0.1.")
+    service.add_argument('--port',
+                         type=int,
+                         default=8000,
+                         help="The port on which to listen. Defaults to "
+                              "8000.")
+
+    # Add the `similar` subcommand parser.
+    similar = subparsers.add_parser('similar',
+                                    description="Find the close approaches "
+                                                "most like an NEO's close "
+                                                "approach, by distance, "
+                                                "velocity and diameter.")
+    similar_id = similar.add_mutually_exclusive_group(required=True)
+    similar_id.add_argument('-p',
+                            '--pdes',
+                            help="The primary designation of the NEO "
+                                 "(e.g. '433').")
+    similar_id.add_argument('-n',
+                            '--name',
+                            help="The IAU name of the NEO (e.g. 'Halley').")
+    similar.add_argument('-d',
+                         '--date',
+                         type=date_fromisoformat,
+                         help="Compare the NEO's first close approach on "
+                              "or after the given date, in YYYY-MM-DD "
+                              "format (defaults to its next close "
+                              "approach, or else its last).")
+    similar.add_argument('-k',
+                         type=int,
+                         default=10,
+                         help="The number of similar close approaches to "
+                              "print. Defaults to 10.")
 
     repl = subparsers.add_parser('interactive',
                                  description="Start an interactive command "
@@ -216,14 +545,17 @@ def make_parser():
                       help="If specified, kill the session whenever a "
                            "project file is modified.")
 
-    return parser, inspect, query
+    return parser, inspect, query, similar
 
 
-def inspect(database, pdes=None, name=None, verbose=False):
+def inspect(database, pdes=None, name=None, verbose=False,
+            prefix=False, fuzzy=None, start_date=None, end_date=None,
+            next_after=None):
     """Perform the `inspect` subcommand.
 
     This function fetches an NEO by designation or by name. If a matching
-    NEO is found, information about the NEO is printed (additionally,
+    NEO is found, information about the NEO and a summary of its close
+    approaches are printed (additionally,
     information for all of the NEO's known close approaches is printed if
     `verbose = True`).  Otherwise, a message is printed noting that there are
     no matching NEOs.
@@ -231,6 +563,10 @@ def inspect(database, pdes=None, name=None, verbose=False):
     At least one of `pdes` and `name` must be given. If both are given,
     prefer to look up the NEO by the primary designation.
 
+    A `name` is first matched exactly, and then regardless of
+    capitalization. With `prefix` or `fuzzy`, every NEO whose name or
+    designation matches is printed instead.
+
     :param database: The `NEODatabase` containing data on NEOs and their
     close approaches.
 
@@ -238,26 +574,135 @@ def inspect(database, pdes=None, name=None, verbose=False):
     :param name: The name of an NEO for which to search.
     :param verbose: Whether to additionally print all of a matching NEO's
     close approaches.
-    :return: The matching `NearEarthObject`, or None if not found.
+    :param prefix: Whether to match names and designations that start
+    with `name`.
+    :param fuzzy: If given, the number of typos to accept when matching
+    names and designations against `name`.
+    :param start_date: If given, print a matching NEO's close approaches
+    on or after this date.
+    :param end_date: If given, print a matching NEO's close approaches
+    on or before this date.
+    :param next_after: If given, print a matching NEO's next close
+    approach on or after this date (or, if True, today).
+    :return: The (first) matching `NearEarthObject`, or None if not found.
     """
-    # Fetch the NEO of interest.
+    # `--next` without a date means today, as of this command (which may
+    # run long after the parser was built, in the interactive shell).
+    if next_after is True:
+        next_after = datetime.date.today()
+
+    # Fetch the NEO(s) of interest.
     if pdes:
-        neo = database.get_neo_by_designation(pdes)
+        neos = [database.get_neo_by_designation(pdes)]
+    elif prefix:
+        neos = database.search_names(name, match='prefix')
+    elif fuzzy is not None:
+        neos = database.search_names(name, match='fuzzy', max_distance=fuzzy)
     else:
-        neo = database.get_neo_by_name(name)
+        neos = [database.get_neo_by_name(name)]
+        if not neos[0]:
+            neos = database.search_names(name)
+    neos = [neo for neo in neos if neo]
 
     # Ensure that we have received an NEO.
-    if not neo:
+    if not neos:
         print("No matching NEOs exist in the database.", file=sys.stderr)
         return None
 
-    # Display information about this NEO, and optionally its close approaches
+    # Display information about each NEO, and optionally its close approaches
     # if verbose.
-    print(neo)
-    if verbose:
-        for approach in neo.approaches:
-            print(f"- {approach}")
-    return neo
+    for neo in neos:
+        print(neo)
+        print_summary(database.summarize(neo))
+        if verbose or start_date or end_date:
+            for approach in neo.approaches_between(start_date, end_date):
+                print(f"- {approach}")
+        if next_after:
+            approach = neo.next_approach(next_after)
+            if approach:
+                print(f"Next: {approach}")
+            else:
+                print(f"No close approaches on or after {next_after}.")
+    return neos[0]
+
+
+def similar(database, pdes=None, name=None, date=None, k=10):
+    """Perform the `similar` subcommand.
+
+    This function fetches an NEO by designation or by name, picks one of
+    its close approaches, and prints the `k` close approaches most like
+    it (see `NEODatabase.similar`).
+
+    :param database: The `NEODatabase` containing data on NEOs and their
+    close approaches.
+    :param pdes: The primary designation of the NEO.
+    :param name: The name of the NEO.
+    :param date: If given, compare the NEO's first close approach on or
+    after this date, rather than its next (or else its last) one.
+    :param k: The number of similar close approaches to print.
+    :return: A list of the similar `CloseApproach`es, or None if there
+    is no such NEO or close approach.
+    """
+    neo = (database.get_neo_by_designation(pdes) if pdes
+           else database.get_neo_by_name(name))
+    if not neo:
+        print("No matching NEOs exist in the database.", file=sys.stderr)
+        return None
+    approach = neo.next_approach(date)
+    if approach is None and date is None and neo.approaches:
+        approach = neo.approaches[-1]
+    if approach is None:
+        print(f"{neo.fullname} has no close approaches"
+              f"{f' on or after {date}' if date else ''}.", file=sys.stderr)
+        return None
+
+    print(f"{approach} ({neo.known_diameter})")
+    print("Most similar:")
+    approaches = database.similar(approach, k)
+    for match in approaches:
+        diameter = (match.neo.known_diameter if match.neo
+                    else "an unknown diameter")
+        print(f"- {match} ({diameter})")
+    return approaches
+
+
+def print_summary(summary):
+    """Print the precomputed summary of an NEO's close approaches.
+
+    :param summary: A dictionary of statistics, as returned by
+    `NEODatabase.summarize`.
+    """
+    if not summary['count']:
+        print("  No known close approaches.")
+        return
+
+    def when(time):
+        return datetime_to_str(time) if time else "none"
+
+    print(f"  Close approaches: {summary['count']}, from "
+          f"{when(summary['first_time'])} to {when(summary['last_time'])}.")
+    print(f"  Closest approach: {summary['min_distance']:.4f} au at "
+          f"{when(summary['min_distance_time'])}.")
+    print(f"  Fastest approach: {summary['max_velocity']:.2f} km/s.")
+    print(f"  Next approach: {when(summary['next_time'])}.")
+
+
+def filters_from_args(args):
+    """Create the collection of filters given at the command line.
+
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    :return: A collection of filters for use with `query`.
+    """
+    return create_filters(
+        date=args.date, start_date=args.start_date, end_date=args.end_date,
+        distance_min=args.distance_min, distance_max=args.distance_max,
+        velocity_min=args.velocity_min, velocity_max=args.velocity_max,
+        diameter_min=args.diameter_min, diameter_max=args.diameter_max,
+        hazardous=args.hazardous, moid_min=args.moid_min,
+        moid_max=args.moid_max, h_min=args.h_min, h_max=args.h_max,
+        dist_min_max=args.dist_min_max, v_inf_max=args.v_inf_max
+    )
 
 
 def query(database, args):
@@ -266,10 +711,12 @@ def query(database, args):
     Create a collection of filters with `create_filters` and supply them to
     the database's `query` method to produce a stream of matching results.
 
-    If an output file wasn't given, print these results to stdout, limiting
-    to 10 entries if no limit was specified. If an output file was given, use
-    the file's extension to infer whether the file should hold CSV or JSON
-    data, and then write the results to the output file in that format.
+    If `--count` was given, only print the number of matching results.
+
+    If `--outdir` was given, all of the results are written to one file
+    per partition with `export_partitions`.
+
+    Otherwise, the results are written out with `write_results`.
 
     :param database: The `NEODatabase` containing data on NEOs and their
     close approaches.
@@ -278,30 +725,216 @@ def query(database, args):
     """
     # Construct a collection of filters from arguments supplied at the
     # command line.
-    filters = create_filters(
-        date=args.date, start_date=args.start_date, end_date=args.end_date,
-        distance_min=args.distance_min, distance_max=args.distance_max,
-        velocity_min=args.velocity_min, velocity_max=args.velocity_max,
-        diameter_min=args.diameter_min, diameter_max=args.diameter_max,
-        hazardous=args.hazardous
-    )
-    # Query the database with the collection of filters.
-    results = database.query(filters)
+    filters = filters_from_args(args)
+    try:
+        # Check the filters before any output file is opened.
+        database.check_filters(filters)
+        if args.count:
+            # Count the matches without producing any of them.
+            print(database.count(filters))
+            return
 
-    if not args.outfile:
-        # Write the results to stdout, limiting to 10 entries if not specified.
-        for result in limit(results, args.limit or 10):
-            print(result)
-    else:
-        # Write the results to a file.
-        if args.outfile.suffix == '.csv':
-            write_to_csv(limit(results, args.limit), args.outfile)
-        elif args.outfile.suffix == '.json':
-            write_to_json(limit(results, args.limit), args.outfile)
-        else:
-            print("Please use an output file that ends "
-                  "with `.csv` or `.json`.",
-                  file=sys.stderr)
+        if args.outdir is not None:
+            export_results(database, args, filters)
+            return
+
+        # Query the database with the collection of filters.
+        write_results(database.query(filters), args,
+                      database.approach_fields(args.export_columns))
+    except UnsupportedCriterionError:
+        print(UNSUPPORTED_MESSAGE, file=sys.stderr)
+
+
+def export_results(database, args, filters=(), within=None):
+    """Write the results of a query to the partition files of `--outdir`.
+
+    :param database: The `NEODatabase` containing data on NEOs and their
+    close approaches.
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser (or by the REPL's `query` parser).
+    :param filters: A collection of filters capturing user-specified
+    criteria.
+    :param within: An optional array of positions, as returned by
+    `NEODatabase.query_positions`, to which the results are restricted.
+    :raises UnsupportedCriterionError: If a column isn't loaded.
+    """
+    extension = '.' + args.partition_format.lstrip('.')
+    if output_format(f'partition{extension}') not in WRITERS:
+        print(f"Please use a partition format of one of "
+              f"{', '.join(WRITERS)}, optionally followed by `.gz`, "
+              f"`.bz2` or `.xz`.", file=sys.stderr)
+        return
+    manifest = export_partitions(
+        database, args.outdir, filters, by=args.partition_by,
+        extension=extension, columns=args.export_columns,
+        workers=getattr(args, 'workers', 1) or None, within=within)
+    print(f"Wrote {manifest['rows']} close approaches to "
+          f"{len(manifest['partitions'])} files in {args.outdir}.")
+
+
+def stream_query(args):
+    """Perform the `query` subcommand without building an `NEODatabase`.
+
+    The close approach data file is decoded one record at a time, each
+    approach is checked against the filters as soon as it's decoded,
+    and matches go straight to the output. NEOs are only loaded if the
+    filters or the output need their attributes, so memory use doesn't
+    grow with the size of the close approach data file. Either way,
+    approaches of unknown NEOs are kept, as in an `NEODatabase`.
+
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    """
+    if args.export_columns:
+        print("Exporting columns is not supported with `--stream`.",
+              file=sys.stderr)
+        return
+    if args.outdir is not None:
+        print("Exporting to an --outdir is not supported with `--stream`.",
+              file=sys.stderr)
+        return
+
+    filters = filters_from_args(args)
+    neos = None
+    if (any(path is not None for path, _ in args.outfile or ())
+            or any(_filter.needs_neo for _filter in filters)):
+        neos = {neo.designation: neo for neo in load_neos(args.neofile)}
+    results = (approach
+               for approach in stream_approaches(args.cadfile, neos)
+               if all(_filter(approach) for _filter in filters))
+    try:
+        if args.count:
+            print(sum(1 for _ in results))
+            return
+        write_results(results, args)
+    except UnsupportedCriterionError:
+        # Filters on NEO columns can only be evaluated by the database.
+        print("Some of these filters are not supported with `--stream`.",
+              file=sys.stderr)
+    except ValueError as error:
+        # The close approach data file has no 'fields' array.
+        print(error, file=sys.stderr)
+
+
+def write_results(results, args, extras=None):
+    """Write out the results of a query.
+
+    If an output file wasn't given, print these results to stdout, limiting
+    to 10 entries if no limit was specified. If an output file was given, use
+    the file's extension to infer whether the file should hold CSV, JSON,
+    JSON lines or NPZ data, and then write the results to the output file in
+    that format.
+
+    Several outputs (including stdout, as '-') may be given, each with its
+    own limit: all of them are written from a single pass over the results.
+
+    :param results: A stream of matching `CloseApproach`es.
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    :param extras: Optional additional fields to write to the output
+    file, as returned by `NEODatabase.approach_fields`.
+    """
+    outputs = args.outfile or [(None, None)]
+    if any(path is not None and output_format(path) not in WRITERS
+           for path, _ in outputs):
+        print(f"Please use output files that end with one of "
+              f"{', '.join(WRITERS)}, optionally followed by `.gz`, "
+              f"`.bz2` or `.xz`.", file=sys.stderr)
+        return
+
+    writers = []
+    try:
+        for path, output_limit in outputs:
+            if path is None:
+                # Print to stdout, limiting to 10 entries if not specified.
+                writers.append((StdoutWriter(),
+                                output_limit or args.limit or 10))
+            else:
+                # Write to a file, in the format of its extension.
+                writers.append((open_writer(path, extras,
+                                            pipelined=args.pipeline),
+                                output_limit or args.limit))
+        tee(results, writers)
+    finally:
+        for writer, _ in writers:
+            writer.close()
+
+
+def parse_batch_query(line):
+    """Parse one line of a batch query file.
+
+    :param line: A JSON object with a 'filters' object of keyword
+    arguments to `create_filters` (with dates in YYYY-MM-DD format), an
+    'outfile' path, and optionally a 'limit'.
+    :return: A tuple of the collection of filters, the output path, and
+    the limit (or None).
+    """
+    record = json.loads(line)
+    criteria = dict(record.get('filters', {}))
+    for key in ('date', 'start_date', 'end_date'):
+        if criteria.get(key):
+            criteria[key] = date_fromisoformat(criteria[key])
+    filters = create_filters(**criteria)
+    outfile = pathlib.Path(record['outfile'])
+    if output_format(outfile) not in WRITERS:
+        raise ValueError(f"'{outfile}' does not end with "
+                         f"{' or '.join(WRITERS)}.")
+    return filters, outfile, record.get('limit')
+
+
+def batch(database, args):
+    """Perform the `batch` subcommand.
+
+    Read a file of queries, and evaluate all of them with one pass over
+    the database's close approaches (see `NEODatabase.query_batch`).
+    Each match is written to the output file of every query it
+    satisfies as soon as it's found, up to each query's limit.
+
+    Lines that can't be parsed, and queries whose filters need data that
+    isn't loaded, are reported to stderr and skipped.
+
+    :param database: The `NEODatabase` containing data on NEOs and their
+    close approaches.
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    """
+    queries = []
+    with open(args.queries, 'r') as query_file:
+        for number, line in enumerate(query_file, 1):
+            if not line.strip():
+                continue
+            try:
+                parsed = parse_batch_query(line)
+                database.check_filters(parsed[0])
+            except UnsupportedCriterionError:
+                print(f"Skipping line {number} of {args.queries}: "
+                      f"{UNSUPPORTED_MESSAGE}", file=sys.stderr)
+                continue
+            except (ValueError, TypeError, KeyError,
+                    argparse.ArgumentTypeError) as err:
+                print(f"Skipping line {number} of {args.queries}: {err}",
+                      file=sys.stderr)
+                continue
+            queries.append(parsed)
+
+    writers = [open_writer(outfile) for _, outfile, _ in queries]
+    counts = [0] * len(queries)
+    try:
+        matches = database.query_batch([filters for filters, _, _ in queries])
+        for index, approach in matches:
+            query_limit = queries[index][2]
+            if query_limit and counts[index] >= query_limit:
+                continue
+            writers[index].write(approach)
+            counts[index] += 1
+    except UnsupportedCriterionError:
+        print(UNSUPPORTED_MESSAGE, file=sys.stderr)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    for (_, outfile, _), count in zip(queries, counts):
+        print(f"Wrote {count} close approaches to {outfile}.")
 
 
 class NEOShell(cmd.Cmd):
@@ -310,12 +943,17 @@ class NEOShell(cmd.Cmd):
     This is a `cmd.Cmd` shell - a specialized tool for command-based REPL
     sessions.
 
-    It wraps the `inspect` and `query` parsers to parse flags for those
-    commands as if they were supplied at the command line.
+    It wraps the `inspect`, `query` and `similar` parsers to parse flags
+    for those commands as if they were supplied at the command line.
 
     The primary purpose of this shell is to allow users to repeatedly
     perform inspect and query commands, while only loading the data
     (which can be quite slow) once.
+
+    The shell also remembers the result set of the last query, as an
+    array of positions, so that `refine` can narrow it with more filters
+    (at a cost proportional to the result set, not the whole database)
+    and `undo` can step back to the previous set.
     """
 
     intro = ("Explore close approaches of near-Earth objects. "
@@ -323,7 +961,7 @@ class NEOShell(cmd.Cmd):
     prompt = '(neo) '
 
     def __init__(self, database, inspect_parser, query_parser,
-                 aggressive=False, **kwargs):
+                 similar_parser, aggressive=False, **kwargs):
         """Create a new `NEOShell`.
 
         Creating this object doesn't start the session - for that, use
@@ -333,6 +971,7 @@ class NEOShell(cmd.Cmd):
         their close approaches.
         :param inspect_parser: The subparser for the `inspect` subcommand.
         :param query_parser: The subparser for the `query` subcommand.
+        :param similar_parser: The subparser for the `similar` subcommand.
         :param aggressive: Whether to kill the session whenever a project
         file is changed.
         :param kwargs: A dictionary of excess keyword arguments passed to
@@ -342,7 +981,10 @@ class NEOShell(cmd.Cmd):
         self.db = database
         self.inspect = inspect_parser
         self.query = query_parser
+        self.similar = similar_parser
         self.aggressive = aggressive
+        # Result sets of the last query and of each refinement since:
+        self.results = []
 
     @classmethod
     def parse_arg_with(cls, arg, parser):
@@ -387,9 +1029,19 @@ class NEOShell(cmd.Cmd):
             (neo) inspect --pdes 1P
             (neo) inspect --name Halley
 
+        Match names and designations by prefix or with typos:
+
+            (neo) inspect --name Hal --prefix
+            (neo) inspect --name Haley --fuzzy
+
         Additionally, list all known close approaches:
 
             (neo) inspect --verbose --name Eros
+
+        Or only those within a time window, or the next one:
+
+            (neo) inspect --name Eros --start-date 2020-01-01
+            (neo) inspect --name Eros --next 2030-01-01
         """
         args = self.parse_arg_with(arg, self.inspect)
         if not args:
@@ -399,7 +1051,12 @@ class NEOShell(cmd.Cmd):
         inspect(self.db,
                 pdes=args.pdes,
                 name=args.name,
-                verbose=args.verbose)
+                verbose=args.verbose,
+                prefix=args.prefix,
+                fuzzy=args.fuzzy,
+                start_date=args.start_date,
+                end_date=args.end_date,
+                next_after=args.next_after)
 
     def do_q(self, arg):
         """Shorthand for `query`."""
@@ -419,26 +1076,124 @@ class NEOShell(cmd.Cmd):
             `--min-distance`, `--max-distance`,
             `--min-velocity`, `--max-velocity`,
             `--min-diameter`, `--max-diameter`,
-            `--hazardous`, `--not-hazardous`.
+            `--hazardous`, `--not-hazardous`,
+            `--min-moid`, `--max-moid`, `--min-h`, `--max-h`,
+            `--max-dist-min`, `--max-v-inf`.
 
         The number of results shown can be limited to a maximum number
         with `--limit`:
 
             (neo) query --limit 2
 
+        Or only counted with `--count`:
+
+            (neo) query --hazardous --count
+
         The results can be saved to a file
         (instead of displayed to stdout)
         with `--outfile`:
 
             (neo) query --limit 5 --outfile results.csv
             (neo) query --limit 5 --outfile results.json
+
+        Or to a directory of files, one per year or month, with
+        `--outdir` (as can `refine`'s results):
+
+            (neo) query --hazardous --outdir export --partition-by month
         """
         args = self.parse_arg_with(arg, self.query)
         if not args:
             return
 
-        # Run the `inspect` subcommand.
-        query(self.db, args)
+        # Run the `query` subcommand, keeping its result set to refine.
+        try:
+            positions = self.db.query_positions(filters_from_args(args))
+        except UnsupportedCriterionError:
+            print(UNSUPPORTED_MESSAGE, file=sys.stderr)
+            return
+        self.results = [positions]
+        self.show_results(positions, args)
+
+    def do_r(self, arg):
+        """Shorthand for `refine`."""
+        self.do_refine(arg)
+
+    def do_refine(self, arg):
+        """Narrow the result set of the previous query with more filters.
+
+        This command accepts the same options as `query`, but only
+        considers the close approaches in the current result set:
+
+            (neo) query --start-date 2020-01-01 --end-date 2020-12-31
+            (neo) refine --hazardous
+            (neo) refine --max-distance 0.01
+
+        Use `undo` to go back to the result set before a refinement.
+        """
+        args = self.parse_arg_with(arg, self.query)
+        if not args:
+            return
+        if not self.results:
+            print("There is no previous query to refine.", file=sys.stderr)
+            return
+
+        try:
+            positions = self.db.query_positions(filters_from_args(args),
+                                                within=self.results[-1])
+        except UnsupportedCriterionError:
+            print(UNSUPPORTED_MESSAGE, file=sys.stderr)
+            return
+        self.results.append(positions)
+        self.show_results(positions, args)
+
+    def do_undo(self, _arg):
+        """Undo the last `refine`, restoring the previous result set."""
+        if len(self.results) < 2:
+            print("There is no refinement to undo.", file=sys.stderr)
+            return
+        self.results.pop()
+        print(f"Restored the previous {len(self.results[-1])} results.")
+
+    def show_results(self, positions, args):
+        """Print, count or save the approaches of a result set.
+
+        :param positions: An array of positions of approaches in the
+        database, as returned by `NEODatabase.query_positions`.
+        :param args: The options of the `query` or `refine` command.
+        """
+        if args.count:
+            print(len(positions))
+            return
+        try:
+            if args.outdir is not None:
+                export_results(self.db, args, within=positions)
+                return
+            extras = self.db.approach_fields(args.export_columns)
+        except UnsupportedCriterionError:
+            print(UNSUPPORTED_MESSAGE, file=sys.stderr)
+            return
+        write_results(self.db.approaches_at(positions), args, extras)
+
+    def do_similar(self, arg):
+        """Perform the `similar` subcommand within the REPL session.
+
+        Find the close approaches most like an NEO's next close approach
+        (or else its last), by distance, velocity and diameter:
+
+            (neo) similar --name Eros
+
+        Or like its first close approach on or after a date, printing
+        more or fewer of them:
+
+            (neo) similar --pdes 433 --date 2020-01-01 -k 5
+        """
+        args = self.parse_arg_with(arg, self.similar)
+        if not args:
+            return
+
+        # Run the `similar` subcommand.
+        similar(self.db, pdes=args.pdes, name=args.name, date=args.date,
+                k=args.k)
 
     def do_EOF(self, _arg):
         """Exit the interactive session."""
@@ -469,23 +1224,85 @@ class NEOShell(cmd.Cmd):
 
 def main():
     """Run the main script."""
-    parser, inspect_parser, query_parser = make_parser()
+    parser, inspect_parser, query_parser, similar_parser = make_parser()
     args = parser.parse_args()
 
-    # Extract data from the data files into structured Python objects.
-    database = NEODatabase(load_neos(args.neofile),
-                           load_approaches(args.cadfile))
+    # Streaming queries don't need the database at all.
+    if args.cmd == 'query' and args.stream:
+        stream_query(args)
+        return
+
+    # Open a saved column store, or extract data from the data files
+    # into structured Python objects.
+    if args.store is not None:
+        try:
+            database = NEODatabase.open(args.store)
+        except StoreFormatError as error:
+            print(error, file=sys.stderr)
+            return
+    else:
+        # Check the requested columns against the files' headers before
+        # parsing the files.
+        for check, path, columns, option in (
+                (check_neo_columns, args.neofile, args.neo_columns,
+                 '--neo-columns'),
+                (check_approach_columns, args.cadfile, args.cad_columns,
+                 '--cad-columns')):
+            try:
+                check(path, columns)
+            except UnknownColumnError as error:
+                parser.error(f"argument {option}: {error}")
+            except ValueError as error:
+                print(error, file=sys.stderr)
+                return
+        workers = args.workers or None
+        neos, neo_columns = load_neos_and_columns(args.neofile,
+                                                  args.neo_columns, workers)
+        approaches, approach_columns = load_approaches_and_columns(
+            args.cadfile, args.cad_columns, workers)
+        database = NEODatabase(neos, approaches, neo_columns,
+                               approach_columns)
+
+    # Order filters by the selectivities recorded by earlier runs, and
+    # record this run's too if asked to.
+    stats_path = (args.store or args.cadfile.parent) / STATS_FILE
+    if args.filter_stats or stats_path.exists():
+        database.filter_stats = FilterStats.load(stats_path,
+                                                 recording=args.filter_stats)
 
     # Run the chosen subcommand.
     if args.cmd == 'inspect':
         inspect(database, pdes=args.pdes,
-                name=args.name, verbose=args.verbose)
+                name=args.name, verbose=args.verbose,
+                prefix=args.prefix, fuzzy=args.fuzzy,
+                start_date=args.start_date, end_date=args.end_date,
+                next_after=args.next_after)
     elif args.cmd == 'query':
         query(database, args)
+    elif args.cmd == 'similar':
+        similar(database, pdes=args.pdes, name=args.name, date=args.date,
+                k=args.k)
+    elif args.cmd == 'batch':
+        batch(database, args)
+    elif args.cmd == 'save':
+        database.save(args.path)
+    elif args.cmd == 'serve':
+        # An event loop of our own, as `asyncio.run` needs Python 3.7+.
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(serve(database, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            loop.close()
     elif args.cmd == 'interactive':
-        NEOShell(database, inspect_parser, query_parser,
+        NEOShell(database, inspect_parser, query_parser, similar_parser,
                  aggressive=args.aggressive).cmdloop()
 
+    if args.filter_stats:
+        database.filter_stats.save(stats_path)
+
 
 if __name__ == '__main__':
     main()
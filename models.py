@@ -9,13 +9,15 @@ NEO. Each has an approach datetime, a nominal approach distance, and
 a relative approach velocity.
 
 A `NearEarthObject` maintains a collection of its close approaches,
-and a `CloseApproach` maintains a reference to its NEO.
+sorted by time, and a `CloseApproach` maintains a reference to its NEO.
 
 The functions that construct these objects use information extracted
 from the data files from NASA, so these objects should be able to
 handle all of the quirks of the data set, such as missing names and
 unknown diameters.
 """
+import bisect
+import datetime
 from math import isnan
 
 from helpers import cd_to_datetime, datetime_to_str
@@ -32,7 +34,7 @@ class NearEarthObject:
 
     A `NearEarthObject` also maintains a collection of its close
     approaches - initialized to an empty collection, but eventually
-    populated in the `NEODatabase` constructor.
+    populated (and sorted by time) in the `NEODatabase` constructor.
     """
 
     def __init__(self, pdes, name, pha, diameter):
@@ -69,6 +71,8 @@ class NearEarthObject:
 
         # Empty collection of this NEO's CloseApproach(es)
         self.approaches = []
+        # Approach times, parallel to the sorted '.approaches':
+        self._approach_times = []
 
     @property
     def fullname(self):
@@ -90,6 +94,51 @@ class NearEarthObject:
         else:
             return f"a diameter of {self.diameter:.3f} km"
 
+    def sort_approaches(self):
+        """Sort this NEO's close approaches by time.
+
+        The `NEODatabase` constructor calls this once all approaches
+        are linked, so that `approaches_between` and `next_approach`
+        can binary search the approach times.
+        """
+        self.approaches.sort(key=lambda approach: approach.time)
+        self._approach_times = [approach.time for approach in self.approaches]
+
+    def approaches_between(self, start=None, end=None):
+        """Return this NEO's close approaches within a time window.
+
+        Dates include the whole day, so the window from 2020-01-01 to
+        2020-01-31 includes approaches at any time on January 31st.
+
+        :param start: The `date` or `datetime` on or after which to
+        include approaches, or None for no lower bound.
+        :param end: The `date` or `datetime` on or before which to
+        include approaches, or None for no upper bound.
+        :return: A list of `CloseApproach`es, sorted by time.
+        """
+        lo = 0
+        hi = len(self._approach_times)
+        if start is not None:
+            lo = bisect.bisect_left(self._approach_times, _as_datetime(start))
+        if end is not None:
+            hi = bisect.bisect_right(self._approach_times,
+                                     _as_datetime(end, end_of_day=True))
+        return self.approaches[lo:hi]
+
+    def next_approach(self, after=None):
+        """Return this NEO's first close approach at or after a time.
+
+        :param after: A `date` or `datetime`, or None for the current
+        time.
+        :return: The next `CloseApproach`, or None if there isn't one.
+        """
+        if after is None:
+            after = datetime.datetime.now()
+        i = bisect.bisect_left(self._approach_times, _as_datetime(after))
+        if i < len(self.approaches):
+            return self.approaches[i]
+        return None
+
     def __str__(self):
         """Return `str(self)`.
 
@@ -137,7 +186,7 @@ class CloseApproach:
         """Create a new `CloseApproach`.
 
         :param cd:  The date and time, in UTC, at which the closest
-        to Earth.
+        to Earth, as a NASA-formatted string or as a `datetime`.
         :param dist: The nominal approach distance, in astronomical
         units, of the NEO to Earth at the closest point.
         :param v_rel: The velocity, in kilometers per second, of the
@@ -149,21 +198,18 @@ class CloseApproach:
         NearEarthObject.
         """
         self._designation = str(des)
-        self.time = cd_to_datetime(cd)
+        # The row of this approach in its `NEODatabase`'s columns:
+        self._row = None
+        if isinstance(cd, datetime.datetime):
+            self.time = cd
+        else:
+            self.time = cd_to_datetime(cd)
         self.distance = float(dist)
         self.velocity = float(v_rel)
 
-        # Initial value for the NEO who made the close approach:
-        def validate_des(des):
-            if not des:
-                raise Exception("Missing Designation")
-            return True
-
-        try:
-            if validate_des(des):
-                self.neo = str(des)
-        except:
-            self.neo = None
+        # Initial value for the NEO who made the close approach, until
+        # the approach is linked (see '._designation'):
+        self.neo = None
 
     def link_neo(self, neos):
         """Return linked NEOs.
@@ -233,15 +279,19 @@ class CloseApproach:
         :return: A serialized dictionary to be used to 'write_to_csv'
         and 'write_to_json' in the 'write.py' module.
         """
+        # An approach that isn't linked is written with what's known of
+        # its NEO - its designation:
+        neo = self.neo or NearEarthObject(self._designation, '', 'N', '')
+
         # Serialize CSV:
         if extension == 'csv':
             serialized_dict = {'datetime_utc': self.time_str,
                                'distance_au': self.distance,
                                'velocity_km_s': self.velocity,
-                               'designation': self.neo.designation,
-                               'name': self.neo.name,
-                               'diameter_km': self.neo.diameter,
-                               'potentially_hazardous': self.neo.hazardous
+                               'designation': neo.designation,
+                               'name': neo.name,
+                               'diameter_km': neo.diameter,
+                               'potentially_hazardous': neo.hazardous
                                }
             return serialized_dict
 
@@ -250,11 +300,11 @@ class CloseApproach:
             serialized_dict = {'datetime_utc': self.time_str,
                                'distance_au': self.distance,
                                'velocity_km_s': self.velocity,
-                               'neo': {'designation': self.neo.designation,
-                                       'name': self.neo.name,
-                                       'diameter_km': self.neo.diameter,
+                               'neo': {'designation': neo.designation,
+                                       'name': neo.name,
+                                       'diameter_km': neo.diameter,
                                        'potentially_hazardous':
-                                       self.neo.hazardous
+                                       neo.hazardous
                                        }
                                }
             return serialized_dict
@@ -267,5 +317,14 @@ class CloseApproach:
                              )
 
 
+def _as_datetime(value, end_of_day=False):
+    """Return a `datetime` for a `date` (at the start or end of day)."""
+    if isinstance(value, datetime.datetime):
+        return value
+    if end_of_day:
+        return datetime.datetime.combine(value, datetime.time.max)
+    return datetime.datetime.combine(value, datetime.time.min)
+
+
 if __name__ == '__main__':
     print(f"First Module's Name: {__name__}\n")
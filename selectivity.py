@@ -0,0 +1,147 @@
+"""Collect and persist how often each kind of filter passes.
+
+A `FilterStats` counts, for every filter that a `NEODatabase` evaluates
+while `recording`, the number of close approaches it was evaluated on
+and the number that passed. The counts are kept per filter type and
+comparator (such as `DistanceFilter` with `operator.le`) and per bucket
+of reference values (such as distances of about 0.05 au, or dates in
+March 2020), so that the selectivity of a new filter - the fraction of
+approaches expected to pass it - can be estimated from similar filters.
+
+Selectivities are saved to a small JSON file next to the data, and
+later runs load it to evaluate the most selective filters first (see
+`NEODatabase.filter_stats`).
+"""
+import datetime
+import json
+import os
+import pathlib
+import threading
+
+# The version of the layout of statistics files.
+FORMAT_VERSION = 1
+
+# The name of the statistics file, next to the data:
+STATS_FILE = 'filter-stats.json'
+
+
+class FilterStats:
+    """Counts of evaluations and passes, by kind of filter and value.
+
+    Recording is thread-safe, so one `FilterStats` can be shared by
+    concurrent queries.
+    """
+
+    def __init__(self, counts=None, recording=False):
+        """Create a new `FilterStats`.
+
+        :param counts: An optional mapping from filter keys (such as
+        'DistanceFilter.le') to mappings from value buckets to
+        `[evaluated, passed]` pairs, as saved by `save`.
+        :param recording: Whether to record the filters that are
+        evaluated.
+        """
+        self.counts = {key: {bucket: list(pair)
+                             for bucket, pair in buckets.items()}
+                       for key, buckets in (counts or {}).items()}
+        self.recording = recording
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, recording=False):
+        """Load statistics saved with `save`.
+
+        :param path: The statistics file. If it doesn't exist, or isn't
+        a statistics file, there are no statistics yet.
+        :param recording: Whether to record the filters that are
+        evaluated.
+        :return: A new `FilterStats`.
+        """
+        try:
+            with open(path) as infile:
+                saved = json.load(infile)
+        except (OSError, ValueError):
+            return cls(recording=recording)
+        if saved.get('version') != FORMAT_VERSION:
+            return cls(recording=recording)
+        return cls(saved['filters'], recording=recording)
+
+    def save(self, path):
+        """Save the statistics, replacing the file rather than truncating it.
+
+        :param path: The statistics file.
+        """
+        path = pathlib.Path(path)
+        with self._lock:
+            data = json.dumps({'version': FORMAT_VERSION,
+                               'filters': self.counts},
+                              indent=2, sort_keys=True)
+        temporary = path.with_name(path.name + '.tmp')
+        with open(temporary, 'w') as outfile:
+            outfile.write(data)
+        os.replace(temporary, path)
+
+    def record(self, _filter, evaluated, passed):
+        """Record one evaluation of a filter on many close approaches.
+
+        :param _filter: An `AttributeFilter`.
+        :param evaluated: The number of approaches it was evaluated on.
+        :param passed: The number of those that passed.
+        """
+        key, bucket = _key(_filter), _bucket(_filter.value)
+        with self._lock:
+            pair = self.counts.setdefault(key, {}).setdefault(bucket, [0, 0])
+            pair[0] += evaluated
+            pair[1] += passed
+
+    def selectivity(self, _filter):
+        """Estimate the fraction of close approaches that pass a filter.
+
+        :param _filter: An `AttributeFilter`.
+        :return: The pass rate of filters of the same kind with values in
+        the same bucket, or else of all values, or None if no filters of
+        that kind have been recorded.
+        """
+        with self._lock:
+            buckets = self.counts.get(_key(_filter), {})
+            evaluated, passed = buckets.get(_bucket(_filter.value), (0, 0))
+            if not evaluated:
+                evaluated = sum(pair[0] for pair in buckets.values())
+                passed = sum(pair[1] for pair in buckets.values())
+        return passed / evaluated if evaluated else None
+
+    def order(self, filters):
+        """Order filters most-selective-first.
+
+        Filters without statistics keep their order, after the others.
+
+        :param filters: A collection of filters.
+        :return: A list of the same filters.
+        """
+        estimates = [self.selectivity(_filter) for _filter in filters]
+        order = sorted(range(len(estimates)),
+                       key=lambda i: (estimates[i] is None, estimates[i] or 0))
+        return [filters[i] for i in order]
+
+
+def _key(_filter):
+    """Return the kind of a filter, such as 'DistanceFilter.le'."""
+    return f'{type(_filter).__name__}.{_filter.op.__name__}'
+
+
+def _bucket(value):
+    """Return the bucket of a reference value, as a string.
+
+    Numbers are rounded to one significant digit, and dates to months.
+    """
+    if isinstance(value, bool) or value is None:
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%Y-%m')
+    if isinstance(value, (int, float)):
+        return f'{value:.0e}'
+    return str(value)
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
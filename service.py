@@ -0,0 +1,258 @@
+"""Serve close approach queries over HTTP, streaming the results.
+
+A `QueryService` listens on a local port and answers `POST /query`
+requests, whose body is a JSON object with a 'filters' object of
+`create_filters` criteria (with dates in YYYY-MM-DD format), and
+optionally a 'limit' and a list of export 'columns' - like the queries
+of the `batch` subcommand:
+
+    $ curl -d '{"filters": {"hazardous": true}, "limit": 5}' localhost:8000/query
+
+The matching close approaches are sent back as NDJSON (one JSON object
+per line, as written by `write.JSONLinesWriter`) in a chunked response,
+while the scan is still running: the approaches are filtered a chunk of
+rows at a time on a thread of the event loop's executor, and each
+chunk's matches are sent as soon as they're found. A scan that fails
+part way through ends its response with an `{"error": ...}` line.
+
+Only one chunk of each response is scanned ahead of what the client has
+read, so a slow client slows down its own scan rather than filling the
+server's memory, and a client that disconnects stops its scan. The
+service is built on `asyncio` streams alone, and handles many clients
+at once, each reading from the current snapshot of a `SnapshotDatabase`
+(or from a plain `NEODatabase`).
+"""
+import asyncio
+import json
+
+import numpy as np
+
+from filters import create_filters, UnsupportedCriterionError
+from helpers import str_to_date
+
+# The largest request (head and body) that the service accepts, in bytes:
+_MAX_REQUEST = 1 << 16
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class BadRequest(ValueError):
+    """A request can't be answered, with the HTTP status to answer with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class QueryService:
+    """An `asyncio` server of streamed close approach queries."""
+
+    def __init__(self, database, chunk_size=65536):
+        """Create a new `QueryService`.
+
+        :param database: A `SnapshotDatabase` or `NEODatabase` to query.
+        :param chunk_size: The number of rows to scan at a time, between
+        which matches are sent and cancellation is checked.
+        """
+        self.database = database
+        self.chunk_size = chunk_size
+        # The number of responses being streamed, and of chunks scanned:
+        self.active = 0
+        self.scanned = 0
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening for connections.
+
+        :param host: The interface on which to listen.
+        :param port: The port on which to listen, or 0 for any free one.
+        :return: The port on which the service listens.
+        """
+        self._server = await asyncio.start_server(self._handle, host, port,
+                                                  limit=_MAX_REQUEST)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Serve connections until cancelled."""
+        # The server accepts connections on its own; wait on a future
+        # that's never done (`Server.serve_forever` needs Python 3.7+).
+        await asyncio.get_event_loop().create_future()
+
+    async def close(self):
+        """Stop listening, and wait for the listening socket to close."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        """Answer one request, then close the connection."""
+        try:
+            try:
+                query = await self._read_request(reader)
+            except BadRequest as error:
+                await self._send_error(writer, error.status, str(error))
+                return
+            await self._stream(writer, *query)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # The client went away: there's no one left to answer.
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Read and parse a query request.
+
+        :return: A tuple of a snapshot of the database, the filters, the
+        limit (or None), and the export columns of the query.
+        :raises BadRequest: If the request isn't a valid query.
+        """
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.LimitOverrunError:
+            raise BadRequest(413, "The request is too large.")
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _version = request_line.split(' ')
+        except ValueError:
+            raise BadRequest(400, "Malformed request line.")
+        if target.split('?')[0] != '/query':
+            raise BadRequest(404, f"No such resource: {target}")
+        if method != 'POST':
+            raise BadRequest(405, "Queries must be POSTed to /query.")
+        headers = {}
+        for line in filter(None, header_lines):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise BadRequest(400, "Malformed Content-Length.")
+        if length > _MAX_REQUEST:
+            raise BadRequest(413, "The request is too large.")
+        body = await reader.readexactly(length)
+
+        try:
+            record = json.loads(body or b'{}')
+            criteria = dict(record.get('filters', {}))
+            for key in ('date', 'start_date', 'end_date'):
+                if criteria.get(key):
+                    criteria[key] = str_to_date(criteria[key])
+            filters = create_filters(**criteria)
+            limit = record.get('limit')
+            # JSON's true and false would pass as the ints 1 and 0.
+            if limit is not None and (not isinstance(limit, int)
+                                      or isinstance(limit, bool)
+                                      or limit < 0):
+                raise ValueError(f"Invalid limit: {limit!r}")
+            database = self.database
+            if hasattr(database, 'snapshot'):
+                database = database.snapshot()
+            database.check_filters(filters)
+            extras = database.approach_fields(record.get('columns', ()))
+        except (ValueError, TypeError, AttributeError,
+                UnsupportedCriterionError) as error:
+            raise BadRequest(400, f"Invalid query: {error}")
+        return database, filters, limit, extras
+
+    async def _stream(self, writer, database, filters, limit, extras):
+        """Scan the database, streaming each chunk's matches to a client.
+
+        The next chunk is scanned while the client reads the previous
+        one, but no further: each chunk waits for the transport's buffer
+        to drain before the next scan starts.
+        """
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: application/x-ndjson\r\n'
+                     b'Transfer-Encoding: chunked\r\n'
+                     b'Connection: close\r\n\r\n')
+        self.active += 1
+        starts = iter(range(0, len(database), self.chunk_size))
+        remaining = limit
+        pending = self._scan_next(database, filters, extras, starts, remaining)
+        try:
+            while pending is not None:
+                try:
+                    data, count = await pending
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    # The status line is already sent: end the stream
+                    # with an error record instead.
+                    pending = None
+                    data = (json.dumps({'error': f"The scan failed: {error}"})
+                            + '\n').encode()
+                    writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    break
+                self.scanned += 1
+                if remaining is not None:
+                    remaining -= count
+                if data:
+                    writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                pending = self._scan_next(database, filters, extras, starts,
+                                          remaining)
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        finally:
+            self.active -= 1
+            if pending is not None:
+                # The client went away mid-scan: the scan finishes on its
+                # thread, but nothing waits for it.
+                pending.cancel()
+
+    def _scan_next(self, database, filters, extras, starts, remaining):
+        """Start scanning the next chunk of rows on an executor thread.
+
+        :return: A future of the result of `_scan`, or None if there are
+        no more rows to scan or no more matches are wanted.
+        """
+        start = next(starts, None)
+        if start is None or remaining == 0:
+            return None
+        return asyncio.get_event_loop().run_in_executor(
+            None, _scan, database, filters, extras, start,
+            start + self.chunk_size, remaining)
+
+    async def _send_error(self, writer, status, message):
+        """Send an error response with a JSON body."""
+        body = json.dumps({'error': message}).encode() + b'\n'
+        writer.write(f'HTTP/1.1 {status} {_REASONS[status]}\r\n'
+                     f'Content-Type: application/json\r\n'
+                     f'Content-Length: {len(body)}\r\n'
+                     f'Connection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+
+
+def _scan(database, filters, extras, start, stop, limit):
+    """Serialize the matches within a range of rows, on an executor thread.
+
+    :return: A tuple of the NDJSON bytes of the matches, and how many
+    there are.
+    """
+    rows = np.arange(start, min(stop, len(database)))
+    positions = database.query_positions(filters, within=rows)[:limit]
+    lines = []
+    for approach in database.approaches_at(positions):
+        record = approach.serialize('json')
+        if extras.names:
+            record.update(extras(approach))
+        lines.append(json.dumps(record, allow_nan=True) + '\n')
+    return ''.join(lines).encode(), len(lines)
+
+
+async def serve(database, host='127.0.0.1', port=8000, chunk_size=65536):
+    """Serve queries of a database until interrupted.
+
+    :param database: A `SnapshotDatabase` or `NEODatabase` to query.
+    :param host: The interface on which to listen.
+    :param port: The port on which to listen.
+    :param chunk_size: The number of rows to scan at a time.
+    """
+    service = QueryService(database, chunk_size)
+    port = await service.start(host, port)
+    print(f"Serving queries on http://{host}:{port}/query")
+    await service.serve_forever()
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
@@ -0,0 +1,91 @@
+"""Serve an NEO database to concurrent readers while it's reloaded.
+
+An `NEODatabase` isn't safe to change while it's being queried:
+building one links its NEOs and close approaches together in place
+(each NEO's `.approaches` is filled and sorted), and its columns and
+indexes are only consistent with each other once it's complete.
+
+A `SnapshotDatabase` never changes a database that readers can see.
+Writers - `reload` and `append` - build a complete new version from new
+objects, one writer at a time, and then publish it by replacing a
+single reference. Readers take that reference (a snapshot) without any
+lock, so they never wait for a writer, and a query keeps reading the
+version it started with even if a newer one is published meanwhile.
+Old versions are freed once no reader holds them. Each new version
+keeps the previous version's `filter_stats`.
+"""
+import threading
+
+
+class SnapshotDatabase:
+    """An `NEODatabase` whose versions are replaced atomically.
+
+    Attributes and methods of the current version (such as `query`,
+    `count` or `get_neo_by_designation`) can be used directly on a
+    `SnapshotDatabase`, but each use may see a different version. To run
+    several reads against the same version, take a `snapshot` first.
+    """
+
+    def __init__(self, load):
+        """Create a new `SnapshotDatabase`.
+
+        :param load: A callable that returns a new `NEODatabase`, built
+        from newly loaded NEOs and close approaches (rather than from
+        objects of another database), used to load the first version
+        and by `reload`.
+        """
+        self._load = load
+        # Only writers take this lock:
+        self._write_lock = threading.Lock()
+        self._snapshot = load()
+        self.version = 1
+
+    def snapshot(self):
+        """Return the current version of the database.
+
+        The returned `NEODatabase` is never changed, so it can be read
+        for as long as needed, by any number of threads.
+        """
+        return self._snapshot
+
+    def reload(self, load=None):
+        """Load and publish a new version of the database.
+
+        :param load: An optional callable to use instead of the one
+        given to the constructor, such as one that reads a newer data
+        file.
+        :return: The new version number.
+        """
+        with self._write_lock:
+            database = (load or self._load)()
+            if database.filter_stats is None:
+                database.filter_stats = self._snapshot.filter_stats
+            return self._publish(database)
+
+    def append(self, approaches, approach_columns=None):
+        """Publish a new version with additional close approaches.
+
+        :param approaches: A collection of new, unlinked `CloseApproach`es.
+        :param approach_columns: An optional mapping from column names to
+        arrays of the new approaches' additional fields.
+        :return: The new version number.
+        """
+        with self._write_lock:
+            return self._publish(self._snapshot.extended(approaches,
+                                                         approach_columns))
+
+    def _publish(self, database):
+        """Replace the current version, while holding the write lock."""
+        self._snapshot = database
+        self.version += 1
+        return self.version
+
+    def __getattr__(self, name):
+        """Look up an attribute of the current version."""
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.snapshot(), name)
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
@@ -0,0 +1,194 @@
+"""Persist columns of data in a memory-mapped column store.
+
+A column store is a directory of files: one file of fixed-width values
+per column of numbers, times or flags, and a pair of files per column of
+strings - the strings' UTF-8 bytes laid end to end (the heap), and an
+array of the offsets at which each string starts and ends. A manifest
+records the type and length of every column, along with any metadata.
+
+The `write_store` function writes a column store, and the `ColumnStore`
+class opens one. Opening a store reads only its manifest: the column
+files are mapped into memory with `mmap`, so their pages are read on
+first access, and are shared through the operating system's page cache
+by every process that maps the same store.
+
+The `NEODatabase` class uses a column store to save its columns, and
+to query over them directly when reopened (see `NEODatabase.save` and
+`NEODatabase.open`).
+"""
+import json
+import mmap
+import os
+import pathlib
+
+import numpy as np
+
+# The version of the layout of the files of a column store.
+FORMAT_VERSION = 1
+
+# The name of the file that describes the columns of a column store.
+MANIFEST = 'manifest.json'
+
+
+class StoreFormatError(ValueError):
+    """A directory isn't a column store, or has an unsupported layout."""
+
+
+class StringHeap:
+    """A read-only sequence of strings, stored end to end in one buffer.
+
+    The `i`th string is the UTF-8 decoding of the bytes between the
+    `i`th and `i + 1`th offsets, so looking one up doesn't touch the
+    others.
+    """
+
+    def __init__(self, offsets, heap):
+        """Create a new `StringHeap`.
+
+        :param offsets: An array of one more offset than there are
+        strings, as returned by `StringHeap.pack`.
+        :param heap: A buffer (such as bytes or a memory map) of the
+        strings' UTF-8 bytes.
+        """
+        self._offsets = offsets
+        self._heap = heap
+
+    @staticmethod
+    def pack(strings):
+        """Lay out strings end to end.
+
+        :param strings: A collection of strings.
+        :return: A tuple of an `int64` array of offsets and the bytes of
+        the heap.
+        """
+        encoded = [string.encode() for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        return offsets, b''.join(encoded)
+
+    def __len__(self):
+        """Return the number of strings."""
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        """Return the `i`th string."""
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"String {i} is out of range.")
+        if i < 0:
+            i += len(self)
+        start, stop = self._offsets[i], self._offsets[i + 1]
+        return bytes(self._heap[start:stop]).decode()
+
+
+def write_store(path, columns, strings=None, metadata=None):
+    """Write columns to a new column store.
+
+    Every file is written under a temporary name and then renamed, so
+    processes that have mapped an older store at the same path keep
+    their files intact. The manifest is written last, so that an
+    interrupted write doesn't leave a store that can be opened.
+
+    :param path: The directory of the column store, which is created if
+    it doesn't exist.
+    :param columns: A mapping from column names to one-dimensional
+    `numpy` arrays of fixed-width values.
+    :param strings: An optional mapping from column names to
+    collections of strings.
+    :param metadata: An optional JSON-serializable dictionary to keep
+    with the columns.
+    """
+    path = pathlib.Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    try:
+        os.remove(path / MANIFEST)
+    except FileNotFoundError:
+        pass
+    manifest = {'version': FORMAT_VERSION,
+                'columns': {},
+                'strings': {},
+                'metadata': metadata or {}}
+
+    for name, values in columns.items():
+        values = np.ascontiguousarray(values)
+        _write_file(path / f'{name}.col', values.tobytes())
+        manifest['columns'][name] = {'dtype': values.dtype.str,
+                                     'length': len(values)}
+
+    for name, values in (strings or {}).items():
+        offsets, heap = StringHeap.pack(values)
+        _write_file(path / f'{name}.offsets.col', offsets.tobytes())
+        _write_file(path / f'{name}.heap', heap)
+        manifest['strings'][name] = {'length': len(offsets) - 1}
+
+    _write_file(path / MANIFEST, json.dumps(manifest, indent=2).encode())
+
+
+class ColumnStore:
+    """An open column store, with its columns mapped into memory.
+
+    `.columns` maps column names to read-only `numpy` arrays, and
+    `.strings` maps column names to `StringHeap`s, all backed by the
+    store's files rather than by copies in this process.
+    """
+
+    def __init__(self, path):
+        """Open a column store.
+
+        :param path: The directory of the column store.
+        :raises StoreFormatError: If the directory has no manifest, or
+        was written in an unsupported layout.
+        """
+        self.path = pathlib.Path(path)
+        try:
+            with open(self.path / MANIFEST) as infile:
+                manifest = json.load(infile)
+        except (OSError, ValueError):
+            raise StoreFormatError(f"{self.path} isn't a column store.")
+        if manifest.get('version') != FORMAT_VERSION:
+            raise StoreFormatError(f"{self.path} has an unsupported column "
+                                   f"store version: "
+                                   f"{manifest.get('version')!r}.")
+
+        self.metadata = manifest['metadata']
+        self.columns = {
+            name: _map_array(self.path / f'{name}.col',
+                             np.dtype(spec['dtype']), spec['length'])
+            for name, spec in manifest['columns'].items()
+        }
+        self.strings = {
+            name: StringHeap(
+                _map_array(self.path / f'{name}.offsets.col',
+                           np.dtype(np.int64), spec['length'] + 1),
+                _map_bytes(self.path / f'{name}.heap'))
+            for name, spec in manifest['strings'].items()
+        }
+
+
+def _write_file(filename, data):
+    """Replace the contents of a file, without truncating it in place."""
+    temporary = filename.with_name(filename.name + '.tmp')
+    with open(temporary, 'wb') as outfile:
+        outfile.write(data)
+    os.replace(temporary, filename)
+
+
+def _map_bytes(filename):
+    """Map a file into memory, read-only."""
+    with open(filename, 'rb') as infile:
+        # Empty files can't be mapped, but have nothing to share anyway.
+        if not infile.seek(0, 2):
+            return b''
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _map_array(filename, dtype, length):
+    """Map a file of fixed-width values into memory, as an array."""
+    buffer = _map_bytes(filename)
+    if len(buffer) != length * dtype.itemsize:
+        raise StoreFormatError(f"{filename} doesn't hold {length} values "
+                               f"of type {dtype}.")
+    return np.frombuffer(buffer, dtype=dtype, count=length)
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
@@ -0,0 +1,238 @@
+"""Summarize the close approaches of each near-Earth object.
+
+The `NEOSummary` class precomputes, for every NEO, the statistics that
+`inspect` prints about its close approaches: the number of approaches,
+the closest approach (distance and time), the fastest relative
+velocity, and the first, last and next (future) approach times.
+
+The statistics are stored as columns - one `numpy` array per statistic,
+with one entry per NEO - rather than as attributes of each NEO, so a
+whole column can be compared at once to answer questions such as
+"which NEOs ever approach within 0.01 au?" without walking any NEO's
+collection of close approaches.
+
+Next approach times depend on the current time, so they aren't
+precomputed: they're found when asked for, with a binary search of each
+NEO's approach times, so a long-running process (such as `serve` or the
+interactive shell) never reports an approach that has already happened.
+
+The `NEODatabase` constructor builds one `NEOSummary` from its linked
+NEOs and close approaches.
+"""
+import datetime
+
+import numpy as np
+
+# Times are stored with the same (minute) resolution as the data set.
+_TIME_UNIT = 'datetime64[m]'
+_NAT = np.datetime64('NaT', 'm')
+
+# The columns that don't depend on the current time, which can be saved
+# and restored with `NEOSummary.from_columns`:
+COLUMNS = ('count', 'min_distance', 'min_distance_time', 'max_velocity',
+           'first_time', 'last_time')
+
+
+class NEOSummary:
+    """Per-NEO statistics about close approaches, stored as columns.
+
+    Each column is a `numpy` array indexed by the position of the NEO in
+    `.neos`. NEOs without any close approaches have a count of 0, NaN
+    distances and velocities, and NaT (not-a-time) times.
+    """
+
+    def __init__(self, neos, approaches, now=None, neo_rows=None):
+        """Create a new `NEOSummary`.
+
+        :param neos: A collection of `NearEarthObject`s.
+        :param approaches: A collection of `CloseApproach`es, already
+        linked to the NEOs.
+        :param now: The `datetime` after which approaches count as
+        "next" (defaults to the current time, whenever they're asked
+        for).
+        :param neo_rows: An optional array of the position in `neos` of
+        each approach's NEO (-1 if unlinked), such as the one computed
+        when linking, to save looking each approach's NEO up again.
+        """
+        self.neos = list(neos)
+        self._rows = {neo.designation: row
+                      for row, neo in enumerate(self.neos)}
+        self._now = now
+
+        if neo_rows is None:
+            neo_rows = [self._rows[approach.neo.designation]
+                        if approach.neo is not None else -1
+                        for approach in approaches]
+        neo_rows = np.asarray(neo_rows, dtype=np.int64)
+        linked = [approach for approach, row in zip(approaches, neo_rows)
+                  if row >= 0]
+        rows = neo_rows[neo_rows >= 0]
+        times = np.array([approach.time for approach in linked],
+                         dtype=_TIME_UNIT)
+        distances = np.array([approach.distance for approach in linked],
+                             dtype=np.float64)
+        velocities = np.array([approach.velocity for approach in linked],
+                              dtype=np.float64)
+        size = len(self.neos)
+
+        self.count = np.bincount(rows, minlength=size).astype(np.int32)
+        self.min_distance = _reduce(np.fmin, size, rows, distances, np.nan)
+        self.max_velocity = _reduce(np.fmax, size, rows, velocities, np.nan)
+
+        # Time columns are reduced as integer minutes, with NaT as the
+        # sentinel of NEOs without (future) approaches:
+        minutes = times.astype(np.int64)
+        self.first_time = _reduce(np.minimum, size, rows, minutes,
+                                  np.iinfo(np.int64).max)
+        self.last_time = _reduce(np.maximum, size, rows, minutes,
+                                 np.iinfo(np.int64).min)
+        self.first_time = _as_times(self.first_time, self.count > 0)
+        self.last_time = _as_times(self.last_time, self.count > 0)
+
+        # Approach times grouped by NEO, and sorted within each group,
+        # for finding next approaches:
+        self._times = times[np.lexsort((minutes, rows))]
+        self._offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(self.count, out=self._offsets[1:])
+
+        # The time of the closest approach: order approaches by NEO, then
+        # by distance, and take the first approach of each NEO.
+        order = np.lexsort((distances, rows))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = rows[order][1:] != rows[order][:-1]
+        self.min_distance_time = np.full(size, _NAT)
+        self.min_distance_time[rows[order][first]] = times[order][first]
+
+    @classmethod
+    def from_columns(cls, neos, columns, times, offsets, now=None):
+        """Restore a `NEOSummary` from previously computed columns.
+
+        Next approach times, which depend on the current time, are found
+        from the approach times grouped by NEO, without visiting any
+        approaches.
+
+        :param neos: A collection of `NearEarthObject`s.
+        :param columns: A mapping from each name in `COLUMNS` to the
+        column of that name of a `NEOSummary` of the same NEOs.
+        :param times: An array of approach times, grouped by NEO, and
+        sorted by time within each NEO's group.
+        :param offsets: An array of the start of each NEO's group in
+        `times`, followed by the end of the last group.
+        :param now: The `datetime` after which approaches count as
+        "next" (defaults to the current time, whenever they're asked
+        for).
+        :return: A new `NEOSummary`.
+        """
+        summary = cls.__new__(cls)
+        summary.neos = list(neos)
+        summary._rows = {neo.designation: row
+                         for row, neo in enumerate(summary.neos)}
+        for name in COLUMNS:
+            setattr(summary, name, columns[name])
+        summary._now = now
+        summary._times = times
+        summary._offsets = offsets
+        return summary
+
+    @property
+    def next_time(self):
+        """Return the column of each NEO's next approach time (or NaT)."""
+        # The first future approach of each NEO follows its past ones:
+        past = np.zeros(len(self._times) + 1, dtype=np.int64)
+        np.cumsum(self._times < self._current_time(), out=past[1:])
+        starts, stops = self._offsets[:-1], self._offsets[1:]
+        following = starts + (past[stops] - past[starts])
+        known = following < stops
+        next_time = np.full(len(self.neos), _NAT)
+        next_time[known] = self._times[following[known]]
+        return next_time
+
+    def _current_time(self):
+        """Return the time after which approaches count as "next"."""
+        now = self._now if self._now is not None else datetime.datetime.now()
+        return np.datetime64(now, 'm')
+
+    def __len__(self):
+        """Return the number of summarized NEOs."""
+        return len(self.neos)
+
+    def describe(self, neo):
+        """Return the summary of one NEO's close approaches.
+
+        :param neo: A summarized `NearEarthObject`.
+        :return: A dictionary of the NEO's statistics, with `datetime`
+        times and `None` for missing values.
+        """
+        row = self._rows[neo.designation]
+        start, stop = self._offsets[row], self._offsets[row + 1]
+        following = start + np.searchsorted(self._times[start:stop],
+                                            self._current_time())
+        next_time = self._times[following] if following < stop else _NAT
+        return {'count': int(self.count[row]),
+                'min_distance': _as_value(self.min_distance[row]),
+                'min_distance_time': _as_value(self.min_distance_time[row]),
+                'max_velocity': _as_value(self.max_velocity[row]),
+                'first_time': _as_value(self.first_time[row]),
+                'last_time': _as_value(self.last_time[row]),
+                'next_time': _as_value(next_time),
+                }
+
+    def select(self, distance_min=None, distance_max=None,
+               velocity_min=None, velocity_max=None,
+               count_min=None, count_max=None):
+        """Return the NEOs whose summary matches all given criteria.
+
+        Each criterion is compared with a whole column at once, so no
+        NEO's close approaches are visited.
+
+        :param distance_min: A minimum closest approach distance, in au.
+        :param distance_max: A maximum closest approach distance, in au.
+        :param velocity_min: A minimum fastest velocity, in km/s.
+        :param velocity_max: A maximum fastest velocity, in km/s.
+        :param count_min: A minimum number of close approaches.
+        :param count_max: A maximum number of close approaches.
+        :return: A list of matching `NearEarthObject`s.
+        """
+        mask = np.ones(len(self.neos), dtype=bool)
+        if distance_min is not None:
+            mask &= self.min_distance >= distance_min
+        if distance_max is not None:
+            mask &= self.min_distance <= distance_max
+        if velocity_min is not None:
+            mask &= self.max_velocity >= velocity_min
+        if velocity_max is not None:
+            mask &= self.max_velocity <= velocity_max
+        if count_min is not None:
+            mask &= self.count >= count_min
+        if count_max is not None:
+            mask &= self.count <= count_max
+        return [self.neos[row] for row in np.flatnonzero(mask)]
+
+
+def _reduce(ufunc, size, rows, values, initial):
+    """Reduce `values` into one entry per row with an unbuffered ufunc."""
+    reduced = np.full(size, initial, dtype=values.dtype)
+    ufunc.at(reduced, rows, values)
+    return reduced
+
+
+def _as_times(minutes, known):
+    """Convert integer minutes into times, with NaT where not `known`."""
+    times = minutes.astype(_TIME_UNIT)
+    times[~known] = _NAT
+    return times
+
+
+def _as_value(value):
+    """Convert a `numpy` scalar into a Python value, or None if missing."""
+    if isinstance(value, np.datetime64):
+        if np.isnat(value):
+            return None
+        return value.astype(datetime.datetime)
+    if np.isnan(value):
+        return None
+    return float(value)
+
+
+if __name__ == '__main__':
+    print(f"First Module's Name: {__name__}\n")
@@ -0,0 +1,120 @@
+"""Check that compressed bitmaps combine like sets of positions.
+
+A `Bitmap` keeps a set of row positions in containers of sorted offsets
+or of packed bits, and an `NEODatabase` keeps bitmaps of its approaches
+by NEO flags and by year, to narrow queries on hazardousness, diameter
+and dates.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_bitmap
+"""
+import datetime
+import pathlib
+import unittest
+
+import numpy as np
+
+from bitmap import Bitmap
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestBitmap(unittest.TestCase):
+    def setUp(self):
+        generator = np.random.default_rng(0)
+        # Sparse and dense sets, over a partial last container:
+        self.size = 3 * 65536 + 1000
+        self.masks = [generator.random(self.size) < fraction
+                      for fraction in (0.001, 0.02, 0.5, 0.97)]
+        self.masks[1][70000:140000] = True
+        self.bitmaps = [Bitmap.from_mask(mask) for mask in self.masks]
+
+    def assertPositions(self, bitmap, mask):
+        self.assertEqual(bitmap.positions().tolist(),
+                         np.flatnonzero(mask).tolist())
+        self.assertEqual(len(bitmap), np.count_nonzero(mask))
+
+    def test_operations_match_masks(self):
+        for i, (a, mask_a) in enumerate(zip(self.bitmaps, self.masks)):
+            self.assertPositions(~a, ~mask_a)
+            for b, mask_b in zip(self.bitmaps[i:], self.masks[i:]):
+                with self.subTest(a=a, b=b):
+                    self.assertPositions(a & b, mask_a & mask_b)
+                    self.assertPositions(a | b, mask_a | mask_b)
+                    self.assertPositions(a - b, mask_a & ~mask_b)
+                    self.assertPositions(b - a, mask_b & ~mask_a)
+
+    def test_contains(self):
+        positions = np.arange(0, self.size, 7)
+        for bitmap, mask in zip(self.bitmaps, self.masks):
+            self.assertEqual(bitmap.contains(positions).tolist(),
+                             mask[positions].tolist())
+
+    def test_compression(self):
+        sparse, dense = self.bitmaps[0], self.bitmaps[2]
+        self.assertEqual(sparse.nbytes, 2 * len(sparse))
+        self.assertLessEqual(dense.nbytes, self.size / 8 + 8192)
+        self.assertEqual(len(~Bitmap(self.size)), self.size)
+        self.assertEqual((~Bitmap(self.size)).nbytes, 3 * 8192 + 2000)
+
+    def test_mismatched_sizes(self):
+        with self.assertRaises(ValueError):
+            Bitmap(10) & Bitmap(11)
+        with self.assertRaises(ValueError):
+            Bitmap.from_positions([10], 10)
+
+
+class TestDatabaseBitmaps(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), cls.approaches)
+
+    def test_bitmaps_match_approaches(self):
+        def positions(predicate):
+            return [row for row, approach in enumerate(self.approaches)
+                    if predicate(approach)]
+
+        self.assertEqual(self.db.bitmap('hazardous').positions().tolist(),
+                         positions(lambda i: i.neo and i.neo.hazardous))
+        self.assertEqual(self.db.bitmap('diameter-known').positions().tolist(),
+                         positions(lambda i: i.neo
+                                   and not np.isnan(i.neo.diameter)))
+        self.assertEqual(self.db.bitmap('named').positions().tolist(),
+                         positions(lambda i: i.neo and i.neo.name))
+        self.assertEqual(self.db.bitmap('2020').positions().tolist(),
+                         positions(lambda i: i.time.year == 2020))
+        with self.assertRaises(KeyError):
+            self.db.bitmap('1066')
+
+    def test_indexed_queries_match_every_approach(self):
+        for criteria in ({'hazardous': True},
+                         {'hazardous': True, 'diameter_min': 0.5},
+                         {'diameter_max': 0.3,
+                          'start_date': datetime.date(2020, 6, 1)},
+                         {'hazardous': True, 'distance_max': 0.1,
+                          'end_date': datetime.date(2020, 3, 1)},
+                         {'date': datetime.date(2021, 1, 1),
+                          'hazardous': True}):
+            filters = create_filters(**criteria)
+            with self.subTest(criteria=criteria):
+                self.assertIsNotNone(self.db._indexed_rows(filters))
+                expected = [approach for approach in self.approaches
+                            if approach.neo
+                            and all(_filter(approach) for _filter in filters)]
+                self.assertEqual(list(self.db.query(filters)), expected)
+                self.assertEqual(self.db.count(filters), len(expected))
+
+    def test_broad_predicates_are_not_indexed(self):
+        self.assertIsNone(self.db._indexed_rows(
+            create_filters(hazardous=False)))
+
+
+if __name__ == '__main__':
+    unittest.main()
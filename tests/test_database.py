@@ -10,6 +10,7 @@ To run these tests from the project root, run:
 
 These tests should pass when Task 2 is complete.
 """
+import datetime
 import math
 import pathlib
 import unittest
@@ -52,6 +53,33 @@ class TestDatabase(unittest.TestCase):
                     self.fail(f"{approach} appears in the approaches of multiple NEOs.")
                 seen.add(approach)
 
+    def test_database_construction_shares_designations_with_neos(self):
+        for approach in self.approaches:
+            self.assertIs(approach._designation, approach.neo.designation)
+
+    def test_database_construction_sorts_approaches_of_each_neo(self):
+        for neo in self.neos:
+            times = [approach.time for approach in neo.approaches]
+            self.assertEqual(times, sorted(times))
+
+    def test_approaches_between(self):
+        neo = self.db.get_neo_by_designation('68347')
+        start, end = datetime.date(2020, 2, 8), datetime.date(2020, 8, 4)
+        expected = [approach for approach in neo.approaches
+                    if start <= approach.time.date() <= end]
+        self.assertEqual(len(expected), 2)
+        self.assertEqual(neo.approaches_between(start, end), expected)
+        self.assertEqual(neo.approaches_between(), neo.approaches)
+        self.assertEqual(neo.approaches_between(end=start), expected[:1])
+
+    def test_next_approach(self):
+        neo = self.db.get_neo_by_designation('68347')
+        approach = neo.next_approach(datetime.date(2020, 7, 1))
+        self.assertEqual(approach.time, datetime.datetime(2020, 8, 4, 4, 22))
+        approach = neo.next_approach(datetime.datetime(2020, 8, 4, 4, 22))
+        self.assertEqual(approach.time, datetime.datetime(2020, 8, 4, 4, 22))
+        self.assertIsNone(neo.next_approach(datetime.date(2021, 1, 1)))
+
     def test_get_neo_by_designation(self):
         cerberus = self.db.get_neo_by_designation('1865')
         self.assertIsNotNone(cerberus)
@@ -112,6 +140,30 @@ class TestDatabase(unittest.TestCase):
         nonexistent = self.db.get_neo_by_name('not-real-name')
         self.assertIsNone(nonexistent)
 
+    def test_search_names_ignores_capitalization(self):
+        for text in ('lemmon', 'LEMMON', '2013 tl117'):
+            matches = self.db.search_names(text)
+            self.assertEqual([neo.designation for neo in matches], ['2013 TL117'])
+
+    def test_search_names_by_prefix(self):
+        matches = self.db.search_names('jor', match='prefix')
+        self.assertIn(self.db.get_neo_by_name('Jormungandr'), matches)
+        for neo in matches:
+            self.assertTrue(neo.designation.lower().startswith('jor')
+                            or (neo.name or '').lower().startswith('jor'))
+
+    def test_search_names_with_typos(self):
+        matches = self.db.search_names('Jormungand', match='fuzzy')
+        self.assertEqual(matches[0].name, 'Jormungandr')
+        self.assertEqual(self.db.search_names('Jrmngandr', match='fuzzy'), [])
+        matches = self.db.search_names('Jrmngandr', match='fuzzy', max_distance=2)
+        self.assertEqual(matches[0].name, 'Jormungandr')
+
+    def test_search_names_missing(self):
+        self.assertEqual(self.db.search_names('not-real-name'), [])
+        with self.assertRaises(ValueError):
+            self.db.search_names('Lemmon', match='regex')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,132 @@
+"""Check that partitioned exports match a single export of the same query.
+
+The `export_partitions` function writes one file per year or month of
+approach times, with a manifest of each file's rows and checksum.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_export
+"""
+import csv
+import hashlib
+import json
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from export import MANIFEST, export_partitions
+from extract import load_neos, load_approaches, load_approach_columns
+from filters import create_filters
+from write import open_writer
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def read_rows(path):
+    """Return the rows of a CSV file, without its header."""
+    with open(path, newline='') as infile:
+        return list(csv.reader(infile))[1:]
+
+
+class TestExportPartitions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE),
+                             approach_columns=load_approach_columns(
+                                 TEST_CAD_FILE, ('dist_min',)))
+        cls.filters = create_filters(distance_max=0.1)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def export_all(self, columns=()):
+        """Write every match to one CSV file, and return its rows."""
+        with open_writer(self.path / 'all.csv',
+                         self.db.approach_fields(columns)) as writer:
+            for approach in self.db.query(self.filters):
+                writer.write(approach)
+        return read_rows(self.path / 'all.csv')
+
+    def test_months_concatenate_to_single_export(self):
+        outdir = self.path / 'months'
+        manifest = export_partitions(self.db, outdir, self.filters,
+                                     by='month', columns=('dist_min',))
+        keys = [partition['key'] for partition in manifest['partitions']]
+        self.assertEqual(keys, sorted(keys))
+        self.assertTrue(all(key.startswith('2020-') for key in keys))
+
+        rows = []
+        for partition in manifest['partitions']:
+            partition_rows = read_rows(outdir / partition['file'])
+            self.assertEqual(len(partition_rows), partition['rows'])
+            self.assertTrue(all(row[0].startswith(partition['key'])
+                                for row in partition_rows))
+            rows.extend(partition_rows)
+        self.assertEqual(sorted(rows), sorted(self.export_all(('dist_min',))))
+        self.assertEqual(manifest['rows'], len(rows))
+
+    def test_manifest_checksums_match_files(self):
+        manifest = export_partitions(self.db, self.path, self.filters,
+                                     extension='.json.gz')
+        with open(self.path / MANIFEST) as infile:
+            self.assertEqual(json.load(infile), manifest)
+        self.assertEqual([partition['key']
+                          for partition in manifest['partitions']], ['2020'])
+        for partition in manifest['partitions']:
+            data = (self.path / partition['file']).read_bytes()
+            self.assertEqual(len(data), partition['bytes'])
+            self.assertEqual(hashlib.sha256(data).hexdigest(),
+                             partition['sha256'])
+
+    def test_worker_processes_write_identical_files(self):
+        serial = export_partitions(self.db, self.path / 'serial',
+                                   self.filters, by='month')
+        parallel = export_partitions(self.db, self.path / 'parallel',
+                                     self.filters, by='month', workers=2)
+        self.assertEqual(parallel['partitions'], serial['partitions'])
+
+    def test_no_matches_writes_empty_manifest(self):
+        manifest = export_partitions(self.db, self.path,
+                                     create_filters(distance_max=-1))
+        self.assertEqual(manifest['rows'], 0)
+        self.assertEqual(manifest['partitions'], [])
+
+    def test_stale_partitions_are_removed(self):
+        export_partitions(self.db, self.path, self.filters, by='month')
+        (self.path / 'notes.txt').write_text('Not a partition.')
+        manifest = export_partitions(self.db, self.path, self.filters)
+        self.assertEqual(sorted(path.name for path in self.path.iterdir()),
+                         ['2020.csv', MANIFEST, 'notes.txt'])
+        self.assertEqual(len(read_rows(self.path / '2020.csv')),
+                         manifest['rows'])
+
+    def test_within_positions(self):
+        positions = self.db.query_positions(self.filters)[::3]
+        manifest = export_partitions(self.db, self.path, within=positions)
+        self.assertEqual(manifest['rows'], len(positions))
+
+    def test_unlinked_approaches(self):
+        approaches = load_approaches(TEST_CAD_FILE)[:20]
+        db = NEODatabase(load_neos(TEST_NEO_FILE)[:0], approaches)
+        manifest = export_partitions(db, self.path, workers=2)
+        rows = read_rows(self.path / manifest['partitions'][0]['file'])
+        self.assertEqual([row[3] for row in rows],
+                         [approach._designation for approach in approaches])
+        self.assertTrue(all(row[4] == '' and row[6] == 'False'
+                            for row in rows))
+
+    def test_invalid_partition(self):
+        with self.assertRaises(ValueError):
+            export_partitions(self.db, self.path, by='week')
+
+
+if __name__ == '__main__':
+    unittest.main()
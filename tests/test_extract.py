@@ -10,13 +10,24 @@ To run these tests from the project root, run:
 
 These tests should pass when Task 2 is complete.
 """
+import bz2
 import collections.abc
 import datetime
+import gzip
+import json
+import lzma
 import math
+import os
 import pathlib
+import tempfile
 import unittest
 
-from extract import load_neos, load_approaches
+import numpy as np
+
+from extract import (load_neos, load_approaches, load_neo_columns,
+                     load_approach_columns, load_neos_and_columns,
+                     load_approaches_and_columns, stream_approaches,
+                     UnknownColumnError)
 from models import NearEarthObject, CloseApproach
 
 TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
@@ -77,6 +88,39 @@ class TestLoadNEOs(unittest.TestCase):
         self.assertEqual(neo.hazardous, True)
 
 
+class TestLoadNEOColumns(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.columns = load_neo_columns(TEST_NEO_FILE, ('H', 'albedo', 'moid'))
+        cls.rows = {pdes: row for row, pdes in enumerate(cls.columns['pdes'])}
+
+    def test_neo_columns_are_parallel_float_arrays(self):
+        self.assertEqual(len(self.columns['pdes']), 4226)
+        for name in ('H', 'albedo', 'moid'):
+            self.assertEqual(len(self.columns[name]), 4226)
+            self.assertEqual(self.columns[name].dtype.kind, 'f')
+
+    def test_toro_has_orbital_and_physical_attributes(self):
+        row = self.rows['1685']
+        self.assertEqual(self.columns['H'][row], 14.3)
+        self.assertEqual(self.columns['albedo'][row], 0.31)
+        self.assertEqual(self.columns['moid'][row], 0.0506645)
+
+    def test_missing_values_are_nan(self):
+        self.assertTrue(math.isnan(self.columns['albedo'][self.rows['2019 SC8']]))
+
+    def test_neos_and_columns_from_one_parse(self):
+        neos, columns = load_neos_and_columns(TEST_NEO_FILE, ('H', 'moid'))
+        self.assertEqual([repr(neo) for neo in neos],
+                         [repr(neo) for neo in load_neos(TEST_NEO_FILE)])
+        self.assertEqual(columns['pdes'], self.columns['pdes'])
+        np.testing.assert_array_equal(columns['H'], self.columns['H'])
+
+    def test_unknown_columns_are_rejected(self):
+        with self.assertRaisesRegex(UnknownColumnError, "'bogus'"):
+            load_neo_columns(TEST_NEO_FILE, ('H', 'bogus'))
+
+
 class TestLoadApproaches(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -117,5 +161,181 @@ class TestLoadApproaches(unittest.TestCase):
         self.assertIsInstance(approach.velocity, float)
 
 
+class TestLoadApproachColumns(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.columns = load_approach_columns(TEST_CAD_FILE)
+
+    def test_approach_columns_are_parallel_float_arrays(self):
+        for name in ('jd', 'dist_min', 'dist_max', 'v_inf', 't_sigma_f'):
+            self.assertEqual(len(self.columns[name]), 4700)
+            self.assertEqual(self.columns[name].dtype.kind, 'f')
+
+    def test_first_approach_columns(self):
+        # 2020 AY1, on 2020-Jan-01 00:54, with a time uncertainty of '< 00:01'.
+        self.assertEqual(self.columns['jd'][0], 2458849.537524496)
+        self.assertEqual(self.columns['dist_min'][0], 0.0211628345552616)
+        self.assertEqual(self.columns['dist_max'][0], 0.0211692704882042)
+        self.assertEqual(self.columns['v_inf'][0], 5.59959589405614)
+        self.assertEqual(self.columns['t_sigma_f'][0], 1.0)
+
+    def test_time_uncertainty_in_minutes(self):
+        # Durations are formatted as 'D_HH:MM', 'HH:MM' or '< HH:MM'.
+        self.assertTrue(all(self.columns['t_sigma_f'] >= 1.0))
+        self.assertGreater(self.columns['t_sigma_f'].max(), 24 * 60)
+
+    def test_approaches_and_columns_from_one_parse(self):
+        approaches, columns = load_approaches_and_columns(TEST_CAD_FILE,
+                                                          ('jd', 'v_inf'))
+        self.assertEqual([(i._designation, i.time) for i in approaches],
+                         [(i._designation, i.time)
+                          for i in load_approaches(TEST_CAD_FILE)])
+        np.testing.assert_array_equal(columns['jd'], self.columns['jd'])
+        np.testing.assert_array_equal(columns['v_inf'], self.columns['v_inf'])
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaisesRegex(UnknownColumnError, "'bogus'"):
+            load_approach_columns(TEST_CAD_FILE, ('jd', 'bogus'))
+
+
+class TestStreamApproaches(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    def test_stream_matches_load(self):
+        # A small chunk size splits records across many reads.
+        streamed = list(stream_approaches(TEST_CAD_FILE, chunk_size=97))
+        self.assertEqual(len(streamed), len(self.approaches))
+        for expected, received in zip(self.approaches, streamed):
+            self.assertEqual(received._designation, expected._designation)
+            self.assertEqual(received.time, expected.time)
+            self.assertEqual(received.distance, expected.distance)
+            self.assertEqual(received.velocity, expected.velocity)
+
+    def test_stream_references_neos_without_linking(self):
+        neos = {neo.designation: neo for neo in load_neos(TEST_NEO_FILE)}
+        for approach in stream_approaches(TEST_CAD_FILE, neos):
+            self.assertIs(approach.neo, neos[approach._designation])
+        self.assertTrue(all(not neo.approaches for neo in neos.values()))
+
+    def test_stream_keeps_approaches_of_unknown_neos(self):
+        neos = {neo.designation: neo for neo in load_neos(TEST_NEO_FILE)[::2]}
+        streamed = list(stream_approaches(TEST_CAD_FILE, neos))
+        self.assertEqual(len(streamed), len(self.approaches))
+        for approach in streamed:
+            self.assertIs(approach.neo, neos.get(approach._designation))
+
+    def test_stream_without_fields_is_rejected(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'cad.json'
+            path.write_text(json.dumps({'data': [['433', '2020-Jan-01 00:00',
+                                                  '0.1', '5.0']]}))
+            with self.assertRaisesRegex(ValueError, "'fields'"):
+                list(stream_approaches(path))
+
+
+class TestParallelLoad(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    def assertSameApproaches(self, received, expected):
+        self.assertEqual(len(received), len(expected))
+        for approach, other in zip(received, expected):
+            self.assertEqual(approach._designation, other._designation)
+            self.assertEqual(approach.time, other.time)
+            self.assertEqual(approach.distance, other.distance)
+            self.assertEqual(approach.velocity, other.velocity)
+
+    def test_parallel_neos_match_serial(self):
+        neos = load_neos(TEST_NEO_FILE, workers=2)
+        self.assertEqual([repr(neo) for neo in neos],
+                         [repr(neo) for neo in self.neos])
+
+    def test_parallel_columns_match_serial(self):
+        neos, neo_columns = load_neos_and_columns(TEST_NEO_FILE, workers=2)
+        self.assertEqual([repr(neo) for neo in neos],
+                         [repr(neo) for neo in self.neos])
+        for name, values in load_neo_columns(TEST_NEO_FILE).items():
+            np.testing.assert_array_equal(neo_columns[name], values)
+        approaches, approach_columns = load_approaches_and_columns(
+            TEST_CAD_FILE, workers=2)
+        self.assertSameApproaches(approaches, self.approaches)
+        for name, values in load_approach_columns(TEST_CAD_FILE).items():
+            np.testing.assert_array_equal(approach_columns[name], values)
+
+    def test_parallel_approaches_match_serial(self):
+        self.assertSameApproaches(load_approaches(TEST_CAD_FILE, workers=2),
+                                  self.approaches)
+
+    def test_parallel_approaches_with_fields_after_data(self):
+        with open(TEST_CAD_FILE) as json_file:
+            data = json.load(json_file)
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'cad.json'
+            path.write_text(json.dumps({'data': data['data'][:50],
+                                        'fields': data['fields']}))
+            self.assertSameApproaches(load_approaches(path, workers=2),
+                                      self.approaches[:50])
+            path.write_text(json.dumps({'data': [], 'fields': data['fields']}))
+            self.assertEqual(load_approaches(path, workers=2), [])
+
+
+class TestLoadWithoutTemporaryFiles(unittest.TestCase):
+    def test_serial_loads_write_no_files(self):
+        # Nothing is written to the working directory (such as ./data).
+        with tempfile.TemporaryDirectory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                self.assertEqual(len(load_neos(TEST_NEO_FILE)), 4226)
+                self.assertEqual(len(load_approaches(TEST_CAD_FILE)), 4700)
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(list(pathlib.Path(directory).iterdir()), [])
+
+
+class TestLoadCompressed(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.directory = tempfile.TemporaryDirectory()
+        # Compressed files are recognized by content, not by name.
+        cls.paths = {}
+        for module in (gzip, bz2, lzma):
+            for source in (TEST_NEO_FILE, TEST_CAD_FILE):
+                path = pathlib.Path(cls.directory.name) / f'{module.__name__}-{source.name}'
+                path.write_bytes(module.compress(source.read_bytes()))
+                cls.paths[module, source] = path
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_compressed_neos_match_plain(self):
+        for module in (gzip, bz2, lzma):
+            with self.subTest(compression=module.__name__):
+                neos = load_neos(self.paths[module, TEST_NEO_FILE], workers=2)
+                self.assertEqual([repr(neo) for neo in neos],
+                                 [repr(neo) for neo in self.neos])
+                columns = load_neo_columns(self.paths[module, TEST_NEO_FILE])
+                self.assertEqual(len(columns['pdes']), len(self.neos))
+
+    def test_compressed_approaches_match_plain(self):
+        for module in (gzip, bz2, lzma):
+            path = self.paths[module, TEST_CAD_FILE]
+            with self.subTest(compression=module.__name__):
+                for approaches in (load_approaches(path, workers=2),
+                                   list(stream_approaches(path))):
+                    self.assertEqual(
+                        [(i._designation, i.time, i.distance) for i in approaches],
+                        [(i._designation, i.time, i.distance) for i in self.approaches])
+                columns = load_approach_columns(path)
+                self.assertEqual(len(columns['jd']), len(self.approaches))
+
+
 if __name__ == '__main__':
     unittest.main()
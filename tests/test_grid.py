@@ -0,0 +1,90 @@
+"""Check that a `GridIndex` finds every row within a range of values.
+
+The grid index of an `NEODatabase` narrows queries that combine range
+filters on time, distance and velocity down to the rows of a few cells.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_grid
+"""
+import datetime
+import pathlib
+import unittest
+
+import numpy as np
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from grid import GridIndex
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestGridIndex(unittest.TestCase):
+    def setUp(self):
+        generator = np.random.default_rng(0)
+        self.x = generator.random(10000)
+        self.y = generator.exponential(size=10000)
+        self.y[::97] = np.nan
+        self.grid = GridIndex({'x': self.x, 'y': self.y}, cell_size=50)
+
+    def test_candidates_include_every_row_within_bounds(self):
+        for bounds in ({'x': (0.2, 0.3), 'y': (0.5, 1)},
+                       {'x': (None, 0.05)},
+                       {'y': (2, None)},
+                       {'x': (0.5, 0.5), 'y': (None, None)}):
+            within = np.ones(len(self.x), dtype=bool)
+            for name, (low, high) in bounds.items():
+                values = getattr(self, name)
+                if low is not None:
+                    within &= values >= low
+                if high is not None:
+                    within &= values <= high
+            candidates = self.grid.candidates(bounds)
+            with self.subTest(bounds=bounds):
+                self.assertTrue(np.all(np.diff(candidates) > 0))
+                self.assertTrue(set(np.flatnonzero(within)) <= set(candidates))
+                self.assertLess(len(candidates), len(self.x) / 2)
+
+    def test_unbounded_candidates_are_every_row(self):
+        self.assertEqual(self.grid.candidates({}).tolist(),
+                         list(range(len(self.x))))
+
+    def test_empty_and_limited_ranges(self):
+        self.assertEqual(len(self.grid.candidates({'x': (0.6, 0.4)})), 0)
+        self.assertIsNone(self.grid.candidates({'x': (0, 0.9)}, limit=100))
+
+
+class TestDatabaseGrid(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), cls.approaches)
+
+    def test_indexed_queries_match_every_approach(self):
+        for criteria in ({'distance_max': 0.05, 'velocity_min': 30},
+                         {'distance_max': 0.05, 'velocity_min': 20,
+                          'start_date': datetime.date(2020, 3, 1)},
+                         {'date': datetime.date(2020, 3, 2),
+                          'distance_max': 0.2},
+                         {'velocity_min': 30, 'velocity_max': 20}):
+            filters = create_filters(**criteria)
+            with self.subTest(criteria=criteria):
+                self.assertIsNotNone(self.db._indexed_rows(filters))
+                expected = [approach for approach in self.approaches
+                            if all(_filter(approach) for _filter in filters)]
+                self.assertEqual(list(self.db.query(filters)), expected)
+                self.assertEqual(self.db.count(filters), len(expected))
+
+    def test_broad_queries_are_not_indexed(self):
+        self.assertIsNone(self.db._indexed_rows(
+            create_filters(distance_max=1)))
+        self.assertIsNone(self.db._indexed_rows(
+            create_filters(start_date=datetime.date(2020, 3, 1))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,9 +16,9 @@ import datetime
 import pathlib
 import unittest
 
-from database import NEODatabase
-from extract import load_neos, load_approaches
-from filters import create_filters
+from database import NEODatabase, InvalidCursorError, _FilterPlan
+from extract import load_neos, load_approaches, load_neo_columns, load_approach_columns
+from filters import create_filters, UnsupportedCriterionError
 
 TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
 TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
@@ -33,7 +33,10 @@ class TestQuery(unittest.TestCase):
     def setUpClass(cls):
         cls.neos = load_neos(TEST_NEO_FILE)
         cls.approaches = load_approaches(TEST_CAD_FILE)
-        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.neo_columns = load_neo_columns(TEST_NEO_FILE)
+        cls.approach_columns = load_approach_columns(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches, cls.neo_columns,
+                             cls.approach_columns)
 
     def test_query_all(self):
         expected = set(self.approaches)
@@ -527,6 +530,236 @@ class TestQuery(unittest.TestCase):
         received = set(self.db.query(filters))
         self.assertEqual(expected, received, msg="Computed results do not match expected results.")
 
+    ###############
+    # NEO columns #
+    ###############
+
+    def neo_column(self, name):
+        return dict(zip(self.neo_columns['pdes'], self.neo_columns[name]))
+
+    def test_query_with_max_moid(self):
+        moid = self.neo_column('moid')
+        expected = set(
+            approach for approach in self.approaches
+            if moid[approach.neo.designation] <= 0.01
+        )
+        self.assertGreater(len(expected), 0)
+
+        filters = create_filters(moid_max=0.01)
+        received = set(self.db.query(filters))
+        self.assertEqual(expected, received, msg="Computed results do not match expected results.")
+        self.assertEqual(self.db.count(filters), len(expected))
+
+    def test_query_with_h_bounds_and_distance(self):
+        magnitude = self.neo_column('H')
+        expected = set(
+            approach for approach in self.approaches
+            if 18 <= magnitude[approach.neo.designation] <= 22
+            and approach.distance <= 0.1
+        )
+        self.assertGreater(len(expected), 0)
+
+        filters = create_filters(h_min=18, h_max=22, distance_max=0.1)
+        received = set(self.db.query(filters))
+        self.assertEqual(expected, received, msg="Computed results do not match expected results.")
+
+    def test_query_with_unloaded_column(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        with self.assertRaises(UnsupportedCriterionError):
+            list(db.query(create_filters(moid_max=0.01)))
+
+    def test_query_with_max_dist_min_and_max_v_inf(self):
+        dist_min = self.approach_columns['dist_min']
+        v_inf = self.approach_columns['v_inf']
+        expected = set(
+            approach for i, approach in enumerate(self.approaches)
+            if dist_min[i] <= 0.01 and v_inf[i] <= 10
+        )
+        self.assertGreater(len(expected), 0)
+
+        filters = create_filters(dist_min_max=0.01, v_inf_max=10)
+        received = set(self.db.query(filters))
+        self.assertEqual(expected, received, msg="Computed results do not match expected results.")
+
+    ############
+    # Counting #
+    ############
+
+    def brute_force(self, filters):
+        """Return the approaches that pass every filter, one at a time.
+
+        Filters on attributes of the approaches and NEOs are called on
+        each approach. Filters on additional columns, which can't be
+        called, compare the approach's own entry (or its NEO's, found by
+        designation) instead.
+        """
+        neo_rows = {pdes: row
+                    for row, pdes in enumerate(self.neo_columns['pdes'])}
+        matches = []
+        for row, approach in enumerate(self.db._approaches):
+            neo_row = neo_rows[approach.neo.designation]
+            values = {name: column[row]
+                      for name, column in self.approach_columns.items()}
+            values.update((name, column[neo_row])
+                          for name, column in self.neo_columns.items())
+            passed = True
+            for _filter in filters:
+                try:
+                    passed = _filter(approach)
+                except UnsupportedCriterionError:
+                    passed = _filter.op(_filter.column(values), _filter.value)
+                if not passed:
+                    break
+            if passed:
+                matches.append(approach)
+        return matches
+
+    def test_count_matches_brute_force(self):
+        for criteria, indexed in (
+            ({}, False),
+            ({'date': datetime.date(2020, 3, 2)}, False),
+            ({'start_date': datetime.date(2020, 4, 1),
+              'end_date': datetime.date(2020, 6, 30)}, False),
+            ({'start_date': datetime.date(2020, 6, 30),
+              'end_date': datetime.date(2020, 4, 1)}, False),
+            ({'distance_max': 0.05, 'velocity_min': 10}, True),
+            ({'start_date': datetime.date(2020, 2, 1), 'diameter_min': 0.5,
+              'hazardous': True}, True),
+            ({'diameter_max': 1.5, 'hazardous': False}, True),
+            # Through the grid index:
+            ({'distance_max': 0.05, 'velocity_min': 30}, True),
+            ({'date': datetime.date(2020, 3, 2), 'distance_max': 0.2}, True),
+            # Through the join of NEO columns, and approach columns:
+            ({'moid_max': 0.01}, False),
+            ({'h_min': 25, 'start_date': datetime.date(2020, 9, 1)}, False),
+            ({'moid_max': 0.05, 'hazardous': True, 'dist_min_max': 0.1},
+             True),
+            ({'distance_max': 0.05, 'velocity_min': 20, 'h_max': 22,
+              'v_inf_max': 25}, True),
+        ):
+            filters = create_filters(**criteria)
+            expected = self.brute_force(filters)
+            with self.subTest(criteria=criteria):
+                self.assertEqual(self.db._indexed_rows(filters) is not None,
+                                 indexed)
+                self.assertEqual(self.db.count(filters), len(expected))
+                self.assertEqual(list(self.db.query(filters)), expected)
+
+    #####################
+    # Adaptive ordering #
+    #####################
+
+    def test_adaptive_order_keeps_results(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE),
+                         self.neo_columns, self.approach_columns)
+        db.chunk_size = db.sample_size = 500
+        for criteria in (
+            {'start_date': datetime.date(2020, 2, 1), 'diameter_min': 0.5,
+             'hazardous': True},
+            {'velocity_max': 40, 'hazardous': False, 'dist_min_max': 0.001},
+            {'distance_max': 0.4, 'velocity_min': 1, 'moid_max': 0.5},
+            {'distance_max': 0.1, 'distance_min': 0.2},
+        ):
+            filters = create_filters(**criteria)
+            self.assertEqual(list(db.query(filters)),
+                             list(db.approaches_at(db.query_positions(filters))),
+                             msg=criteria)
+            self.assertEqual(len(list(db.query(filters))), db.count(filters),
+                             msg=criteria)
+
+    def test_adaptive_order_puts_selective_filters_first(self):
+        filters = create_filters(velocity_max=40, hazardous=False,
+                                 dist_min_max=0.0005)
+        plan = _FilterPlan(self.db, filters)
+        plan.rows(0, self.db.sample_size)
+        self.assertIs(plan.filters[0], filters[-1])
+        self.assertIs(plan.filters[-1], filters[0])
+
+    ##############
+    # Refinement #
+    ##############
+
+    def test_query_positions_refine_previous_results(self):
+        broad = create_filters(start_date=datetime.date(2020, 1, 1),
+                               end_date=datetime.date(2020, 6, 30))
+        narrow = create_filters(hazardous=True, distance_max=0.1)
+        positions = self.db.query_positions(broad)
+        self.assertEqual(list(self.db.approaches_at(positions)),
+                         list(self.db.query(broad)))
+        refined = self.db.query_positions(narrow, within=positions)
+        self.assertGreater(len(refined), 0)
+        self.assertTrue(set(refined) <= set(positions))
+        self.assertEqual(list(self.db.approaches_at(refined)),
+                         list(self.db.query(broad + narrow)))
+
+    ############
+    # Batching #
+    ############
+
+    def test_query_batch_matches_separate_queries(self):
+        filter_sets = [
+            create_filters(),
+            create_filters(date=datetime.date(2020, 3, 2)),
+            create_filters(distance_max=0.05, velocity_min=10),
+            create_filters(start_date=datetime.date(2020, 2, 1),
+                           diameter_min=0.5, hazardous=True),
+        ]
+        received = [[] for _ in filter_sets]
+        for index, approach in self.db.query_batch(filter_sets, chunk_size=1000):
+            received[index].append(approach)
+        for filters, results in zip(filter_sets, received):
+            self.assertEqual(results, list(self.db.query(filters)))
+
+    ##############
+    # Pagination #
+    ##############
+
+    def fetch_all_pages(self, filters, page_size):
+        pages = []
+        page, cursor = self.db.query_page(filters, page_size)
+        pages.append(page)
+        while cursor is not None:
+            page, cursor = self.db.query_page(filters, page_size, cursor)
+            pages.append(page)
+        return pages
+
+    def test_query_pages_cover_all_results_in_time_order(self):
+        pages = self.fetch_all_pages(create_filters(), 1000)
+        self.assertTrue(all(len(page) <= 1000 for page in pages))
+        received = [approach for page in pages for approach in page]
+        self.assertEqual(set(received), set(self.approaches))
+        self.assertEqual(len(received), len(self.approaches))
+        times = [approach.time for approach in received]
+        self.assertEqual(times, sorted(times))
+
+    def test_query_pages_with_filters(self):
+        filters = create_filters(start_date=datetime.date(2020, 3, 1),
+                                 end_date=datetime.date(2020, 4, 30),
+                                 distance_max=0.1, hazardous=False)
+        expected = set(self.db.query(filters))
+        self.assertGreater(len(expected), 0)
+        pages = self.fetch_all_pages(filters, 7)
+        received = [approach for page in pages for approach in page]
+        self.assertEqual(len(received), len(expected))
+        self.assertEqual(set(received), expected)
+
+    def test_query_page_rejects_invalid_cursors(self):
+        _, cursor = self.db.query_page(page_size=10)
+        other = NEODatabase(self.neos[:100], [])
+        with self.assertRaises(InvalidCursorError):
+            other.query_page(page_size=10, cursor=cursor)
+        with self.assertRaises(InvalidCursorError):
+            self.db.query_page(page_size=10, cursor='not-a-cursor')
+
+    def test_query_page_rejects_cursors_of_other_filters(self):
+        filters = create_filters(distance_max=0.1, hazardous=False)
+        _, cursor = self.db.query_page(filters, page_size=10)
+        with self.assertRaises(InvalidCursorError):
+            self.db.query_page(create_filters(distance_max=0.2), 10, cursor)
+        # The same filters, in another order, resume the query:
+        page, _ = self.db.query_page(filters[::-1], 10, cursor)
+        self.assertEqual(page, self.db.query_page(filters, 10, cursor)[0])
+
 
 if __name__ == '__main__':
     unittest.main()
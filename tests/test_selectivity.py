@@ -0,0 +1,92 @@
+"""Check that filter selectivities are recorded, saved and used to order filters.
+
+A `FilterStats` attached to an `NEODatabase` counts how often each kind
+of filter passes, and queries then evaluate the most selective filters
+first, without changing their results.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_selectivity
+"""
+import datetime
+import operator
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import (create_filters, DateFilter, DistanceFilter,
+                     HazardousFilter, VelocityFilter)
+from selectivity import FilterStats
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestFilterStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE))
+
+    def tearDown(self):
+        self.db.filter_stats = None
+
+    def test_query_records_passes(self):
+        distance = DistanceFilter(operator.le, 0.05)
+        total, passed = len(self.db), self.db.count((distance,))
+        self.db.filter_stats = FilterStats(recording=True)
+        list(self.db.query(create_filters(distance_max=0.05, hazardous=True)))
+        self.assertEqual(self.db.filter_stats.counts['DistanceFilter.le'],
+                         {'5e-02': [total, passed]})
+        self.assertAlmostEqual(self.db.filter_stats.selectivity(distance),
+                               passed / total)
+        # A value in another bucket falls back to every value's counts:
+        self.assertAlmostEqual(
+            self.db.filter_stats.selectivity(DistanceFilter(operator.le, 1)),
+            passed / total)
+        self.assertIsNone(self.db.filter_stats.selectivity(
+            VelocityFilter(operator.ge, 10)))
+
+    def test_order_most_selective_first(self):
+        stats = FilterStats({'DistanceFilter.le': {'5e-02': [100, 10]},
+                             'HazardousFilter.eq': {'True': [100, 50]}})
+        date = DateFilter(operator.ge, datetime.date(2020, 1, 1))
+        hazardous = HazardousFilter(operator.eq, True)
+        distance = DistanceFilter(operator.le, 0.05)
+        self.assertEqual(stats.order((date, hazardous, distance)),
+                         [distance, hazardous, date])
+
+    def test_ordered_results_are_unchanged(self):
+        criteria = ({'start_date': datetime.date(2020, 6, 1),
+                     'hazardous': True, 'distance_max': 0.2},
+                    {'velocity_min': 30, 'distance_max': 0.01},
+                    {'distance_max': 0.1, 'distance_min': 0.2})
+        expected = [list(self.db.query(create_filters(**kwargs)))
+                    for kwargs in criteria]
+        self.db.filter_stats = FilterStats(recording=True)
+        # The second pass is ordered by the first pass's statistics:
+        for _ in range(2):
+            for kwargs, matches in zip(criteria, expected):
+                filters = create_filters(**kwargs)
+                with self.subTest(criteria=kwargs):
+                    self.assertEqual(list(self.db.query(filters)), matches)
+                    self.assertEqual(self.db.count(filters), len(matches))
+
+    def test_save_and_load(self):
+        stats = FilterStats(recording=True)
+        stats.record(HazardousFilter(operator.eq, True), 10, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'stats.json'
+            stats.save(path)
+            loaded = FilterStats.load(path)
+            self.assertEqual(loaded.counts, stats.counts)
+            self.assertFalse(loaded.recording)
+            self.assertEqual(FilterStats.load(path.with_name('no.json')).counts,
+                             {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Check that the query service streams the same results as the database.
+
+A `QueryService` answers `POST /query` requests with chunked NDJSON
+responses, scanning the database a chunk of rows at a time.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_service
+"""
+import asyncio
+import datetime
+import json
+import pathlib
+import unittest
+from unittest import mock
+
+from database import NEODatabase
+from extract import load_neos, load_approaches, load_approach_columns
+from filters import create_filters
+from service import QueryService
+from snapshot import SnapshotDatabase
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def load():
+    return NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE),
+                       approach_columns=load_approach_columns(
+                           TEST_CAD_FILE, ('dist_min',)))
+
+
+def records(approaches, extras=None):
+    """Return the NDJSON records of close approaches."""
+    results = []
+    for approach in approaches:
+        record = approach.serialize('json')
+        if extras:
+            record.update(extras(approach))
+        results.append(json.loads(json.dumps(record)))
+    return results
+
+
+class TestQueryService(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = SnapshotDatabase(load)
+
+    async def asyncSetUp(self):
+        self.service = QueryService(self.db, chunk_size=256)
+        self.port = await self.service.start()
+
+    async def asyncTearDown(self):
+        await self.service.close()
+
+    async def request(self, query, read=True):
+        """Send a query, and return the status, headers and chunks."""
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        body = json.dumps(query).encode()
+        writer.write(b'POST /query HTTP/1.1\r\nHost: localhost\r\n'
+                     b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        status = int(head.split(b' ')[1])
+        if not read:
+            return status, reader, writer
+        chunks = []
+        if b'Transfer-Encoding: chunked' in head:
+            while size := int(await reader.readline(), 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+        else:
+            chunks.append(await reader.read())
+        writer.close()
+        return status, head, chunks
+
+    async def test_stream_matches_query(self):
+        status, head, chunks = await self.request(
+            {'filters': {'start_date': '2020-03-01', 'distance_max': 0.1}})
+        self.assertEqual(status, 200)
+        self.assertIn(b'application/x-ndjson', head)
+        self.assertGreater(len(chunks), 1)
+        lines = b''.join(chunks).decode().splitlines()
+        filters = create_filters(start_date=datetime.date(2020, 3, 1),
+                                 distance_max=0.1)
+        self.assertEqual([json.loads(line) for line in lines],
+                         records(self.db.query(filters)))
+
+    async def test_limit_and_columns(self):
+        status, _, chunks = await self.request(
+            {'filters': {'hazardous': True}, 'limit': 5,
+             'columns': ['dist_min']})
+        self.assertEqual(status, 200)
+        lines = b''.join(chunks).decode().splitlines()
+        expected = list(self.db.query(create_filters(hazardous=True)))[:5]
+        self.assertEqual([json.loads(line) for line in lines],
+                         records(expected,
+                                 self.db.approach_fields(['dist_min'])))
+
+    async def test_concurrent_clients(self):
+        queries = [{'filters': {'distance_max': distance}}
+                   for distance in (0.01, 0.05, 0.1, 0.2, 0.5)] * 4
+        responses = await asyncio.gather(*map(self.request, queries))
+        for query, (status, _, chunks) in zip(queries, responses):
+            expected = self.db.count(create_filters(**query['filters']))
+            self.assertEqual(status, 200)
+            self.assertEqual(b''.join(chunks).count(b'\n'), expected)
+
+    async def test_disconnect_stops_scan(self):
+        self.service.chunk_size = 1
+        status, reader, writer = await self.request({}, read=False)
+        self.assertEqual(status, 200)
+        writer.transport.abort()
+        for _ in range(100):
+            if not self.service.active:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.service.active, 0)
+        self.assertLess(self.service.scanned, len(self.db.snapshot()))
+
+    async def test_bad_requests(self):
+        for query in ({'filters': {'not_a_criterion': 1}},
+                      {'filters': {'start_date': 'yesterday'}},
+                      {'limit': -1},
+                      {'limit': True},
+                      {'columns': ['not_a_column']},
+                      {'filters': {'moid_max': 0.1}},
+                      ['not', 'an', 'object']):
+            with self.subTest(query=query):
+                status, _, chunks = await self.request(query)
+                self.assertEqual(status, 400)
+                self.assertIn('error', json.loads(b''.join(chunks)))
+
+    async def test_failed_scan_ends_response(self):
+        with mock.patch('service._scan', side_effect=RuntimeError('boom')):
+            status, head, chunks = await self.request({})
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(b''.join(chunks)),
+                         {'error': 'The scan failed: boom'})
+        self.assertEqual(self.service.active, 0)
+
+    async def test_unknown_resource(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(b'GET /neos HTTP/1.1\r\n\r\n')
+        self.assertTrue((await reader.read()).startswith(b'HTTP/1.1 404'))
+        writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Check that similar close approaches are the nearest ones.
+
+A `KDTree` finds the nearest points to a point, and `NEODatabase.similar`
+uses k-d trees to find the close approaches nearest to a given one by
+distance, velocity and diameter.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_similar
+"""
+import pathlib
+import unittest
+
+import numpy as np
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from kdtree import KDTree
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestKDTree(unittest.TestCase):
+    def setUp(self):
+        generator = np.random.default_rng(0)
+        self.points = generator.normal(size=(5000, 3))
+        self.tree = KDTree(self.points, leaf_size=16)
+
+    def test_nearest_match_every_distance(self):
+        for point in self.points[::500]:
+            distances = np.sqrt(((self.points - point) ** 2).sum(axis=1))
+            positions, found = self.tree.nearest(point, k=7)
+            with self.subTest(point=point):
+                np.testing.assert_allclose(found, np.sort(distances)[:7])
+                np.testing.assert_allclose(distances[positions], found)
+
+    def test_excluded_and_few_points(self):
+        positions, distances = self.tree.nearest(self.points[3], k=1,
+                                                 exclude=(3,))
+        self.assertNotEqual(positions[0], 3)
+        self.assertGreater(distances[0], 0)
+        self.assertEqual(len(KDTree(self.points[:2]).nearest(
+            self.points[0], k=5)[0]), 2)
+        self.assertEqual(len(self.tree.nearest(self.points[0], k=0)[0]), 0)
+
+
+class TestDatabaseSimilar(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), cls.approaches)
+
+    def brute_force(self, approach, k):
+        """Return the distances of the `k` approaches nearest to one."""
+        def features(i):
+            diameter = i.neo.diameter if i.neo else np.nan
+            return [i.distance, i.velocity, np.log10(diameter)]
+
+        known = np.isfinite(features(approach)[2])
+        others = [i for i in self.approaches
+                  if i is not approach
+                  and (not known or np.isfinite(features(i)[2]))]
+        points = np.array([features(i) for i in others + [approach]])
+        if not known:
+            points = points[:, :2]
+        points /= points.std(axis=0)
+        distances = np.sqrt(((points[:-1] - points[-1]) ** 2).sum(axis=1))
+        return np.sort(distances)[:k], points[-1], dict(zip(
+            map(id, others), points[:-1]))
+
+    def test_similar_are_nearest(self):
+        known = [i for i in self.approaches
+                 if i.neo and np.isfinite(i.neo.diameter)]
+        unknown = [i for i in self.approaches
+                   if not i.neo or np.isnan(i.neo.diameter)]
+        for approach in known[::200] + unknown[::2000]:
+            expected, point, points = self.brute_force(approach, 5)
+            similar = self.db.similar(approach, 5)
+            with self.subTest(approach=approach):
+                self.assertEqual(len(similar), 5)
+                self.assertNotIn(approach, similar)
+                found = [np.sqrt(((points[id(i)] - point) ** 2).sum())
+                         for i in similar]
+                np.testing.assert_allclose(found, expected)
+
+    def test_other_approaches_are_rejected(self):
+        approach = load_approaches(TEST_CAD_FILE)[0]
+        with self.assertRaises(ValueError):
+            self.db.similar(approach)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Check that a `SnapshotDatabase` can be queried while it's being reloaded.
+
+Readers should always see one complete version of the database, however
+many reloads and appends happen while they query it.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_snapshot
+"""
+import datetime
+import pathlib
+import threading
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches, load_approach_columns
+from filters import create_filters
+from models import CloseApproach
+from selectivity import FilterStats
+from snapshot import SnapshotDatabase
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def load():
+    return NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE),
+                       approach_columns=load_approach_columns(
+                           TEST_CAD_FILE, ('dist_min',)))
+
+
+def load_first_half():
+    approaches = load_approaches(TEST_CAD_FILE)
+    return NEODatabase(load_neos(TEST_NEO_FILE),
+                       approaches[:len(approaches) // 2])
+
+
+class TestSnapshotDatabase(unittest.TestCase):
+    def setUp(self):
+        self.db = SnapshotDatabase(load)
+
+    def test_reads_go_to_current_version(self):
+        self.assertEqual(self.db.count(), len(load_approaches(TEST_CAD_FILE)))
+        self.assertEqual(self.db.get_neo_by_name('Lemmon').designation,
+                         '2013 TL117')
+        snapshot = self.db.snapshot()
+        self.assertEqual(self.db.reload(load_first_half), 2)
+        self.assertLess(self.db.count(), snapshot.count())
+        self.assertIsNot(self.db.snapshot(), snapshot)
+
+    def test_append_leaves_snapshot_untouched(self):
+        snapshot = self.db.snapshot()
+        neo = snapshot.get_neo_by_designation('68347')
+        approaches = list(neo.approaches)
+        new = CloseApproach('68347', datetime.datetime(2020, 12, 31, 12, 0),
+                            0.01, 5.0)
+        self.db.append([new], {'dist_min': [0.005]})
+
+        self.assertEqual(neo.approaches, approaches)
+        self.assertEqual(snapshot.count(), self.db.count() - 1)
+        current = self.db.get_neo_by_designation('68347')
+        self.assertIs(current.approaches[-1], new)
+        self.assertEqual(self.db.approach_fields(['dist_min'])(new),
+                         {'dist_min': 0.005})
+        filters = create_filters(dist_min_max=0.01)
+        self.assertEqual(self.db.count(filters), snapshot.count(filters) + 1)
+
+    def test_new_versions_keep_filter_stats(self):
+        stats = FilterStats(recording=True)
+        self.db.snapshot().filter_stats = stats
+        self.db.append([CloseApproach('68347',
+                                      datetime.datetime(2020, 12, 31), 0.01,
+                                      5.0)])
+        self.assertIs(self.db.filter_stats, stats)
+        self.db.reload(load_first_half)
+        self.assertIs(self.db.filter_stats, stats)
+        self.db.count(create_filters(distance_max=0.1))
+        self.assertIn('DistanceFilter.le', stats.counts)
+
+    def test_concurrent_queries_during_reloads(self):
+        # Each reload publishes a new copy of one of two data sets:
+        versions = (load(), load_first_half())
+        filters = create_filters(distance_max=0.1)
+        counts = {version.count(filters) for version in versions}
+        errors = []
+        stop = threading.Event()
+
+        def read():
+            try:
+                while not stop.is_set():
+                    snapshot = self.db.snapshot()
+                    results = list(snapshot.query(filters))
+                    self.assertIn(len(results), counts)
+                    self.assertEqual(len(results), snapshot.count(filters))
+                    for approach in results:
+                        self.assertIs(approach.neo,
+                                      snapshot.get_neo_by_designation(
+                                          approach._designation))
+            except Exception as error:
+                errors.append(error)
+
+        readers = [threading.Thread(target=read) for _ in range(8)]
+        for reader in readers:
+            reader.start()
+        try:
+            for reload in range(10):
+                self.db.reload(lambda: versions[reload % 2].extended([]))
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.db.version, 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
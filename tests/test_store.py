@@ -0,0 +1,125 @@
+"""Check that a database reopened from a column store matches the original.
+
+`NEODatabase.save` writes the columns of a database to a directory of
+memory-mapped column files, and `NEODatabase.open` queries directly over
+them, making close approaches only as they're reached.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_store
+"""
+import datetime
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from extract import (load_neos, load_approaches, load_neo_columns,
+                     load_approach_columns, NEO_COLUMNS, APPROACH_COLUMNS)
+from filters import create_filters
+from store import ColumnStore, StoreFormatError, StringHeap, write_store
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def records(approaches):
+    """Return comparable records of close approaches."""
+    return [repr(approach.serialize('json')) for approach in approaches]
+
+
+class TestStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE),
+                             load_neo_columns(TEST_NEO_FILE, NEO_COLUMNS),
+                             load_approach_columns(TEST_CAD_FILE,
+                                                   APPROACH_COLUMNS))
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = pathlib.Path(cls.directory.name) / 'store'
+        cls.db.save(cls.path)
+        cls.stored = NEODatabase.open(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_query_matches_original(self):
+        for criteria in ({},
+                         {'hazardous': True},
+                         {'start_date': datetime.date(2020, 3, 1),
+                          'end_date': datetime.date(2020, 3, 31),
+                          'distance_max': 0.1},
+                         {'moid_max': 0.01, 'dist_min_max': 0.05}):
+            filters = create_filters(**criteria)
+            with self.subTest(criteria=criteria):
+                self.assertEqual(records(self.stored.query(filters)),
+                                 records(self.db.query(filters)))
+                self.assertEqual(self.stored.count(filters),
+                                 self.db.count(filters))
+
+    def test_query_page_cursors_carry_over(self):
+        filters = create_filters(hazardous=True)
+        page, cursor = self.db.query_page(filters, page_size=10)
+        self.assertEqual(records(self.stored.query_page(filters, 10, cursor)[0]),
+                         records(self.db.query_page(filters, 10, cursor)[0]))
+
+    def test_neos_match_original(self):
+        self.assertEqual(len(self.stored.neo_by_designation),
+                         len(self.db.neo_by_designation))
+        neo = self.stored.get_neo_by_designation('68347')
+        original = self.db.get_neo_by_designation('68347')
+        self.assertEqual(str(neo), str(original))
+        self.assertEqual(records(neo.approaches), records(original.approaches))
+        window = (datetime.date(2020, 1, 1), datetime.date(2020, 6, 30))
+        self.assertEqual(records(neo.approaches_between(*window)),
+                         records(original.approaches_between(*window)))
+        self.assertEqual(self.stored.summarize(neo)['min_distance'],
+                         self.db.summarize(original)['min_distance'])
+        self.assertEqual(self.stored.get_neo_by_name('Lemmon').designation,
+                         '2013 TL117')
+
+    def test_approaches_are_made_once(self):
+        neo = self.stored.get_neo_by_designation('68347')
+        approach = neo.approaches[0]
+        self.assertIs(approach.neo, neo)
+        self.assertIn(approach, list(self.stored.query()))
+
+    def test_export_columns_match_original(self):
+        fields = self.stored.approach_fields(['dist_min', 'moid'])
+        original = self.db.approach_fields(['dist_min', 'moid'])
+        filters = create_filters(hazardous=True)
+        self.assertEqual([fields(i) for i in self.stored.query(filters)],
+                         [original(i) for i in self.db.query(filters)])
+
+    def test_open_missing_store(self):
+        with self.assertRaises(StoreFormatError):
+            NEODatabase.open(TESTS_ROOT)
+
+
+class TestColumnStore(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_store(directory,
+                        {'values': [1.5, 2.5], 'empty': []},
+                        {'names': ['Halley', '', 'Ōumuamua'], 'none': []},
+                        metadata={'answer': 42})
+            store = ColumnStore(directory)
+            self.assertEqual(store.columns['values'].tolist(), [1.5, 2.5])
+            self.assertEqual(len(store.columns['empty']), 0)
+            self.assertEqual(list(store.strings['names']),
+                             ['Halley', '', 'Ōumuamua'])
+            self.assertEqual(store.strings['names'][-1], 'Ōumuamua')
+            self.assertEqual(len(store.strings['none']), 0)
+            self.assertEqual(store.metadata, {'answer': 42})
+
+    def test_string_heap_index_out_of_range(self):
+        heap = StringHeap(*StringHeap.pack(['a']))
+        with self.assertRaises(IndexError):
+            heap[1]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Check that the per-NEO summary table matches the NEOs' close approaches.
+
+The `NEODatabase` constructor precomputes an `NEOSummary` of each NEO's close
+approaches, which `summarize` and `select_neos` answer from without visiting
+the approaches themselves.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_summary
+"""
+import datetime
+import pathlib
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from summary import NEOSummary, _as_value
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestSummary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.now = datetime.datetime(2020, 7, 1)
+        cls.summary = NEOSummary(cls.neos, cls.approaches, now=cls.now)
+
+    def test_summary_matches_approaches(self):
+        for neo in self.neos:
+            summary = self.summary.describe(neo)
+            self.assertEqual(summary['count'], len(neo.approaches))
+            if not neo.approaches:
+                self.assertIsNone(summary['min_distance'])
+                self.assertIsNone(summary['first_time'])
+                continue
+            closest = min(neo.approaches, key=lambda approach: approach.distance)
+            self.assertEqual(summary['min_distance'], closest.distance)
+            self.assertEqual(summary['min_distance_time'], closest.time)
+            self.assertEqual(summary['max_velocity'],
+                             max(approach.velocity for approach in neo.approaches))
+            self.assertEqual(summary['first_time'], neo.approaches[0].time)
+            self.assertEqual(summary['last_time'], neo.approaches[-1].time)
+            upcoming = neo.next_approach(self.now)
+            self.assertEqual(summary['next_time'], upcoming and upcoming.time)
+
+    def test_next_times_are_found_when_asked_for(self):
+        summary = NEOSummary(self.neos, self.approaches)
+        for neo in self.neos[::50]:
+            upcoming = neo.next_approach(datetime.datetime.now())
+            self.assertEqual(summary.describe(neo)['next_time'],
+                             upcoming and upcoming.time)
+        self.assertEqual([self.summary.describe(neo)['next_time']
+                          for neo in self.neos[:200]],
+                         [_as_value(time) for time
+                          in self.summary.next_time[:200]])
+
+    def test_select_neos_by_closest_approach(self):
+        expected = {neo for neo in self.neos
+                    if any(approach.distance <= 0.01 for approach in neo.approaches)}
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(set(self.db.select_neos(distance_max=0.01)), expected)
+
+    def test_select_neos_by_count_and_velocity(self):
+        expected = {neo for neo in self.neos
+                    if len(neo.approaches) >= 2
+                    and max(approach.velocity for approach in neo.approaches) >= 20}
+        self.assertGreater(len(expected), 0)
+        received = set(self.db.select_neos(count_min=2, velocity_min=20))
+        self.assertEqual(received, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
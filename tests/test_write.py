@@ -18,14 +18,21 @@ import collections.abc
 import contextlib
 import csv
 import datetime
+import gzip
 import io
 import json
+import lzma
+import math
 import pathlib
+import tempfile
 import unittest.mock
 
+import numpy as np
+
 from database import NEODatabase
-from extract import load_neos, load_approaches
-from write import write_to_csv, write_to_json
+from extract import load_neos, load_approaches, load_approach_columns
+from write import (PipelinedWriter, open_writer, tee, write_to_csv,
+                   write_to_json)
 
 TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
 TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
@@ -223,5 +230,209 @@ class TestWriteToJSON(unittest.TestCase):
         self.assertIsInstance(approach['neo']['potentially_hazardous'], bool)
 
 
+class TestWriteExtraColumns(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.columns = load_approach_columns(TEST_CAD_FILE)
+        approaches = load_approaches(TEST_CAD_FILE)
+        db = NEODatabase(load_neos(TEST_NEO_FILE), approaches, approach_columns=cls.columns)
+        cls.results = approaches[:5]
+        cls.extras = db.approach_fields(('dist_min', 'v_inf'))
+
+    @unittest.mock.patch('write.open')
+    def test_csv_rows_have_extra_columns(self, mock_file):
+        with UncloseableStringIO() as buf:
+            mock_file.return_value = buf
+            write_to_csv(self.results, None, self.extras)
+            buf.seek(0)
+            rows = tuple(csv.DictReader(buf))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(list(rows[0])[-2:], ['dist_min', 'v_inf'])
+        for i, row in enumerate(rows):
+            self.assertEqual(float(row['dist_min']), self.columns['dist_min'][i])
+            self.assertEqual(float(row['v_inf']), self.columns['v_inf'][i])
+
+    @unittest.mock.patch('write.open')
+    def test_json_elements_have_extra_columns(self, mock_file):
+        with UncloseableStringIO() as buf:
+            mock_file.return_value = buf
+            write_to_json(self.results, None, self.extras)
+            buf.seek(0)
+            data = json.load(buf)
+        self.assertEqual(len(data), 5)
+        for i, approach in enumerate(data):
+            self.assertEqual(approach['dist_min'], self.columns['dist_min'][i])
+            self.assertEqual(approach['v_inf'], self.columns['v_inf'][i])
+
+
+class TestWriteCompressed(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(50)
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = pathlib.Path(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_csv_gz_matches_uncompressed(self):
+        write_to_csv(self.results, self.path / 'results.csv')
+        write_to_csv(self.results, self.path / 'results.csv.gz')
+        with gzip.open(self.path / 'results.csv.gz', 'rb') as infile:
+            self.assertEqual(infile.read(),
+                             (self.path / 'results.csv').read_bytes())
+
+    def test_json_xz_matches_uncompressed(self):
+        write_to_json(self.results, self.path / 'results.json')
+        write_to_json(self.results, self.path / 'results.json.xz')
+        with lzma.open(self.path / 'results.json.xz', 'rb') as infile:
+            self.assertEqual(infile.read(),
+                             (self.path / 'results.json').read_bytes())
+
+    def test_open_writer_by_format_extension(self):
+        with open_writer(self.path / 'results.json.bz2') as writer:
+            for result in self.results:
+                writer.write(result)
+        with self.assertRaises(ValueError):
+            open_writer(self.path / 'results.txt.gz')
+
+
+class TestWriteJSONLinesAndNPZ(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(20)
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = pathlib.Path(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_jsonl_lines_match_json_elements(self):
+        write_to_json(self.results, self.path / 'results.json')
+        with open_writer(self.path / 'results.jsonl') as writer:
+            for result in self.results:
+                writer.write(result)
+        with open(self.path / 'results.json') as infile:
+            expected = json.load(infile)
+        with open(self.path / 'results.jsonl') as infile:
+            lines = infile.read().splitlines()
+        self.assertEqual(len(lines), len(self.results))
+        self.assertEqual(repr([json.loads(line) for line in lines]), repr(expected))
+
+    def test_npz_columns_match_results(self):
+        with open_writer(self.path / 'results.npz') as writer:
+            for result in self.results:
+                writer.write(result)
+        with np.load(self.path / 'results.npz') as archive:
+            columns = dict(archive)
+        self.assertEqual(columns['datetime_utc'].dtype, np.dtype('datetime64[m]'))
+        self.assertEqual(columns['datetime_utc'].tolist(), [i.time for i in self.results])
+        self.assertEqual(columns['distance_au'].tolist(), [i.distance for i in self.results])
+        self.assertEqual(columns['designation'].tolist(),
+                         [i.neo.designation for i in self.results])
+        self.assertEqual(columns['name'].tolist(), [i.neo.name or '' for i in self.results])
+        self.assertEqual(columns['potentially_hazardous'].tolist(),
+                         [i.neo.hazardous for i in self.results])
+        for diameter, result in zip(columns['diameter_km'], self.results):
+            if math.isnan(result.neo.diameter):
+                self.assertTrue(math.isnan(diameter))
+            else:
+                self.assertEqual(diameter, result.neo.diameter)
+
+    def test_empty_npz_has_every_column(self):
+        with open_writer(self.path / 'empty.npz'):
+            pass
+        with np.load(self.path / 'empty.npz') as archive:
+            self.assertIn('velocity_km_s', archive.files)
+            self.assertEqual(len(archive['velocity_km_s']), 0)
+
+
+class TestPipelinedWriter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(100)
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = pathlib.Path(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_pipelined_output_is_identical(self):
+        for name in ('results.csv', 'results.json', 'results.jsonl', 'results.json.gz'):
+            with self.subTest(name=name):
+                with open_writer(self.path / name) as writer:
+                    for result in self.results:
+                        writer.write(result)
+                # Small batches and queues exercise the backpressure.
+                with unittest.mock.patch.multiple(PipelinedWriter, batch_size=7, queue_size=1):
+                    with open_writer(self.path / f'pipelined-{name}', pipelined=True) as writer:
+                        self.assertIsInstance(writer, PipelinedWriter)
+                        for result in self.results:
+                            writer.write(result)
+                self.assertEqual((self.path / f'pipelined-{name}').read_bytes(),
+                                 (self.path / name).read_bytes())
+
+    def test_pipelined_errors_are_raised(self):
+        broken = unittest.mock.Mock(**{'serialize.side_effect': AttributeError})
+        writer = open_writer(self.path / 'broken.csv', pipelined=True)
+        for _ in range(3):
+            writer.write(broken)
+        with self.assertRaises(AttributeError):
+            writer.close()
+
+    def test_unlinked_approaches_are_written(self):
+        unlinked = load_approaches(TEST_CAD_FILE)[:3]
+        for name in ('unlinked.csv', 'unlinked.npz'):
+            with open_writer(self.path / name) as writer:
+                for approach in unlinked:
+                    writer.write(approach)
+        with open(self.path / 'unlinked.csv') as infile:
+            rows = list(csv.DictReader(infile))
+        self.assertEqual([row['designation'] for row in rows],
+                         [approach._designation for approach in unlinked])
+        self.assertEqual({row['potentially_hazardous'] for row in rows},
+                         {'False'})
+        with np.load(self.path / 'unlinked.npz') as arrays:
+            self.assertEqual(arrays['designation'].tolist(),
+                             [row['designation'] for row in rows])
+            self.assertTrue(np.isnan(arrays['diameter_km']).all())
+
+
+class TestTee(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(20)
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = pathlib.Path(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_tee_matches_separate_writes(self):
+        write_to_csv(self.results, self.path / 'separate.csv')
+        write_to_json(self.results[:5], self.path / 'separate.json')
+        with open_writer(self.path / 'tee.csv') as csv_writer, \
+                open_writer(self.path / 'tee.json') as json_writer:
+            counts = tee(self.results, [(csv_writer, None), (json_writer, 5)])
+        self.assertEqual(counts, [20, 5])
+        for name in ('csv', 'json'):
+            self.assertEqual((self.path / f'tee.{name}').read_bytes(),
+                             (self.path / f'separate.{name}').read_bytes())
+
+    def test_tee_stops_when_every_limit_is_reached(self):
+        results = iter(self.results)
+        received = [[], []]
+        writers = [(unittest.mock.Mock(write=received[0].append), 3),
+                   (unittest.mock.Mock(write=received[1].append), 7)]
+        self.assertEqual(tee(results, writers), [3, 7])
+        self.assertEqual(received, [list(self.results[:3]), list(self.results[:7])])
+        # Nothing past the largest limit is consumed.
+        self.assertIs(next(results), self.results[7])
+
+
 if __name__ == '__main__':
     unittest.main()
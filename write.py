@@ -1,29 +1,165 @@
-"""Write a stream of close approaches to CSV or to JSON.
+"""Write a stream of close approaches to CSV, JSON, JSON lines or NPZ.
 
 This module exports two functions: `write_to_csv` and `write_to_json`,
 each of which accept an `results` stream of close approaches and a
 path to which to write the data.
 
+Both are built on writer classes, `CSVWriter` and `JSONWriter`, which
+accept close approaches one at a time - so that a caller can feed
+several files from a single pass over the results. `open_writer`
+chooses the writer class from a file's extension.
+
+Two more writer classes serve other consumers: `JSONLinesWriter`
+writes one compact JSON object per line ('.jsonl'), which streaming
+consumers can process record by record, and `NPZWriter` writes the
+results as columns - one array per field - to a `numpy` '.npz'
+archive, which `numpy.load` reads in one call without parsing text.
+
+The `tee` function writes one stream of results to several writers -
+such as files of different formats and a `StdoutWriter` - in a single
+pass, each up to its own limit.
+
+A `PipelinedWriter` writes any of the text formats with serialization
+and file output on their own threads, so that they overlap with the
+caller producing the results.
+
+Every writer optionally accepts `extras`: a callable, such as the one
+returned by `NEODatabase.approach_fields`, which maps each close
+approach to additional fields (named by its `.names`) to write after
+the standard ones.
+
+An output file whose name ends with a compression extension after its
+format extension, such as 'results.csv.gz' or 'results.json.xz', is
+compressed with gzip, bzip2 or xz on a background thread, so that
+compression overlaps with producing the results.
+
 These functions are invoked by the main module with the output of the
 `limit` function and the filename supplied by the user at the command
 line. The file's extension determines which of these functions is used.
 """
+import bz2
 import csv
+import io
 import json
+import lzma
+import os
+import pathlib
+import queue
+import threading
+import zlib
 
+import numpy as np
 
-def write_to_csv(results, filename):
-    """Write an iterable of `CloseApproach` objects to a CSV file.
 
-    The precise output specification is in `README.md`. Roughly,
-    each output row corresponds to the information in a single close
-    approach from the `results` stream and its associated
-    near-Earth object.
+# Compressors of output files, by compression extension:
+COMPRESSORS = {'.gz': lambda: zlib.compressobj(wbits=31),
+               '.bz2': bz2.BZ2Compressor,
+               '.xz': lzma.LZMACompressor}
+
+
+class CompressingFile(io.RawIOBase):
+    """A binary file that compresses its contents on a background thread.
+
+    Blocks of written bytes are queued for a thread which compresses
+    them and writes the result to the underlying file. The queue is
+    bounded, so a writer that outpaces compression waits rather than
+    buffering without limit.
+    """
+
+    # The maximum number of blocks awaiting compression:
+    queue_size = 16
+
+    def __init__(self, filename, compressor):
+        """Create a new `CompressingFile`.
+
+        :param filename: A Path-like object pointing to where the
+        compressed data should be saved.
+        :param compressor: A compressor object, with `compress` and
+        `flush` methods, such as a `bz2.BZ2Compressor`.
+        """
+        super().__init__()
+        self._file = open(filename, 'wb')
+        self._compressor = compressor
+        self._blocks = queue.Queue(self.queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._compress, daemon=True)
+        self._thread.start()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        """Queue a block of bytes for compression."""
+        if self._error is not None:
+            raise self._error
+        self._blocks.put(bytes(data))
+        return len(data)
+
+    def close(self):
+        """Compress any queued blocks, and close the underlying file."""
+        if self.closed:
+            return
+        self._blocks.put(None)
+        self._thread.join()
+        super().close()
+        if self._error is not None:
+            raise self._error
+
+    def _compress(self):
+        """Compress queued blocks until the end of the file is queued."""
+        try:
+            with self._file:
+                for block in iter(self._blocks.get, None):
+                    if self._error is None:
+                        self._file.write(self._compressor.compress(block))
+                self._file.write(self._compressor.flush())
+        except Exception as error:
+            self._error = error
+            # Drain the queue, so that writers waiting on it don't block.
+            while self._blocks.get() is not None:
+                pass
+
+
+def _open_output(filename, mode='w'):
+    """Open an output file, compressing it if its name says so.
 
-    :param results: An iterable of `CloseApproach` objects.
     :param filename: A Path-like object pointing to where the data
-    should be saved.
+    should be saved, or a file object to write to.
+    :param mode: 'w' to write text, or 'wb' to write bytes.
+    :return: A file object.
+    """
+    # Writers can also write to an already open file:
+    if hasattr(filename, 'write'):
+        return filename
+    suffix = ''
+    if isinstance(filename, (str, os.PathLike)):
+        suffix = pathlib.Path(filename).suffix
+    if suffix not in COMPRESSORS:
+        return open(filename, mode)
+    raw = CompressingFile(filename, COMPRESSORS[suffix]())
+    buffered = io.BufferedWriter(raw, buffer_size=1 << 16)
+    return buffered if mode == 'wb' else io.TextIOWrapper(buffered)
+
+
+def output_format(filename):
+    """Return the format extension of an output file, such as '.csv'.
+
+    Any compression extension is skipped, so 'results.csv.gz' is a
+    '.csv' file.
+    """
+    path = pathlib.Path(filename)
+    if path.suffix in COMPRESSORS:
+        path = path.with_suffix('')
+    return path.suffix
+
+
+class CSVWriter:
+    """Write `CloseApproach` objects to a CSV file, one at a time.
+
+    A `CSVWriter` is a context manager: the file is opened and the
+    header written on creation, and the file is closed on exit.
     """
+
     # Fieldnames for CSV header:
     fieldnames = ('datetime_utc',
                   'distance_au',
@@ -34,20 +170,394 @@ def write_to_csv(results, filename):
                   'potentially_hazardous'
                   )
 
+    def __init__(self, filename, extras=None):
+        """Create a new `CSVWriter`.
+
+        :param filename: A Path-like object pointing to where the data
+        should be saved.
+        :param extras: An optional callable mapping a `CloseApproach` to
+        a dictionary of additional fields, named by its `.names`.
+        """
+        self._extras = extras
+        fieldnames = self.fieldnames + (extras.names if extras else ())
+        self._file = _open_output(filename)
+        self._writer = csv.DictWriter(self._file,
+                                      fieldnames=fieldnames,
+                                      restval='',
+                                      extrasaction='raise',
+                                      dialect='excel',
+                                      )
+        self._writer.writeheader()
+
+    def write(self, approach):
+        """Write one `CloseApproach` as a row of the CSV file."""
+        row = approach.serialize('csv')
+        if self._extras:
+            row.update(self._extras(approach))
+        self._writer.writerow(row)
+
+    def close(self):
+        """Close the CSV file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JSONWriter:
+    """Write `CloseApproach` objects to a JSON file, one at a time.
+
+    The file holds the same indented list that `json.dump` would
+    write, but each element is written as soon as it is received
+    rather than after the whole list has been collected.
+    """
+
+    def __init__(self, filename, extras=None):
+        """Create a new `JSONWriter`.
+
+        :param filename: A Path-like object pointing to where the data
+        should be saved.
+        :param extras: An optional callable mapping a `CloseApproach` to
+        a dictionary of additional fields, named by its `.names`.
+        """
+        self._extras = extras
+        self._file = _open_output(filename)
+        self._file.write('[')
+        self._count = 0
+
+    def write(self, approach):
+        """Write one `CloseApproach` as an element of the JSON list."""
+        record = approach.serialize('json')
+        if self._extras:
+            record.update(self._extras(approach))
+        element = json.dumps(record, indent=4, allow_nan=True)
+        separator = ',\n    ' if self._count else '\n    '
+        self._file.write(separator + element.replace('\n', '\n    '))
+        self._count += 1
+
+    def close(self):
+        """Close the JSON list and the file."""
+        self._file.write('\n]' if self._count else ']')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JSONLinesWriter:
+    """Write `CloseApproach` objects to a JSON lines file, one at a time.
+
+    Each line of the file holds one compact JSON object, with the same
+    structure as the elements written by `JSONWriter`.
+    """
+
+    def __init__(self, filename, extras=None):
+        """Create a new `JSONLinesWriter`.
+
+        :param filename: A Path-like object pointing to where the data
+        should be saved.
+        :param extras: An optional callable mapping a `CloseApproach` to
+        a dictionary of additional fields, named by its `.names`.
+        """
+        self._extras = extras
+        self._file = _open_output(filename)
+
+    def write(self, approach):
+        """Write one `CloseApproach` as a line of the file."""
+        record = approach.serialize('json')
+        if self._extras:
+            record.update(self._extras(approach))
+        self._file.write(json.dumps(record, allow_nan=True) + '\n')
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NPZWriter:
+    """Write `CloseApproach` objects to a `numpy` archive of columns.
+
+    The archive holds one array per field of `CSVWriter` (plus any
+    extra fields): times as `datetime64[m]`, strings as fixed-width
+    Unicode (with '' for missing names), and numbers and flags as
+    `float64` and `bool`. The columns are collected as approaches are
+    written, and saved to the archive on close.
+    """
+
+    # Column names and types, parallel to `CSVWriter.fieldnames`:
+    dtypes = {'datetime_utc': 'datetime64[m]',
+              'distance_au': np.float64,
+              'velocity_km_s': np.float64,
+              'designation': np.str_,
+              'name': np.str_,
+              'diameter_km': np.float64,
+              'potentially_hazardous': bool,
+              }
+
+    def __init__(self, filename, extras=None):
+        """Create a new `NPZWriter`.
+
+        :param filename: A Path-like object pointing to where the data
+        should be saved.
+        :param extras: An optional callable mapping a `CloseApproach` to
+        a dictionary of additional fields, named by its `.names`.
+        """
+        self._filename = filename
+        self._extras = extras
+        self._columns = {name: [] for name in self.dtypes}
+        for name in (extras.names if extras else ()):
+            self._columns[name] = []
+
+    def write(self, approach):
+        """Add one `CloseApproach` to the columns."""
+        neo = approach.neo
+        if neo is None:
+            # Only the designation of an unlinked approach's NEO is known.
+            neo_fields = (approach._designation, '', np.nan, False)
+        else:
+            neo_fields = (neo.designation, neo.name or '', neo.diameter,
+                          neo.hazardous)
+        for name, value in zip(self.dtypes, (approach.time, approach.distance,
+                                             approach.velocity)
+                               + neo_fields):
+            self._columns[name].append(value)
+        if self._extras:
+            for name, value in self._extras(approach).items():
+                self._columns[name].append(value)
+
+    def close(self):
+        """Save the columns to the archive."""
+        arrays = {name: np.array(values, dtype=self.dtypes.get(name,
+                                                               np.float64))
+                  for name, values in self._columns.items()}
+        with _open_output(self._filename, 'wb') as outfile:
+            np.savez(outfile, **arrays)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Writer classes by output file extension:
+WRITERS = {'.csv': CSVWriter, '.json': JSONWriter,
+           '.jsonl': JSONLinesWriter, '.npz': NPZWriter}
+
+
+class StdoutWriter:
+    """Print `CloseApproach` objects to standard output, one per line."""
+
+    def write(self, approach):
+        """Print one `CloseApproach`."""
+        print(approach)
+
+    def close(self):
+        """Do nothing: standard output stays open."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def tee(results, writers):
+    """Write one stream of results to several writers, in a single pass.
+
+    Each writer receives results up to its own limit, and the stream is
+    only consumed until every writer has reached its limit - so a lazy
+    query stops early, as with `filters.limit`.
+
+    :param results: An iterable of `CloseApproach` objects.
+    :param writers: A sequence of `(writer, limit)` pairs, where a limit
+    of 0 or None means no limit.
+    :return: A list of the number of results written to each writer.
+    """
+    counts = [0] * len(writers)
+    active = list(range(len(writers)))
+    if not active:
+        return counts
+    for result in results:
+        for i in active:
+            writers[i][0].write(result)
+            counts[i] += 1
+        active = [i for i in active
+                  if not writers[i][1] or counts[i] < writers[i][1]]
+        if not active:
+            break
+    return counts
+
+
+class _Chunks(io.BytesIO):
+    """An in-memory binary file, emptied a chunk at a time."""
+
+    def take(self):
+        """Return and forget the bytes written so far."""
+        chunk = self.getvalue()
+        self.seek(0)
+        self.truncate()
+        return chunk
+
+    def close(self):
+        # The writer closes its file when done, but the last chunk is
+        # only taken afterwards.
+        pass
+
+
+class PipelinedWriter:
+    """Write `CloseApproach` objects on a pipeline of threads.
+
+    The caller's thread only collects approaches into batches. A
+    serializer thread writes each batch, with the text writer of the
+    file's format, into memory and encodes it into a chunk of bytes,
+    and a writer thread writes those chunks to the file. The stages are
+    connected by bounded queues, so a fast stage waits for a slow one
+    rather than buffering without limit, and the output is identical to
+    that of the text writer alone.
+    """
+
+    # The number of approaches per batch, and the maximum number of
+    # batches (and of chunks) waiting between two stages:
+    batch_size = 512
+    queue_size = 8
+
+    def __init__(self, filename, extras=None):
+        """Create a new `PipelinedWriter`.
+
+        :param filename: A Path-like object pointing to where the data
+        should be saved, with a text format extension.
+        :param extras: An optional callable mapping a `CloseApproach` to
+        a dictionary of additional fields, named by its `.names`.
+        """
+        self._file = _open_output(filename, 'wb')
+        self._chunks = _Chunks()
+        # The text is encoded as `open(filename, 'w')` would encode it:
+        self._text = io.TextIOWrapper(self._chunks)
+        self._writer = WRITERS[output_format(filename)](self._text, extras)
+        self._batch = []
+        self._batches = queue.Queue(self.queue_size)
+        self._encoded = queue.Queue(self.queue_size)
+        self._error = None
+        self._threads = [threading.Thread(target=self._serialize, daemon=True),
+                         threading.Thread(target=self._output, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def write(self, approach):
+        """Add one `CloseApproach` to the current batch."""
+        if self._error is not None:
+            raise self._error
+        self._batch.append(approach)
+        if len(self._batch) >= self.batch_size:
+            self._batches.put(self._batch)
+            self._batch = []
+
+    def close(self):
+        """Write the remaining approaches, and close the file."""
+        if self._threads is None:
+            return
+        if self._batch:
+            self._batches.put(self._batch)
+        self._batches.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = None
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def _serialize(self):
+        """Serialize and encode batches until the last one is queued."""
+        batches = iter(self._batches.get, None)
+        try:
+            for batch in batches:
+                if self._error is None:
+                    for approach in batch:
+                        self._writer.write(approach)
+                    self._text.flush()
+                    self._encoded.put(self._chunks.take())
+            self._writer.close()
+            self._encoded.put(self._chunks.take())
+        except Exception as error:
+            self._error = error
+            # Drain the queue, so that the caller doesn't block on it.
+            for _ in batches:
+                pass
+        finally:
+            self._encoded.put(None)
+
+    def _output(self):
+        """Write chunks to the file until the last one is queued."""
+        for chunk in iter(self._encoded.get, None):
+            if self._error is None:
+                try:
+                    self._file.write(chunk)
+                except Exception as error:
+                    self._error = error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_writer(filename, extras=None, pipelined=False):
+    """Open a writer for a file, based on its format extension.
+
+    :param filename: A Path-like object pointing to where the data
+    should be saved.
+    :param extras: An optional callable mapping a `CloseApproach` to a
+    dictionary of additional fields, named by its `.names`.
+    :param pipelined: Whether to serialize and write on background
+    threads, with a `PipelinedWriter`. NPZ archives are only written on
+    close, so they're never pipelined.
+    :return: A writer with `write(approach)` and `close()` methods.
+    :raises ValueError: If the extension isn't a supported format.
+    """
+    suffix = output_format(filename)
+    if suffix not in WRITERS:
+        raise ValueError(f"Invalid file extension: {suffix!r}. Please use "
+                         f"one of: {', '.join(WRITERS)}.")
+    if pipelined and suffix != '.npz':
+        return PipelinedWriter(filename, extras)
+    return WRITERS[suffix](filename, extras)
+
+
+def write_to_csv(results, filename, extras=None):
+    """Write an iterable of `CloseApproach` objects to a CSV file.
+
+    The precise output specification is in `README.md`. Roughly,
+    each output row corresponds to the information in a single close
+    approach from the `results` stream and its associated
+    near-Earth object.
+
+    :param results: An iterable of `CloseApproach` objects.
+    :param filename: A Path-like object pointing to where the data
+    should be saved.
+    :param extras: An optional callable mapping a `CloseApproach` to a
+    dictionary of additional fields, named by its `.names`.
+    """
     # Write the results to a CSV file:
-    with open(filename, 'w') as csv_out:
-        csv_writer = csv.DictWriter(csv_out,
-                                    fieldnames=fieldnames,
-                                    restval='',
-                                    extrasaction='raise',
-                                    dialect='excel',
-                                    )
-        csv_writer.writeheader()
+    with CSVWriter(filename, extras) as writer:
         for row in results:
-            csv_writer.writerow(row.serialize('csv'))
+            writer.write(row)
 
 
-def write_to_json(results, filename):
+def write_to_json(results, filename, extras=None):
     """Write an iterable of `CloseApproach` objects to a JSON file.
 
     The precise output specification is in `README.md`. Roughly, the
@@ -59,15 +569,13 @@ def write_to_json(results, filename):
     :param results: An iterable of `CloseApproach` objects.
     :param filename: A Path-like object pointing to where the data
     should be saved.
+    :param extras: An optional callable mapping a `CloseApproach` to a
+    dictionary of additional fields, named by its `.names`.
     """
-    # Create list of JSON dictionaries of filtered data:
-    json_data = []
-    for row in results:
-        json_data.append(row.serialize('json'))
-
     # Write the results to a JSON file:
-    with open(filename, 'w') as json_out:
-        json.dump(json_data, json_out, indent=4, allow_nan=True)
+    with JSONWriter(filename, extras) as writer:
+        for row in results:
+            writer.write(row)
 
 
 if __name__ == '__main__':